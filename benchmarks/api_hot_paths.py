@@ -0,0 +1,334 @@
+# benchmarks/api_hot_paths.py
+"""
+Benchmark suite: the API's hot paths, in-process, with a regression check.
+
+Runs the FastAPI app from src/app.py inside this process through httpx's ASGI transport,
+against a fresh SQLite database and moto's in-memory S3, so no server, MySQL or AWS
+account is needed (pip install -e ".[async,bench]"). `--db-mode async` (the default) runs
+DB_ASYNC_MODE with aiosqlite; `--db-mode sync` runs the sync sessions through the I/O pool,
+the production default, with DATABASE_URL pointing at SQLite:
+    python benchmarks/api_hot_paths.py --concurrency 8 --requests 200
+    python benchmarks/api_hot_paths.py --save-baseline benchmarks/baseline-async.json
+    python benchmarks/api_hot_paths.py --baseline benchmarks/baseline-async.json
+
+Scenarios: register, login, upload_small, upload_large, upload_duplicate, list_audio,
+download_url, download_urls_batch and delete. Each runs `--requests` requests (upload_large
+runs `--large-requests`) at `--concurrency`, after untimed warm-up requests, and reports
+req/s, p50/p95/p99 latency, errors and the process's peak RSS so far as JSON. Payloads
+come from `--seed`, so runs are repeatable.
+
+With `--baseline`, a scenario regresses when its req/s drops, or its p95 grows, by more
+than `--max-regression`; peak RSS is checked against `--max-rss-regression`. Regressions
+are listed in the output and the exit code is 1. A saved baseline records the thresholds
+it was saved with, and comparisons use them unless the options are given. A baseline only
+compares against a run of the same --db-mode. Compare baselines recorded on the same
+machine: S3 and the database are local stand-ins, so the numbers measure the app's own
+overhead rather than AWS or MySQL latency.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BUCKET = "g7-bench"
+DEFAULT_MAX_REGRESSION = 0.25
+DEFAULT_MAX_RSS_REGRESSION = 0.25
+PASSWORD = "bench-password"
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz frame header; each frame is 417 bytes long.
+MP3_FRAME_HEADER = bytes.fromhex("fffb9000")
+MP3_FRAME_SIZE = 417
+
+class Scenario(NamedTuple):
+    name: str
+    requests: int
+    # Sends request number `i` and returns its HTTP status
+    request: Callable[[int], Awaitable[int]]
+    setup: Optional[Callable[[int], Awaitable[None]]] = None  # Gets the total request count, warm-up included
+
+def configure_environment(data_dir: str, db_mode: str) -> None:
+    """
+    Points the app at throwaway stand-ins. Set before src is imported, because Config reads
+    the environment at import time; values are forced so a local .env cannot send the
+    benchmark to real AWS or MySQL.
+    """
+    database = os.path.join(data_dir, 'bench.db')
+    os.environ.update({
+        "AWS_ACCESS_KEY_ID": "bench", "AWS_SECRET_ACCESS_KEY": "bench", "AWS_REGION": "us-east-1",
+        "AWS_S3_BUCKET_NAME": BUCKET, "AUDIO_KEY": "StaticAudio", "TRANSCRIPT_KEY": "StaticTranscription",
+        "MYSQL_HOST": "unused", "MYSQL_PORT": "3306", "MYSQL_USER": "unused", "MYSQL_PASSWORD": "unused",
+        "MYSQL_DATABASE": "unused", "MYSQL_POOL_SIZE": "5", "MYSQL_POOL_RECYCLE": "3600",
+        "DB_ASYNC_MODE": str(db_mode == "async").lower(),
+        "DATABASE_URL": f"sqlite:///{database}", "ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{database}",
+        "APP_NAME": "G7Static benchmark", "APP_VERSION": "bench", "APP_PORT": "0", "APP_HOST": "127.0.0.1",
+        "FRONTEND_ORIGINS": "http://localhost", "JWT_SECRET_KEY": "bench-secret",
+        "LOG_FILE": os.path.join(data_dir, "bench.log"),
+    })
+    os.environ.setdefault("MAX_UPLOAD_FILE_SIZE_MB", "512")
+    os.environ.setdefault("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+def mp3_payload(size: int, rng: random.Random) -> bytes:
+    """Random frame bodies behind valid MP3 frame headers, so the audio probe accepts them."""
+    body = MP3_FRAME_SIZE - len(MP3_FRAME_HEADER)
+    return b"".join(MP3_FRAME_HEADER + rng.randbytes(body) for _ in range(max(1, size // MP3_FRAME_SIZE)))
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # bytes on macOS, KB on Linux
+
+async def run_scenario(scenario: Scenario, concurrency: int, warmup: int) -> Dict[str, Any]:
+    total = warmup + scenario.requests
+    if scenario.setup is not None:
+        await scenario.setup(total)
+    for i in range(warmup):
+        await scenario.request(i)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def timed(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            status = await scenario.request(i)
+            latencies.append(time.perf_counter() - start)
+        if not 200 <= status < 300:
+            errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(i) for i in range(warmup, total)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": scenario.requests,
+        "errors": errors,
+        "wall_s": round(elapsed, 3),
+        "req_per_s": round(scenario.requests / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def build_scenarios(client: Any, args: argparse.Namespace, rng: random.Random) -> List[Scenario]:
+    state: Dict[str, Any] = {}
+
+    async def register_user(username: str) -> Dict[str, str]:
+        response = await client.post("/auth/register", json={"username": username, "password": PASSWORD})
+        response.raise_for_status()
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def upload(headers: Dict[str, str], payload: bytes, name: str) -> Any:
+        return await client.post("/upload/audio", headers=headers, files={"file": (name, payload, "audio/mpeg")})
+
+    async def seeded_files(total: int) -> None:
+        # Files for the listing and download scenarios, uploaded once and untimed.
+        if "file_ids" in state:
+            return
+        for i in range(args.seed_files):
+            response = await upload(state["headers"], mp3_payload(args.small_kb * 1024, rng), f"seed_{i}.mp3")
+            response.raise_for_status()
+        listing = await client.get("/files/audio", params={"limit": 1000}, headers=state["headers"])
+        state["file_ids"] = [row["file_id"] for row in listing.json()]
+
+    async def login_setup(total: int) -> None:
+        state["headers"] = await register_user("bench_owner")
+
+    async def register(i: int) -> int:
+        return (await client.post("/auth/register", json={"username": f"bench_user_{i}", "password": PASSWORD})).status_code
+
+    async def login(i: int) -> int:
+        return (await client.post("/auth/login", data={"username": "bench_owner", "password": PASSWORD})).status_code
+
+    async def small_setup(total: int) -> None:
+        state["small"] = [mp3_payload(args.small_kb * 1024, rng) for _ in range(total)]
+
+    async def upload_small(i: int) -> int:
+        return (await upload(state["headers"], state["small"][i], f"small_{i}.mp3")).status_code
+
+    async def large_setup(total: int) -> None:
+        state["large"] = [mp3_payload(args.large_mb * 1024 * 1024, rng) for _ in range(total)]
+
+    async def upload_large(i: int) -> int:
+        status = (await upload(state["headers"], state["large"][i], f"large_{i}.mp3")).status_code
+        state["large"][i] = b""  # Keep peak RSS about the server, not the queued payloads
+        return status
+
+    async def duplicate_setup(total: int) -> None:
+        state["duplicate"] = mp3_payload(args.small_kb * 1024, rng)
+        (await upload(state["headers"], state["duplicate"], "original.mp3")).raise_for_status()
+
+    async def upload_duplicate(i: int) -> int:
+        return (await upload(state["headers"], state["duplicate"], f"copy_{i}.mp3")).status_code
+
+    async def list_audio(i: int) -> int:
+        return (await client.get("/files/audio", params={"limit": 100}, headers=state["headers"])).status_code
+
+    async def download_url(i: int) -> int:
+        file_id = state["file_ids"][i % len(state["file_ids"])]
+        return (await client.get(f"/files/audio/{file_id}/download", headers=state["headers"])).status_code
+
+    async def download_urls_batch(i: int) -> int:
+        response = await client.post("/files/download-urls", headers=state["headers"], json={"file_ids": state["file_ids"][:100]})
+        return response.status_code
+
+    async def delete_setup(total: int) -> None:
+        # A separate user, so the deletions do not shrink the other scenarios' listings.
+        state["delete_headers"] = await register_user("bench_deleter")
+        state["delete_ids"] = []
+        for i in range(total):
+            response = await upload(state["delete_headers"], mp3_payload(args.small_kb * 1024, rng), f"delete_{i}.mp3")
+            response.raise_for_status()
+        listing = await client.get("/files/audio", params={"limit": 1000}, headers=state["delete_headers"])
+        state["delete_ids"] = [row["file_id"] for row in listing.json()]
+
+    async def delete(i: int) -> int:
+        return (await client.delete(f"/files/audio/{state['delete_ids'][i]}", headers=state["delete_headers"])).status_code
+
+    return [
+        Scenario("register", args.auth_requests, register),
+        Scenario("login", args.auth_requests, login, login_setup),
+        Scenario("upload_small", args.requests, upload_small, small_setup),
+        Scenario("upload_large", args.large_requests, upload_large, large_setup),
+        Scenario("upload_duplicate", args.requests, upload_duplicate, duplicate_setup),
+        Scenario("list_audio", args.requests, list_audio, seeded_files),
+        Scenario("download_url", args.requests, download_url, seeded_files),
+        Scenario("download_urls_batch", args.requests, download_urls_batch, seeded_files),
+        Scenario("delete", min(args.requests, 1000 - args.warmup), delete, delete_setup),
+    ]
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float, max_rss_regression: float) -> List[str]:
+    """Human-readable descriptions of every metric that regressed beyond its threshold."""
+    db_mode, baseline_db_mode = results["environment"]["db_mode"], baseline.get("environment", {}).get("db_mode", "async")
+    if db_mode != baseline_db_mode:
+        return [f"baseline was recorded with --db-mode {baseline_db_mode}, this run used --db-mode {db_mode}"]
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if current["req_per_s"] < previous["req_per_s"] * (1 - max_regression):
+            regressions.append(f"{name}: req/s {previous['req_per_s']} -> {current['req_per_s']}")
+        if current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} ms -> {current['p95_ms']} ms")
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name}: errors {previous.get('errors', 0)} -> {current['errors']}")
+    current_rss, previous_rss = results.get("peak_rss_mb"), baseline.get("peak_rss_mb")
+    if current_rss and previous_rss and current_rss > previous_rss * (1 + max_rss_regression):
+        regressions.append(f"peak RSS {previous_rss} MB -> {current_rss} MB")
+    return regressions
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import boto3
+    import httpx
+    try:
+        from moto import mock_aws
+    except ImportError:
+        sys.exit('moto is missing; install the benchmark extra: pip install -e ".[async,bench]"')
+
+    with mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        from src.app import app
+        from src.db.database import init_async_db, init_db
+        if args.db_mode == "async":
+            await init_async_db()
+        else:
+            init_db()
+
+        rng = random.Random(args.seed)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            scenarios = build_scenarios(client, args, rng)
+            selected = set(args.scenarios.split(",")) if args.scenarios else None
+            results = {}
+            for scenario in scenarios:
+                # Later scenarios rely on state set up by earlier ones (users, seeded files).
+                if selected is not None and scenario.name not in selected:
+                    if scenario.setup is not None and scenario.name == "login":
+                        await scenario.setup(0)
+                    continue
+                results[scenario.name] = await run_scenario(scenario, args.concurrency, args.warmup)
+                print(f"{scenario.name}: {results[scenario.name]['req_per_s']} req/s", file=sys.stderr)
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "db_mode": args.db_mode,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "seed": args.seed,
+        },
+        "scenarios": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-mode", choices=("sync", "async"), default="async", help="Sync sessions in the I/O pool, or DB_ASYNC_MODE")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--requests", type=int, default=200, help="Timed requests per scenario")
+    parser.add_argument("--auth-requests", type=int, default=32, help="Timed requests for register and login (bcrypt-bound)")
+    parser.add_argument("--large-requests", type=int, default=8, help="Timed requests for upload_large")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed requests before each scenario")
+    parser.add_argument("--small-kb", type=int, default=64, help="Size of small uploads")
+    parser.add_argument("--large-mb", type=int, default=24, help="Size of large uploads (multipart above S3_MULTIPART_PART_SIZE_MB)")
+    parser.add_argument("--seed-files", type=int, default=200, help="Files uploaded before the listing and download scenarios")
+    parser.add_argument("--scenarios", help="Comma-separated subset of scenarios to run")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for the generated payloads")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results to PATH for later comparison")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare the results against a saved baseline")
+    parser.add_argument("--max-regression", type=float,
+                        help=f"Allowed req/s drop and p95 growth, as a fraction (default: the baseline's, else {DEFAULT_MAX_REGRESSION})")
+    parser.add_argument("--max-rss-regression", type=float,
+                        help=f"Allowed peak RSS growth, as a fraction (default: the baseline's, else {DEFAULT_MAX_RSS_REGRESSION})")
+    args = parser.parse_args()
+
+    baseline: Dict[str, Any] = {}
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        configure_environment(data_dir, args.db_mode)
+        results = asyncio.run(run(args))
+
+    # The options win, then the thresholds the baseline was saved with
+    thresholds = {"max_regression": DEFAULT_MAX_REGRESSION, "max_rss_regression": DEFAULT_MAX_RSS_REGRESSION}
+    thresholds.update(baseline.get("thresholds", {}))
+    thresholds.update({name: getattr(args, name) for name in thresholds if getattr(args, name) is not None})
+    results["thresholds"] = thresholds
+
+    regressions = []
+    if args.baseline:
+        regressions = compare(results, baseline, thresholds["max_regression"], thresholds["max_rss_regression"])
+        results["regressions"] = regressions
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as fh:
+            json.dump(results, fh, indent=2)
+    print(json.dumps(results, indent=2))
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
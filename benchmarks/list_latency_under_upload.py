@@ -0,0 +1,103 @@
+# benchmarks/list_latency_under_upload.py
+"""
+Load test: measures GET /files/audio latency while large uploads are in flight.
+
+Run against a live server (e.g. `uv run run.py`):
+    python benchmarks/list_latency_under_upload.py --base-url http://127.0.0.1:8000 \
+        --username bench_user --password bench_password --upload-mb 200 --uploaders 2
+
+The script first samples list latency on an idle server, then samples it again while
+`--uploaders` concurrent uploads of `--upload-mb` MB run. With blocking S3/DB calls off
+the event loop, the two p99 figures should stay close.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+import httpx
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(samples: List[float]) -> dict:
+    return {
+        "count": len(samples),
+        "p50_ms": round(statistics.median(samples) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2),
+    }
+
+async def get_token(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post("/auth/login", data={"username": username, "password": password})
+    if response.status_code == 401:
+        response = await client.post("/auth/register", json={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+async def sample_list_latency(client: httpx.AsyncClient, headers: dict, duration: float, interval: float) -> List[float]:
+    samples = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/files/audio", headers=headers)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return samples
+
+async def upload_file(client: httpx.AsyncClient, headers: dict, path: str, name: str) -> None:
+    with open(path, "rb") as fh:
+        response = await client.post("/upload/audio", headers=headers, files={"file": (name, fh, "audio/mpeg")})
+    response.raise_for_status()
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz frame header; each frame is 417 bytes long.
+MP3_FRAME_HEADER = bytes.fromhex("fffb9000")
+MP3_FRAME_SIZE = 417
+
+def make_payload(size_mb: int, directory: str, index: int) -> str:
+    # Random frame bodies so every upload is unique and bypasses duplicate detection,
+    # behind valid frame headers so the server's audio probe accepts it.
+    path = os.path.join(directory, f"bench_{index}.mp3")
+    frames = size_mb * 1024 * 1024 // MP3_FRAME_SIZE
+    with open(path, "wb") as fh:
+        for _ in range(frames):
+            fh.write(MP3_FRAME_HEADER + os.urandom(MP3_FRAME_SIZE - len(MP3_FRAME_HEADER)))
+    return path
+
+async def main(args: argparse.Namespace) -> None:
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None) as client:
+        token = await get_token(client, args.username, args.password)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        idle = await sample_list_latency(client, headers, args.duration, args.interval)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [make_payload(args.upload_mb, tmp, i) for i in range(args.uploaders)]
+            uploads = [
+                asyncio.create_task(upload_file(client, headers, path, f"bench_{i}_{int(time.time())}.mp3"))
+                for i, path in enumerate(paths)
+            ]
+            loaded = await sample_list_latency(client, headers, args.duration, args.interval)
+            await asyncio.gather(*uploads)
+
+    print(json.dumps({"idle": summarize(idle), "during_uploads": summarize(loaded)}, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--username", default="bench_user")
+    parser.add_argument("--password", default="bench_password")
+    parser.add_argument("--upload-mb", type=int, default=200)
+    parser.add_argument("--uploaders", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds to sample list latency per phase")
+    parser.add_argument("--interval", type=float, default=0.05, help="Pause between list requests")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,116 @@
+# benchmarks/logging_overhead.py
+"""
+Micro-benchmark: per-request logging cost, synchronous handlers vs. the queued pipeline.
+
+Each simulated request logs `--lines` INFO lines through one of these setups:
+    sync          StreamHandler + FileHandler on the logger, as src/log.py used to attach them
+    queue         src/log.py's pipeline: the caller only enqueues, a listener thread writes
+    queue_json    the same with the JSON formatter
+    queue_sampled the same with LOG_SAMPLING keeping `--sample-rate` of the lines
+`--disk-latency-ms` adds a delay to every write, standing in for a slow disk or terminal:
+    python benchmarks/logging_overhead.py --requests 2000 --lines 3 --disk-latency-ms 0.5
+
+Reports the caller-side cost per request (mean, p50, p99 in microseconds), how long the
+listener needed afterwards to drain the queue, and dropped records, as JSON.
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOG_FILE", os.path.join(tempfile.gettempdir(), "g7static-bench.log"))
+
+from src.log import JsonFormatter, bind_user, build_pipeline  # noqa: E402
+
+TEXT_FORMAT = logging.Formatter(fmt="%(asctime)s | %(levelname)s | %(name)s | %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+MODES = ("sync", "queue", "queue_json", "queue_sampled")
+
+class SlowStream:
+    """File wrapper that sleeps on every write, like a saturated disk would block."""
+    def __init__(self, stream: Any, latency: float):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, data: str) -> int:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.stream.write(data)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def run(mode: str, args: argparse.Namespace, data_dir: str) -> Dict[str, Any]:
+    latency = args.disk_latency_ms / 1000
+    console = open(os.devnull, "w")
+    log_file = open(os.path.join(data_dir, f"{mode}.log"), "w", encoding="utf-8")
+    formatter = JsonFormatter() if mode == "queue_json" else TEXT_FORMAT
+    handlers: List[logging.Handler] = [logging.StreamHandler(SlowStream(console, latency)), logging.StreamHandler(SlowStream(log_file, latency))]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    logger = logging.getLogger(f"G7StaticLogs.bench.{mode}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    listener = None
+    queue_handler = None
+    if mode == "sync":
+        for handler in handlers:
+            logger.addHandler(handler)
+    else:
+        sampling = {logger.name: args.sample_rate} if mode == "queue_sampled" else None
+        queue_handler, listener = build_pipeline(handlers, sampling, args.queue_size)
+        logger.addHandler(queue_handler)
+        listener.start()
+
+    bind_user("bench_user")
+    costs = []
+    for i in range(args.requests):
+        start = time.perf_counter()
+        for line in range(args.lines):
+            logger.info("Audio file uploaded to S3 for user '%s': %s (line %s)", "bench_user", f"StaticAudio/bench_user/{i}.mp3", line)
+        costs.append(time.perf_counter() - start)
+
+    drain_start = time.perf_counter()
+    if listener is not None:
+        listener.stop()  # Returns once every queued record is written
+    drain = time.perf_counter() - drain_start
+    for handler in handlers:
+        handler.close()
+    console.close()
+    log_file.close()
+    return {
+        "mode": mode,
+        "mean_us": round(statistics.fmean(costs) * 1e6, 2),
+        "p50_us": round(percentile(costs, 50) * 1e6, 2),
+        "p99_us": round(percentile(costs, 99) * 1e6, 2),
+        "drain_ms": round(drain * 1000, 1),
+        "dropped": queue_handler.dropped if queue_handler is not None else 0,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=3, help="INFO lines logged per request")
+    parser.add_argument("--disk-latency-ms", type=float, default=0.0, help="Delay added to every write")
+    parser.add_argument("--sample-rate", type=float, default=0.1, help="Fraction kept in queue_sampled mode")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated subset of: " + ", ".join(MODES))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        results = [run(mode, args, data_dir) for mode in args.modes.split(",")]
+    print(json.dumps({"requests": args.requests, "lines_per_request": args.lines, "disk_latency_ms": args.disk_latency_ms, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/password_hashing.py
+"""
+Micro-benchmark: bcrypt on the event loop vs. the bounded PasswordHasher pool.
+
+Fires `--logins` concurrent password verifications while a heartbeat task, standing in
+for every other request on the worker, measures how late the event loop wakes it up:
+    python benchmarks/password_hashing.py --logins 64 --workers 4
+
+Reports logins per second and heartbeat lag percentiles for both modes as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.password_hashing import PasswordHasher, get_password_hash, verify_password  # noqa: E402
+
+HEARTBEAT_INTERVAL = 0.01
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+async def heartbeat(lags: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append(time.perf_counter() - start - HEARTBEAT_INTERVAL)
+
+async def run(mode: str, logins: int, hashed: str, hasher: PasswordHasher) -> dict:
+    async def inline_login() -> bool:
+        return verify_password("benchmark-password", hashed)
+
+    async def pooled_login() -> bool:
+        return await hasher.verify("benchmark-password", hashed)
+
+    login = inline_login if mode == "inline" else pooled_login
+    lags: List[float] = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    await asyncio.sleep(HEARTBEAT_INTERVAL * 2)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    assert all(results)
+
+    lags = lags or [0.0]
+    return {
+        "logins_per_s": round(logins / elapsed, 2),
+        "wall_s": round(elapsed, 3),
+        "heartbeat_lag_p50_ms": round(statistics.median(lags) * 1000, 2),
+        "heartbeat_lag_p99_ms": round(percentile(lags, 99) * 1000, 2),
+        "heartbeat_lag_max_ms": round(max(lags) * 1000, 2),
+    }
+
+async def main(args: argparse.Namespace) -> None:
+    hashed = get_password_hash("benchmark-password")
+    hasher = PasswordHasher(workers=args.workers, max_queue=args.logins, use_processes=args.processes)
+    try:
+        results = {
+            "inline": await run("inline", args.logins, hashed, hasher),
+            "pool": await run("pool", args.logins, hashed, hasher),
+        }
+    finally:
+        hasher.shutdown()
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--processes", action="store_true", help="Use a process pool instead of threads")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,129 @@
+# benchmarks/upload_single_pass.py
+"""
+Benchmark: two-pass upload (hash, rewind, upload_fileobj) vs. single-pass StreamedUpload.
+
+Runs fully in-process against a fake S3 client that simulates per-request latency and
+upload bandwidth, so no AWS account is needed:
+    python benchmarks/upload_single_pass.py --size-mb 200 --part-mb 8 --concurrency 4
+
+Reports wall time and bytes read from the spooled source file for both flows as JSON.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.s3_upload import StreamedUpload  # noqa: E402
+
+class CountingReader(io.RawIOBase):
+    """File wrapper that counts how many bytes are read through it."""
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self.fileobj.seek(offset, whence)
+
+    def readable(self):
+        return True
+
+class FakeS3:
+    """Minimal S3 stand-in: each request costs `latency` seconds plus transfer time."""
+    def __init__(self, latency: float, bandwidth_mb_s: float, part_size: int, concurrency: int):
+        self.latency = latency
+        self.bandwidth = bandwidth_mb_s * 1024 * 1024
+        self.part_size = part_size
+        self.concurrency = concurrency
+
+    def _transfer(self, nbytes: int) -> None:
+        time.sleep(self.latency + nbytes / self.bandwidth)
+
+    def put_object(self, Body, **kwargs):
+        self._transfer(len(Body))
+
+    def create_multipart_upload(self, **kwargs):
+        self._transfer(0)
+        return {'UploadId': 'bench'}
+
+    def upload_part(self, Body, PartNumber, **kwargs):
+        self._transfer(len(Body))
+        return {'ETag': f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, **kwargs):
+        self._transfer(0)
+
+    def abort_multipart_upload(self, **kwargs):
+        self._transfer(0)
+
+    def delete_object(self, **kwargs):
+        self._transfer(0)
+
+    def upload_fileobj(self, fileobj, bucket, key):
+        # Mirrors boto3's managed transfer: sequential reads, concurrent part uploads.
+        self.create_multipart_upload()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = []
+            while chunk := fileobj.read(self.part_size):
+                futures.append(pool.submit(self._transfer, len(chunk)))
+            for future in futures:
+                future.result()
+        self.complete_multipart_upload()
+
+def two_pass(path: str, s3: FakeS3) -> dict:
+    with open(path, 'rb') as raw:
+        reader = CountingReader(raw)
+        start = time.perf_counter()
+        md5 = hashlib.md5()
+        while chunk := reader.read(8192):
+            md5.update(chunk)
+        reader.seek(0)
+        s3.upload_fileobj(reader, 'bench-bucket', 'bench-key')
+        return {'wall_s': round(time.perf_counter() - start, 3), 'bytes_read': reader.bytes_read, 'md5': md5.hexdigest()}
+
+def single_pass(path: str, s3: FakeS3, part_size: int, concurrency: int) -> dict:
+    with open(path, 'rb') as raw, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        reader = CountingReader(raw)
+        start = time.perf_counter()
+        upload = StreamedUpload(s3, 'bench-bucket', 'bench-key', executor=pool, part_size=part_size, concurrency=concurrency)
+        md5_hash, _ = upload.stream(reader)
+        upload.complete()
+        return {'wall_s': round(time.perf_counter() - start, 3), 'bytes_read': reader.bytes_read, 'md5': md5_hash}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=200)
+    parser.add_argument('--part-mb', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.02, help='Simulated seconds per S3 request')
+    parser.add_argument('--bandwidth-mb', type=float, default=200.0, help='Simulated MB/s per S3 connection')
+    args = parser.parse_args()
+
+    part_size = args.part_mb * 1024 * 1024
+    s3 = FakeS3(args.latency, args.bandwidth_mb, part_size, args.concurrency)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.bin')
+        with open(path, 'wb') as fh:
+            for _ in range(args.size_mb):
+                fh.write(os.urandom(1024 * 1024))
+
+        results = {
+            'two_pass': two_pass(path, s3),
+            'single_pass': single_pass(path, s3, part_size, args.concurrency),
+        }
+    assert results['two_pass']['md5'] == results['single_pass']['md5']
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+// Incremental MD5 (RFC 1321) over ArrayBuffers, served with the frontend instead of
+// loaded from a CDN. Browsers' SubtleCrypto has no MD5, which S3's Content-MD5 and the
+// API's dedup hash both need.
+const MD5 = (() => {
+    const S = [7, 12, 17, 22, 5, 9, 14, 20, 4, 11, 16, 23, 6, 10, 15, 21];
+    const K = new Int32Array(64);
+    for (let i = 0; i < 64; i++) K[i] = Math.floor(Math.abs(Math.sin(i + 1)) * 0x100000000) | 0;
+
+    function compress(state, block) {
+        let [a, b, c, d] = state;
+        for (let i = 0; i < 64; i++) {
+            let f, g;
+            if (i < 16) { f = (b & c) | (~b & d); g = i; }
+            else if (i < 32) { f = (d & b) | (~d & c); g = (5 * i + 1) & 15; }
+            else if (i < 48) { f = b ^ c ^ d; g = (3 * i + 5) & 15; }
+            else { f = c ^ (b | ~d); g = (7 * i) & 15; }
+            const shift = S[(i >> 4) * 4 + (i & 3)];
+            const sum = (a + f + K[i] + block[g]) | 0;
+            a = d; d = c; c = b;
+            b = (b + ((sum << shift) | (sum >>> (32 - shift)))) | 0;
+        }
+        state[0] = (state[0] + a) | 0;
+        state[1] = (state[1] + b) | 0;
+        state[2] = (state[2] + c) | 0;
+        state[3] = (state[3] + d) | 0;
+    }
+
+    class Hasher {
+        constructor() {
+            this.state = new Int32Array([0x67452301, 0xefcdab89 | 0, 0x98badcfe | 0, 0x10325476]);
+            this.buffer = new Uint8Array(64);
+            this.view = new DataView(this.buffer.buffer);
+            this.buffered = 0;
+            this.length = 0;
+            this.block = new Int32Array(16);
+        }
+
+        _compressBuffer() {
+            for (let i = 0; i < 16; i++) this.block[i] = this.view.getInt32(i * 4, true);
+            compress(this.state, this.block);
+        }
+
+        append(arrayBuffer) {
+            const bytes = new Uint8Array(arrayBuffer);
+            this.length += bytes.length;
+            let offset = 0;
+            while (offset < bytes.length) {
+                const take = Math.min(64 - this.buffered, bytes.length - offset);
+                this.buffer.set(bytes.subarray(offset, offset + take), this.buffered);
+                this.buffered += take;
+                offset += take;
+                if (this.buffered === 64) {
+                    this._compressBuffer();
+                    this.buffered = 0;
+                }
+            }
+            return this;
+        }
+
+        // Returns the 16-byte digest; the hasher cannot be appended to afterwards.
+        digest() {
+            const bitLength = this.length * 8;
+            this.append(new Uint8Array([0x80]).buffer);
+            while (this.buffered !== 56) this.append(new Uint8Array(1).buffer);
+            this.view.setUint32(56, bitLength >>> 0, true);
+            this.view.setUint32(60, Math.floor(bitLength / 0x100000000), true);
+            this._compressBuffer();
+            const out = new Uint8Array(16);
+            const outView = new DataView(out.buffer);
+            this.state.forEach((word, i) => outView.setInt32(i * 4, word, true));
+            return out;
+        }
+
+        hex() {
+            return Array.from(this.digest(), byte => byte.toString(16).padStart(2, '0')).join('');
+        }
+
+        base64() {
+            return btoa(String.fromCharCode(...this.digest()));
+        }
+    }
+
+    return { Hasher };
+})();
@@ -3,6 +3,8 @@ document.addEventListener('DOMContentLoaded', () => {
     const API_BASE_URL = 'http://127.0.0.1:8000';
     const TOKEN_STORAGE_KEY = 'g7_auth_token';
     const USERNAME_STORAGE_KEY = 'g7_auth_username';
+    const PART_UPLOAD_CONCURRENCY = 4;
+    const LIST_PAGE_SIZE = 100;
 
     // --- DOM Elements ---
     const mainCard = document.getElementById('main-card');
@@ -130,7 +132,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // --- API Call Functions ---
 
-    async function apiRequest(endpoint, options = {}) {
+    async function apiRequest(endpoint, options = {}, onResponse = null) {
         const token = localStorage.getItem(TOKEN_STORAGE_KEY);
         const headers = new Headers(options.headers || {});
         if (token) {
@@ -139,6 +141,7 @@ document.addEventListener('DOMContentLoaded', () => {
         
         try {
             const response = await fetch(`${API_BASE_URL}${endpoint}`, { ...options, headers });
+            if (onResponse) onResponse(response);
             
             // Handle success with no content (for DELETE requests)
             if (response.status === 204) return null;
@@ -155,17 +158,137 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    function jsonRequest(endpoint, body) {
+        return apiRequest(endpoint, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+    }
+
+    async function uploadPart(uploadId, s3Key, partNumber, blob, contentMd5) {
+        const { parts } = await jsonRequest('/upload/multipart/presign', {
+            upload_id: uploadId, s3_key: s3Key,
+            parts: [{ part_number: partNumber, content_md5: contentMd5 }]
+        });
+        // Audio bytes go straight to S3; the bucket CORS policy must expose the ETag header.
+        const response = await fetch(parts[0].url, { method: 'PUT', headers: { 'Content-MD5': contentMd5 }, body: blob });
+        if (!response.ok) {
+            const message = `Upload of part ${partNumber} failed (${response.status}).`;
+            displayMessage(message, 'error');
+            throw new Error(message);
+        }
+        return { part_number: partNumber, etag: response.headers.get('ETag') };
+    }
+
+    // Hashes each part once. Its MD5 binds the part's presigned URL, and the MD5 of all the
+    // part digests is the ETag S3 will give the object, which the server dedups on.
+    async function hashParts(file, partSize, partCount, onProgress) {
+        const etagHasher = new MD5.Hasher();
+        const contentMd5s = [];
+        for (let partNumber = 1; partNumber <= partCount; partNumber++) {
+            const buffer = await file.slice((partNumber - 1) * partSize, partNumber * partSize).arrayBuffer();
+            const digest = new MD5.Hasher().append(buffer).digest();
+            etagHasher.append(digest.buffer);
+            contentMd5s.push(btoa(String.fromCharCode(...digest)));
+            onProgress(partNumber, partCount);
+        }
+        return { contentMd5s, contentEtag: `${etagHasher.hex()}-${partCount}` };
+    }
+
+    async function uploadFileMultipart(file, onProgress) {
+        const { upload_id, s3_key, part_size, part_count } = await jsonRequest('/upload/multipart/start', {
+            filename: file.name, file_size: file.size
+        });
+
+        const completedParts = [];
+        const inFlight = new Set();
+        try {
+            // Hash first: if the server already has this content, skip the transfer.
+            const { contentMd5s, contentEtag } = await hashParts(file, part_size, part_count, (done, total) => {
+                onProgress(`Checking file... (${Math.round(done * 100 / total)}%)`);
+            });
+            const preflight = await jsonRequest('/upload/preflight', { content_etag: contentEtag, file_size: file.size });
+            if (preflight.exists) {
+                await jsonRequest('/upload/multipart/abort', { upload_id, s3_key }).catch(() => {});
+                return { message: 'File already uploaded', filename: preflight.file.original_filename };
+            }
+
+            // Up to PART_UPLOAD_CONCURRENCY parts upload in parallel, each read when it is sent.
+            onProgress(`Uploading file... (0/${part_count} parts)`);
+            for (let partNumber = 1; partNumber <= part_count; partNumber++) {
+                const blob = file.slice((partNumber - 1) * part_size, partNumber * part_size);
+                const task = uploadPart(upload_id, s3_key, partNumber, blob, contentMd5s[partNumber - 1]).then(part => {
+                    completedParts.push(part);
+                    onProgress(`Uploading file... (${completedParts.length}/${part_count} parts)`);
+                });
+                inFlight.add(task);
+                task.finally(() => inFlight.delete(task)).catch(() => {});
+                if (inFlight.size >= PART_UPLOAD_CONCURRENCY) await Promise.race(inFlight);
+            }
+            await Promise.all(inFlight);
+        } catch (error) {
+            await jsonRequest('/upload/multipart/abort', { upload_id, s3_key }).catch(() => {});
+            throw error;
+        }
+
+        return jsonRequest('/upload/multipart/complete', {
+            upload_id, s3_key, parts: completedParts
+        });
+    }
+
+    // Paginated lists: each page's X-Next-Cursor header feeds a "Load more" button.
+    const PAGED_LISTS = {
+        audio: { endpoint: '/files/audio', element: audioFileList, createItem: createAudioItemElement },
+        transcript: { endpoint: '/files/transcripts', element: transcriptFileList, createItem: createTranscriptItemElement }
+    };
+
+    async function fetchPage(list, cursor = null) {
+        let nextCursor = null;
+        const query = `?limit=${LIST_PAGE_SIZE}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+        const items = await apiRequest(`${PAGED_LISTS[list].endpoint}${query}`, {}, response => {
+            nextCursor = response.headers.get('X-Next-Cursor');
+        });
+        return { items, nextCursor };
+    }
+
+    function renderLoadMoreButton(list, nextCursor) {
+        const listElement = PAGED_LISTS[list].element;
+        listElement.querySelector('.load-more-btn')?.remove();
+        if (!nextCursor) return;
+        const button = document.createElement('button');
+        button.className = 'load-more-btn w-full p-2 text-sm text-purple-700 hover:bg-purple-50 rounded-lg transition-colors';
+        button.dataset.list = list;
+        button.dataset.cursor = nextCursor;
+        button.textContent = 'Load more';
+        listElement.appendChild(button);
+    }
+
+    async function handleLoadMore(button) {
+        const list = button.dataset.list;
+        button.disabled = true;
+        try {
+            const { items, nextCursor } = await fetchPage(list, button.dataset.cursor);
+            items.forEach(item => PAGED_LISTS[list].element.insertBefore(PAGED_LISTS[list].createItem(item), button));
+            renderLoadMoreButton(list, nextCursor);
+        } catch (error) {
+            button.disabled = false;
+        }
+    }
+
     async function fetchAllFiles() {
         audioFileList.innerHTML = `<p class="text-center text-gray-500 p-4">Loading audio files...</p>`;
         transcriptFileList.innerHTML = `<p class="text-center text-gray-500 p-4">Loading transcripts...</p>`;
 
         try {
-            const [audioFiles, transcriptFiles] = await Promise.all([
-                apiRequest('/files/audio'),
-                apiRequest('/files/transcripts')
+            const [audioPage, transcriptPage] = await Promise.all([
+                fetchPage('audio'),
+                fetchPage('transcript')
             ]);
-            renderFileList(audioFileList, audioFiles, createAudioItemElement, 'No audio files uploaded yet.');
-            renderFileList(transcriptFileList, transcriptFiles, createTranscriptItemElement, 'No transcripts available yet.');
+            renderFileList(audioFileList, audioPage.items, createAudioItemElement, 'No audio files uploaded yet.');
+            renderLoadMoreButton('audio', audioPage.nextCursor);
+            renderFileList(transcriptFileList, transcriptPage.items, createTranscriptItemElement, 'No transcripts available yet.');
+            renderLoadMoreButton('transcript', transcriptPage.nextCursor);
         } catch (error) {
             audioFileList.innerHTML = `<p class="text-center text-red-500 p-4">Failed to load audio files.</p>`;
             transcriptFileList.innerHTML = `<p class="text-center text-red-500 p-4">Failed to load transcripts.</p>`;
@@ -200,14 +323,15 @@ document.addEventListener('DOMContentLoaded', () => {
         const file = audioFileInput.files[0];
         if (!file) return displayMessage('Please select a file to upload.', 'error');
 
-        const formData = new FormData();
-        formData.append('file', file);
-        
-        showLoader('Uploading file...');
+        showLoader('Checking file...');
         try {
-            await apiRequest('/upload/audio', { method: 'POST', body: formData });
-            displayMessage('File uploaded successfully!', 'success');
+            const data = await uploadFileMultipart(file, text => { loadingText.textContent = text; });
             audioFileInput.value = '';
+            if (data.message === 'File already uploaded') {
+                displayMessage(`File already uploaded as "${data.filename}".`, 'info');
+                return;
+            }
+            displayMessage('File uploaded successfully!', 'success');
             await fetchAllFiles();
         } catch (error) { /* Handled by apiRequest */ } 
         finally { hideLoader(); }
@@ -217,6 +341,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const button = event.target.closest('button');
         if (!button) return;
 
+        if (button.classList.contains('load-more-btn')) await handleLoadMore(button);
         if (button.classList.contains('download-btn')) await handleDownload(button);
         if (button.classList.contains('delete-btn')) await handleDelete(button);
     }
@@ -0,0 +1,250 @@
+"""
+Compact transcript derivatives.
+
+Transcribe's JSON holds every word with its alternatives and confidence, and is often
+10-20x larger than the text itself. When a transcript completes, this module writes
+gzip-compressed plain text, SRT and WebVTT files next to it:
+    StaticTranscription/{username}/{stem}.json   (Transcribe output)
+    StaticTranscription/{username}/{stem}.txt / .srt / .vtt
+They are stored with Content-Encoding: gzip, so browsers following a presigned URL get
+the plain file while S3 stores and transfers the compressed bytes.
+
+The Transcribe JSON is read in chunks and its results.items array is decoded one item at
+a time, so memory holds the transcript text and the cues, never the per-word objects:
+long recordings, whose JSON runs to hundreds of megabytes, get derivatives too.
+
+Run as a script to backfill derivatives for transcripts written before this existed:
+    python lambda/derivatives.py --bucket my-bucket [--prefix StaticTranscription/]
+"""
+import argparse
+import codecs
+import gzip
+import json
+import os
+
+# Bytes read from the transcript body at a time.
+READ_CHUNK_BYTES = 256 * 1024
+
+# Cue limits for subtitles: a cue ends at sentence punctuation, or when it gets this long.
+MAX_CUE_SECONDS = 6.0
+MAX_CUE_WORDS = 14
+SENTENCE_END = {'.', '?', '!'}
+
+CONTENT_TYPES = {
+    'txt': 'text/plain; charset=utf-8',
+    'srt': 'application/x-subrip; charset=utf-8',
+    'vtt': 'text/vtt; charset=utf-8',
+}
+
+class JsonStream:
+    """
+    Pull parser over a JSON file object, read READ_CHUNK_BYTES at a time. Objects and
+    arrays can be walked member by member (object_keys, array_values), so a large array is
+    never held whole; every other value is decoded with json.JSONDecoder.raw_decode.
+    """
+    def __init__(self, fp):
+        self.fp = fp
+        self.decoder = json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read(self, size):
+        """Appends at least `size` more bytes of the file to the buffer; False at end of file."""
+        if self.eof:
+            return False
+        chunk = self.fp.read(size)
+        if not chunk:
+            self.eof = True
+            self.buffer = self.buffer[self.pos:] + self.utf8.decode(b'', final=True)
+            self.pos = 0
+            return False
+        # Drop what has been parsed, so the buffer only holds the value being decoded.
+        self.buffer = self.buffer[self.pos:] + (chunk if isinstance(chunk, str) else self.utf8.decode(chunk))
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        """The next non-whitespace character, without consuming it ('' at end of file)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\n\r':
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._read(READ_CHUNK_BYTES):
+                return self.buffer[self.pos:self.pos + 1]
+
+    def _expect(self, chars):
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError(f"Malformed transcript JSON: expected {' or '.join(repr(c) for c in chars)}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decodes the next value whole."""
+        self._peek()
+        while True:
+            # A value ending exactly at the end of the buffer may continue (a number cut
+            # between chunks), so it is only accepted once more input or the end is seen.
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow the read with the buffer, so decoding a long string is not quadratic.
+            self._read(max(READ_CHUNK_BYTES, len(self.buffer) - self.pos))
+
+    def skip(self):
+        """Consumes the next value, walking objects and arrays so they are never built."""
+        char = self._peek()
+        if char == '{':
+            for _ in self.object_keys():
+                self.skip()
+        elif char == '[':
+            for _ in self.array_values(self.skip):
+                pass
+        else:
+            self.value()
+
+    def object_keys(self):
+        """Yields the next object's keys; the caller consumes each value before asking for the next key."""
+        self._expect('{')
+        if self._peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError("Malformed transcript JSON: object key is not a string")
+            self._expect(':')
+            yield key
+            if self._expect(',}') == '}':
+                return
+
+    def array_values(self, read=None):
+        """Yields the next array's elements one at a time, each decoded with `read` (default: value)."""
+        read = read or self.value
+        self._expect('[')
+        if self._peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield read()
+            if self._expect(',]') == ']':
+                return
+
+def derivative_key(transcript_key, fmt):
+    """StaticTranscription/u/stem.json -> StaticTranscription/u/stem.{fmt}"""
+    return f"{os.path.splitext(transcript_key)[0]}.{fmt}"
+
+def build_cues(items):
+    """
+    Groups Transcribe result items into (start, end, text) cues in one pass.
+    Punctuation items attach to the preceding word and close the cue at sentence ends.
+    """
+    cues = []
+    words, start, end = [], None, None
+    for item in items:
+        content = item['alternatives'][0]['content'] if item.get('alternatives') else ''
+        if item.get('type') == 'punctuation':
+            if words:
+                words[-1] += content
+                if content in SENTENCE_END:
+                    cues.append((start, end, ' '.join(words)))
+                    words = []
+            continue
+        item_start, item_end = float(item['start_time']), float(item['end_time'])
+        if words and (item_end - start > MAX_CUE_SECONDS or len(words) >= MAX_CUE_WORDS):
+            cues.append((start, end, ' '.join(words)))
+            words = []
+        if not words:
+            start = item_start
+        words.append(content)
+        end = item_end
+    if words:
+        cues.append((start, end, ' '.join(words)))
+    return cues
+
+def _timestamp(seconds, separator):
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{milliseconds:03d}"
+
+def to_srt(cues):
+    return ''.join(
+        f"{index}\n{_timestamp(start, ',')} --> {_timestamp(end, ',')}\n{text}\n\n"
+        for index, (start, end, text) in enumerate(cues, 1)
+    )
+
+def to_vtt(cues):
+    return 'WEBVTT\n\n' + ''.join(
+        f"{_timestamp(start, '.')} --> {_timestamp(end, '.')}\n{text}\n\n"
+        for start, end, text in cues
+    )
+
+def render_derivatives(transcript_fp):
+    """
+    Reads a Transcribe JSON file object and returns {format: text} for every derivative.
+    results.items is streamed into build_cues; other results members (audio_segments,
+    speaker_labels, ...) are skipped without being built.
+    """
+    stream = JsonStream(transcript_fp)
+    found, transcripts, cues = False, [], []
+    for key in stream.object_keys():
+        if key != 'results':
+            stream.skip()
+            continue
+        found = True
+        for result_key in stream.object_keys():
+            if result_key == 'transcripts':
+                transcripts = [part['transcript'] for part in stream.array_values()]
+            elif result_key == 'items':
+                cues = build_cues(stream.array_values())
+            else:
+                stream.skip()
+    if not found:
+        raise ValueError("Malformed transcript JSON: no results")
+    return {'txt': ' '.join(transcripts) + '\n', 'srt': to_srt(cues), 'vtt': to_vtt(cues)}
+
+def write_derivatives(s3_client, bucket_name, transcript_key):
+    """Renders the transcript's derivatives, streaming its JSON from S3, and writes them gzip-compressed next to it."""
+    body = s3_client.get_object(Bucket=bucket_name, Key=transcript_key)['Body']
+    try:
+        derivatives = render_derivatives(body)
+    finally:
+        body.close()
+    for fmt, content in derivatives.items():
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=derivative_key(transcript_key, fmt),
+            Body=gzip.compress(content.encode('utf-8')),
+            ContentType=CONTENT_TYPES[fmt],
+            ContentEncoding='gzip'
+        )
+    print(f"Wrote {', '.join(derivatives)} derivatives of s3://{bucket_name}/{transcript_key}")
+
+def backfill(s3_client, bucket_name, prefix):
+    """Writes derivatives for every transcript JSON under `prefix` that has none yet."""
+    paginator = s3_client.get_paginator('list_objects_v2')
+    written = 0
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        keys = {content['Key'] for content in page.get('Contents', [])}
+        for key in sorted(keys):
+            if key.endswith('.json') and derivative_key(key, 'txt') not in keys:
+                write_derivatives(s3_client, bucket_name, key)
+                written += 1
+    return written
+
+if __name__ == '__main__':
+    import boto3
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bucket', required=True)
+    parser.add_argument('--prefix', default='StaticTranscription/')
+    args = parser.parse_args()
+    print(f"Wrote derivatives for {backfill(boto3.client('s3'), args.bucket, args.prefix)} transcripts.")
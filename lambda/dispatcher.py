@@ -0,0 +1,288 @@
+"""
+Throttled dispatcher for transcription jobs.
+
+Uploads are queued instead of calling start_transcription_job right away. Each dispatch
+pass counts the pipeline's QUEUED/IN_PROGRESS Transcribe jobs, admits only as many queued
+uploads as fit under MAX_CONCURRENCY, and puts throttled starts back on the queue with
+jittered exponential backoff. A burst of hundreds of uploads therefore drains at a steady
+rate instead of failing against the service quota.
+
+Passes must not overlap: two passes that count the same running jobs would each claim the
+full headroom and together exceed MAX_CONCURRENCY. Only function.dispatch_handler runs
+them, deployed with a reserved concurrency of 1. A pass also holds the queue's dispatch
+lease where the backend can provide one, so overlapping passes on it admit nothing.
+
+Queue backends share one small interface (enqueue / claim / ack / retry / depth / dispatch_lease):
+    SQSQueue     - production, an SQS standard queue that nothing else consumes
+    SQLiteQueue  - a local file, for running the pipeline without AWS
+    MemoryQueue  - in-process, for tests
+"""
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from botocore.exceptions import ClientError
+
+THROTTLING_CODES = {'ThrottlingException', 'LimitExceededException', 'TooManyRequestsException', 'Throttling'}
+
+# `handle` is backend-specific (row id, receipt handle); `enqueued_at` is epoch seconds.
+QueueItem = namedtuple('QueueItem', ['handle', 'payload', 'enqueued_at', 'attempts'])
+
+def is_throttling_error(error):
+    return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') in THROTTLING_CODES
+
+def backoff_delay(attempts, base_delay, max_delay):
+    """Full-jitter exponential backoff: uniform in [0, min(max_delay, base_delay * 2^attempts)]."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** min(attempts, 32)))
+
+class MemoryQueue:
+    def __init__(self):
+        self._items = {}
+        self._next_id = 0
+        self._lease_until = 0.0
+        self._lock = threading.Lock()
+
+    def enqueue(self, payloads):
+        now = time.time()
+        with self._lock:
+            for payload in payloads:
+                self._next_id += 1
+                self._items[self._next_id] = {'payload': payload, 'enqueued_at': now, 'visible_at': now, 'attempts': 0}
+
+    def claim(self, limit, visibility_timeout):
+        """Hides up to `limit` visible items for `visibility_timeout` seconds and returns them, oldest first."""
+        now = time.time()
+        with self._lock:
+            due = sorted((item_id for item_id, item in self._items.items() if item['visible_at'] <= now))[:max(limit, 0)]
+            for item_id in due:
+                self._items[item_id]['visible_at'] = now + visibility_timeout
+            return [QueueItem(item_id, self._items[item_id]['payload'], self._items[item_id]['enqueued_at'], self._items[item_id]['attempts']) for item_id in due]
+
+    def ack(self, item):
+        with self._lock:
+            self._items.pop(item.handle, None)
+
+    def retry(self, item, delay):
+        with self._lock:
+            if item.handle in self._items:
+                self._items[item.handle]['visible_at'] = time.time() + delay
+                self._items[item.handle]['attempts'] = item.attempts + 1
+
+    def depth(self):
+        with self._lock:
+            return len(self._items)
+
+    @contextmanager
+    def dispatch_lease(self, ttl):
+        """Yields True if no other pass holds the lease; it expires after `ttl` seconds if never released."""
+        now = time.time()
+        with self._lock:
+            acquired = self._lease_until <= now
+            if acquired:
+                self._lease_until = now + ttl
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with self._lock:
+                    self._lease_until = 0.0
+
+class SQLiteQueue:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS dispatch_queue ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, enqueued_at REAL NOT NULL, "
+            "visible_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_dispatch_visible ON dispatch_queue (visible_at, id)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS dispatch_lease (id INTEGER PRIMARY KEY CHECK (id = 1), token TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def enqueue(self, payloads):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO dispatch_queue (payload, enqueued_at, visible_at) VALUES (?, ?, ?)",
+                [(json.dumps(payload), now, now) for payload in payloads]
+            )
+
+    def claim(self, limit, visibility_timeout):
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            rows = self._db.execute(
+                "SELECT id, payload, enqueued_at, attempts FROM dispatch_queue WHERE visible_at <= ? ORDER BY id LIMIT ?",
+                (now, max(limit, 0))
+            ).fetchall()
+            self._db.executemany("UPDATE dispatch_queue SET visible_at = ? WHERE id = ?", [(now + visibility_timeout, row[0]) for row in rows])
+            self._db.execute("COMMIT")
+        return [QueueItem(row[0], json.loads(row[1]), row[2], row[3]) for row in rows]
+
+    def ack(self, item):
+        with self._lock:
+            self._db.execute("DELETE FROM dispatch_queue WHERE id = ?", (item.handle,))
+
+    def retry(self, item, delay):
+        with self._lock:
+            self._db.execute(
+                "UPDATE dispatch_queue SET visible_at = ?, attempts = ? WHERE id = ?",
+                (time.time() + delay, item.attempts + 1, item.handle)
+            )
+
+    def depth(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM dispatch_queue").fetchone()[0]
+
+    @contextmanager
+    def dispatch_lease(self, ttl):
+        """Yields True if no other pass, in any process using this file, holds the lease."""
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            # Replaces only an expired lease; a live one leaves the row, and the count, unchanged.
+            acquired = self._db.execute(
+                "INSERT INTO dispatch_lease (id, token, expires_at) VALUES (1, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET token = excluded.token, expires_at = excluded.expires_at "
+                "WHERE dispatch_lease.expires_at <= ?",
+                (token, now + ttl, now)
+            ).rowcount == 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with self._lock:
+                    self._db.execute("DELETE FROM dispatch_lease WHERE token = ?", (token,))
+
+class SQSQueue:
+    def __init__(self, sqs_client, queue_url):
+        self._sqs = sqs_client
+        self._queue_url = queue_url
+
+    def enqueue(self, payloads):
+        payloads = list(payloads)
+        for start in range(0, len(payloads), 10):  # SQS batch limit
+            entries = [{'Id': str(i), 'MessageBody': json.dumps(payload)} for i, payload in enumerate(payloads[start:start + 10])]
+            failed = self._sqs.send_message_batch(QueueUrl=self._queue_url, Entries=entries).get('Failed', [])
+            if failed:
+                raise RuntimeError(f"Could not enqueue {len(failed)} uploads: {failed[0].get('Message')}")
+
+    def claim(self, limit, visibility_timeout):
+        items = []
+        while len(items) < limit:
+            messages = self._sqs.receive_message(
+                QueueUrl=self._queue_url,
+                MaxNumberOfMessages=min(10, limit - len(items)),
+                VisibilityTimeout=int(visibility_timeout),
+                AttributeNames=['SentTimestamp', 'ApproximateReceiveCount']
+            ).get('Messages', [])
+            if not messages:
+                break
+            items.extend(
+                QueueItem(
+                    message['ReceiptHandle'],
+                    json.loads(message['Body']),
+                    int(message['Attributes']['SentTimestamp']) / 1000,
+                    int(message['Attributes']['ApproximateReceiveCount']) - 1
+                )
+                for message in messages
+            )
+        return items
+
+    def ack(self, item):
+        self._sqs.delete_message(QueueUrl=self._queue_url, ReceiptHandle=item.handle)
+
+    def retry(self, item, delay):
+        # The message reappears after `delay`; SQS counts the attempt itself.
+        self._sqs.change_message_visibility(QueueUrl=self._queue_url, ReceiptHandle=item.handle, VisibilityTimeout=int(delay))
+
+    def depth(self):
+        attributes = self._sqs.get_queue_attributes(
+            QueueUrl=self._queue_url,
+            AttributeNames=['ApproximateNumberOfMessages', 'ApproximateNumberOfMessagesNotVisible']
+        )['Attributes']
+        return int(attributes['ApproximateNumberOfMessages']) + int(attributes['ApproximateNumberOfMessagesNotVisible'])
+
+    @contextmanager
+    def dispatch_lease(self, ttl):
+        """SQS has nowhere to keep a lease; passes are serialized by dispatch_handler's reserved concurrency of 1."""
+        yield True
+
+class Dispatcher:
+    """
+    Admits queued uploads up to `max_concurrency` running jobs. `start(payload)` starts one
+    job and returns a Lambda-style response: 429 means throttled, 5xx a transient failure;
+    both are retried with jittered backoff, anything else is done.
+    """
+    def __init__(self, queue, transcribe_client, start, max_concurrency, job_name_prefix,
+                 base_delay=2.0, max_delay=300.0, visibility_timeout=120, parallelism=8):
+        self.queue = queue
+        self.transcribe_client = transcribe_client
+        self.start = start
+        self.max_concurrency = max_concurrency
+        self.job_name_prefix = job_name_prefix
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.visibility_timeout = visibility_timeout
+        self.parallelism = max(parallelism, 1)
+
+    def in_flight(self):
+        """Number of the pipeline's jobs Transcribe is queuing or running."""
+        count = 0
+        for status in ('QUEUED', 'IN_PROGRESS'):
+            params = {'Status': status, 'JobNameContains': self.job_name_prefix, 'MaxResults': 100}
+            while True:
+                page = self.transcribe_client.list_transcription_jobs(**params)
+                count += len(page.get('TranscriptionJobSummaries', []))
+                if not page.get('NextToken'):
+                    break
+                params['NextToken'] = page['NextToken']
+        return count
+
+    def _run(self, item):
+        try:
+            status_code = self.start(item.payload)['statusCode']
+        except Exception as e:
+            print(f"Error dispatching {item.payload}: {e}")
+            status_code = 429 if is_throttling_error(e) else 500
+        if status_code == 429 or status_code >= 500:
+            self.queue.retry(item, backoff_delay(item.attempts, self.base_delay, self.max_delay))
+            return 'throttled' if status_code == 429 else 'failed'
+        self.queue.ack(item)
+        return 'dispatched'
+
+    def dispatch(self):
+        """
+        One admission pass. Returns queue depth, in-flight jobs and wait-time stats.
+        A pass that finds the dispatch lease held by another one admits nothing.
+        """
+        stats = {'admitted': 0, 'dispatched': 0, 'throttled': 0, 'failed': 0, 'max_wait_seconds': 0.0, 'avg_wait_seconds': 0.0}
+        # Held until the admitted jobs are started, so the next pass counts them.
+        with self.queue.dispatch_lease(self.visibility_timeout) as leased:
+            if not leased:
+                stats.update(in_flight=None, depth=self.queue.depth(), lease_held=True)
+                print(json.dumps({'dispatcher': stats}))
+                return stats
+            try:
+                in_flight = self.in_flight()
+            except ClientError as e:
+                # Listing is throttled too; admit nothing this pass rather than guess.
+                print(f"Could not count running transcription jobs: {e}")
+                in_flight = self.max_concurrency
+            items = self.queue.claim(self.max_concurrency - in_flight, self.visibility_timeout)
+            if items:
+                now = time.time()
+                waits = [now - item.enqueued_at for item in items]
+                stats.update(admitted=len(items), max_wait_seconds=round(max(waits), 3), avg_wait_seconds=round(sum(waits) / len(waits), 3))
+                with ThreadPoolExecutor(max_workers=min(self.parallelism, len(items))) as executor:
+                    for outcome in executor.map(self._run, items):
+                        stats[outcome] += 1
+        stats.update(in_flight=in_flight, depth=self.queue.depth())
+        print(json.dumps({'dispatcher': stats}))
+        return stats
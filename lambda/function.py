@@ -1,152 +1,417 @@
 import json
 import os
 import urllib.parse
+import urllib.request
 import boto3
-import time
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
 
-# Initialize AWS clients
-s3_client = boto3.client('s3')
-transcribe_client = boto3.client('transcribe')
+from derivatives import write_derivatives
+from dispatcher import Dispatcher, SQLiteQueue, SQSQueue, is_throttling_error
 
-def lambda_handler(event, context):
+# Transcription runs as two short Lambda invocations instead of one that polls:
+#   lambda_handler      - triggered by the S3 upload; starts the Transcribe job and returns.
+#   completion_handler  - triggered by the EventBridge "Transcribe Job State Change" event
+#                         when the job finishes; reports the transcript to the API.
+# Jobs are keyed by the audio's ETag, so redelivered events and re-uploads of the same
+# content reuse one job and its transcript instead of transcribing again.
+# With a dispatch queue configured, uploads are queued and started by dispatcher.Dispatcher
+# from dispatch_handler alone, which keeps the number of running jobs under
+# TRANSCRIBE_MAX_CONCURRENCY.
+# Every finished transcript gets compact .txt/.srt/.vtt derivatives next to it (derivatives.py).
+# The handlers take their boto3 clients as optional arguments, so they can be run locally with
+# clients wrapped in botocore.stub.Stubber.
+
+JOB_NAME_PREFIX = 'transcription-job-'
+SUPPORTED_FORMATS = ['flac', 'mp3', 'mp4', 'wav', 'amr', 'webm', 'ogg']
+# Jobs started in parallel per invocation (boto3 clients are thread-safe); at least one.
+START_CONCURRENCY = max(1, int(os.environ.get('TRANSCRIBE_START_CONCURRENCY', '8')))
+# Throttled dispatch (see dispatcher.py). DISPATCH_QUEUE_URL selects an SQS queue and
+# DISPATCH_QUEUE_SQLITE a local SQLite file; with neither, uploads are started immediately.
+DISPATCH_QUEUE_URL = os.environ.get('DISPATCH_QUEUE_URL')
+DISPATCH_QUEUE_SQLITE = os.environ.get('DISPATCH_QUEUE_SQLITE')
+MAX_CONCURRENCY = int(os.environ.get('TRANSCRIBE_MAX_CONCURRENCY', '100'))  # Stay below the account's Transcribe quota
+DISPATCH_RETRY_BASE_SECONDS = float(os.environ.get('DISPATCH_RETRY_BASE_SECONDS', '2'))
+DISPATCH_RETRY_MAX_SECONDS = float(os.environ.get('DISPATCH_RETRY_MAX_SECONDS', '300'))
+# Empty marker objects, one per upload waiting on another upload's job for the same content:
+# TranscriptionWaiters/{job name}/{url-quoted transcript key}
+WAITER_PREFIX = 'TranscriptionWaiters/'
+
+# AWS clients are created on first use, so importing this module needs no AWS configuration.
+_clients = {}
+
+def get_client(service):
+    if service not in _clients:
+        _clients[service] = boto3.client(service)
+    return _clients[service]
+
+_dispatch_queue = []
+
+def get_dispatch_queue():
+    """The configured dispatch queue backend, or None to start jobs immediately."""
+    if not _dispatch_queue:
+        if DISPATCH_QUEUE_URL:
+            _dispatch_queue.append(SQSQueue(get_client('sqs'), DISPATCH_QUEUE_URL))
+        elif DISPATCH_QUEUE_SQLITE:
+            _dispatch_queue.append(SQLiteQueue(DISPATCH_QUEUE_SQLITE))
+        else:
+            _dispatch_queue.append(None)
+    return _dispatch_queue[0]
+
+# Optional: report finished transcripts to the G7Static API so its transcript index
+# stays current. Both must be set; the token matches the API's INTERNAL_API_TOKEN.
+G7_API_URL = os.environ.get('G7_API_URL')
+G7_INTERNAL_TOKEN = os.environ.get('G7_INTERNAL_TOKEN')
+
+def notify_transcript_ready(transcript_key):
     """
-    AWS Lambda function to transcribe audio files uploaded to S3.
+    Tells the API a transcript was written. Failures are only logged: the API's
+    scripts/sync_transcripts.py backfill picks up anything that was missed.
+    """
+    if not (G7_API_URL and G7_INTERNAL_TOKEN):
+        return
+    request = urllib.request.Request(
+        f"{G7_API_URL.rstrip('/')}/internal/transcripts",
+        data=json.dumps({'key': transcript_key}).encode('utf-8'),
+        headers={'Content-Type': 'application/json', 'X-Internal-Token': G7_INTERNAL_TOKEN},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            print(f"Indexed transcript {transcript_key} (HTTP {response.status})")
+    except Exception as e:
+        print(f"Could not notify API about transcript {transcript_key}: {e}")
+
+def response(status_code, message):
+    return {
+        'statusCode': status_code,
+        'body': json.dumps(message)
+    }
+
+def content_job_name(etag):
+    """Job name derived from the audio's ETag, so the same content always maps to the same job."""
+    return JOB_NAME_PREFIX + etag.strip('"')
 
-    This function is triggered by an S3 PutObject event.
-    It starts an AWS Transcribe job for the uploaded audio file
-    and saves the transcription (JSON) to a specified S3 output path.
+def transcript_key_from_uri(transcript_uri, bucket_name=None):
     """
-    print(f"Received event: {json.dumps(event)}")
+    Extracts the S3 key from a Transcribe TranscriptFileUri such as
+    https://s3.us-east-1.amazonaws.com/{bucket}/StaticTranscription/{username}/{stem}.json
+    """
+    path = urllib.parse.unquote(urllib.parse.urlparse(transcript_uri).path).lstrip('/')
+    if bucket_name and path.startswith(f"{bucket_name}/"):
+        return path[len(bucket_name) + 1:]
+    # Path-style URIs always start with the bucket; drop it when the name is not known.
+    return path.split('/', 1)[1] if '/' in path else path
 
-    # 1. Extract information from the S3 event
+def _error_code(error):
+    return error.response.get('Error', {}).get('Code', '')
+
+def object_exists(s3_client, bucket_name, key):
     try:
-        # Get the bucket name and object key from the S3 event
-        bucket_name = event['Records'][0]['s3']['bucket']['name']
-        object_key = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'], encoding='utf-8')
-        print(f"Processing file: s3://{bucket_name}/{object_key}")
-    except KeyError as e:
-        print(f"Error extracting S3 event data: {e}")
-        return {
-            'statusCode': 400,
-            'body': json.dumps('Invalid S3 event structure.')
-        }
+        s3_client.head_object(Bucket=bucket_name, Key=key)
+        return True
+    except ClientError as e:
+        if _error_code(e) in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+def get_job(transcribe_client, job_name):
+    """The job's description, or None if Transcribe has no job with that name."""
+    try:
+        return transcribe_client.get_transcription_job(TranscriptionJobName=job_name)['TranscriptionJob']
+    except ClientError as e:
+        if _error_code(e) == 'BadRequestException':  # "The requested job couldn't be found."
+            return None
+        raise
+
+def job_transcript_key(job, bucket_name):
+    return transcript_key_from_uri(job['Transcript']['TranscriptFileUri'], bucket_name)
+
+def generate_derivatives(s3_client, bucket_name, transcript_key):
+    """
+    Writes the transcript's compact formats. Failures are only logged: the JSON is still
+    served, and `python derivatives.py --bucket ...` backfills missing derivatives.
+    """
+    try:
+        write_derivatives(s3_client, bucket_name, transcript_key)
+    except Exception as e:
+        print(f"Could not write derivatives of transcript {transcript_key}: {e}")
+
+def copy_transcript(s3_client, bucket_name, source_key, target_key):
+    """Reuses an existing transcript for an upload of the same content, and reports it to the API."""
+    if source_key != target_key:
+        s3_client.copy_object(Bucket=bucket_name, Key=target_key, CopySource={'Bucket': bucket_name, 'Key': source_key})
+        print(f"Copied transcript s3://{bucket_name}/{source_key} to {target_key}")
+        generate_derivatives(s3_client, bucket_name, target_key)
+    notify_transcript_ready(target_key)
+
+def waiter_key(job_name, transcription_output_key):
+    return f"{WAITER_PREFIX}{job_name}/{urllib.parse.quote(transcription_output_key, safe='')}"
+
+def deliver_to_waiters(s3_client, bucket_name, job_name, source_key):
+    """Copies a finished transcript to every output key registered while the job was running."""
+    params = {'Bucket': bucket_name, 'Prefix': f"{WAITER_PREFIX}{job_name}/"}
+    while True:
+        page = s3_client.list_objects_v2(**params)
+        for waiter in page.get('Contents', []):
+            target_key = urllib.parse.unquote(waiter['Key'].rsplit('/', 1)[1])
+            copy_transcript(s3_client, bucket_name, source_key, target_key)
+            s3_client.delete_object(Bucket=bucket_name, Key=waiter['Key'])
+        if not page.get('IsTruncated'):
+            return
+        params['ContinuationToken'] = page['NextContinuationToken']
+
+def reuse_job(job, bucket_name, media_uri, transcription_output_key, s3_client, transcribe_client):
+    """
+    Serves an upload from an existing job for the same content instead of starting another:
+    a finished job's transcript is copied, and a running one gets a waiter so the completion
+    handler copies it later. A redelivered event for the job's own object is a no-op.
+    """
+    job_name = job['TranscriptionJobName']
+    if job['TranscriptionJobStatus'] == 'COMPLETED':
+        copy_transcript(s3_client, bucket_name, job_transcript_key(job, bucket_name), transcription_output_key)
+        return response(200, f'Reused transcript of job {job_name}.')
+    if job.get('Media', {}).get('MediaFileUri') == media_uri:
+        print(f"Transcription job {job_name} is already running for {media_uri}.")
+        return response(200, f'Transcription job {job_name} already running.')
+
+    s3_client.put_object(Bucket=bucket_name, Key=waiter_key(job_name, transcription_output_key), Body=b'')
+    # The job may have finished before the waiter was written, in which case the
+    # completion handler has already run without it: check once more.
+    job = get_job(transcribe_client, job_name)
+    if job and job['TranscriptionJobStatus'] == 'COMPLETED':
+        deliver_to_waiters(s3_client, bucket_name, job_name, job_transcript_key(job, bucket_name))
+    print(f"Waiting for transcription job {job_name} to transcribe {media_uri}.")
+    return response(202, f'Waiting for transcription job {job_name}.')
+
+def start_transcription(bucket_name, object_key, etag, s3_client, transcribe_client):
+    """
+    Transcribes one uploaded audio object and returns the Lambda response.
+    The transcript is written to StaticTranscription/{username}/{audio stem}.json. Nothing is
+    started when that transcript already exists, and content that was already transcribed
+    (or is being transcribed) reuses the job named after its ETag.
+    """
+    print(f"Processing file: s3://{bucket_name}/{object_key}")
 
     # Ensure the object key starts with 'StaticAudio/' as expected
     if not object_key.startswith('StaticAudio/'):
         print(f"Skipping file {object_key} as it's not in the 'StaticAudio/' prefix.")
-        return {
-            'statusCode': 200,
-            'body': json.dumps('File not in expected prefix, skipping transcription.')
-        }
+        return response(200, 'File not in expected prefix, skipping transcription.')
 
     # Determine the username from the object key (e.g., StaticAudio/username/audio.mp3)
     # Split the key by '/' and get the second part
     parts = object_key.split('/')
     if len(parts) < 3:
         print(f"Object key {object_key} does not contain a username folder. Skipping.")
-        return {
-            'statusCode': 200,
-            'body': json.dumps('No username folder found in object key, skipping transcription.')
-        }
+        return response(200, 'No username folder found in object key, skipping transcription.')
     username = parts[1] # This assumes the structure is StaticAudio/username/filename.ext
 
     # Define the output path for the transcription
     # It will be s3://g7-static-files/StaticTranscription/{username}/audio_filename.json
     audio_filename_without_ext = os.path.splitext(os.path.basename(object_key))[0]
     transcription_output_key = f"StaticTranscription/{username}/{audio_filename_without_ext}.json"
-
-    # 2. Start the AWS Transcribe job
-    # Generate a unique job name (Transcribe job names must be unique)
-    # Using timestamp and a portion of the object key for uniqueness
-    # Replace spaces with hyphens to satisfy the regex pattern for job names
-    job_name = f"transcription-job-{int(time.time())}-{audio_filename_without_ext[:50]}".replace(' ', '-')
     media_format = object_key.split('.')[-1].lower() # Extract file extension for media format
 
     # Check for supported media formats
-    supported_formats = ['flac', 'mp3', 'mp4', 'wav', 'amr', 'webm', 'ogg']
-    if media_format not in supported_formats:
-        print(f"Unsupported media format: {media_format}. Supported formats are: {', '.join(supported_formats)}")
-        return {
-            'statusCode': 400,
-            'body': json.dumps(f"Unsupported media format: {media_format}")
-        }
+    if media_format not in SUPPORTED_FORMATS:
+        print(f"Unsupported media format: {media_format}. Supported formats are: {', '.join(SUPPORTED_FORMATS)}")
+        return response(400, f"Unsupported media format: {media_format}")
 
+    media_uri = f"s3://{bucket_name}/{object_key}"
     try:
-        # Define transcription settings
-        transcription_settings = {
-            'LanguageCode': 'en-US',  # You can change this to your audio's language
-            'MediaFormat': media_format,
-            'Media': {
-                'MediaFileUri': f"s3://{bucket_name}/{object_key}"
-            },
-            'OutputBucketName': bucket_name, # Output to the same bucket
-            'OutputKey': transcription_output_key # Specify the full output key
-        }
-
-        # If you want to enable speaker labeling, set 'ShowSpeakerLabels': True
-        # and provide a 'MaxSpeakerLabels' value between 2 and 10.
-        # Otherwise, do not include these settings to avoid BadRequestException.
-        # For now, we are removing MaxSpeakerLabels as ShowSpeakerLabels is False by default.
-        # If you later set ShowSpeakerLabels to True, you must re-add MaxSpeakerLabels.
-        if transcription_settings.get('ShowSpeakerLabels', False):
-            # Example if you wanted speaker labels:
-            # transcription_settings['Settings'] = {
-            #     'ShowSpeakerLabels': True,
-            #     'MaxSpeakerLabels': 2 # Example, adjust as needed (2-10)
-            # }
-            pass # No action needed if ShowSpeakerLabels is False or not present
-
-        transcribe_client.start_transcription_job(
-            TranscriptionJobName=job_name,
-            **transcription_settings # Unpack the dictionary into arguments
-        )
-        print(f"Started transcription job: {job_name} for s3://{bucket_name}/{object_key}")
-
-        # --- IMPORTANT NOTE ON LONG AUDIO FILES ---
-        # For very long audio files (e.g., > 5 minutes), the Lambda function
-        # might time out (max 15 minutes execution).
-        # A more robust solution for production would be:
-        # 1. This Lambda starts the job and exits.
-        # 2. Configure AWS Transcribe to send a notification (e.g., to SNS)
-        #    when the job completes.
-        # 3. Another Lambda function is triggered by that SNS notification
-        #    to fetch the transcription result and save it.
-        # For simplicity and demonstration, this example includes polling.
-        # Be aware of the 15-minute Lambda timeout.
-
-        # 3. Poll for transcription job completion (for shorter audio files)
-        max_attempts = 60 # Check every 10 seconds for up to 10 minutes
-        for attempt in range(max_attempts):
-            status_response = transcribe_client.get_transcription_job(TranscriptionJobName=job_name)
-            job_status = status_response['TranscriptionJob']['TranscriptionJobStatus']
-            print(f"Transcription job {job_name} status: {job_status}")
-
-            if job_status == 'COMPLETED':
-                print(f"Transcription job {job_name} completed.")
-                # The transcription is automatically saved to the specified OutputKey by Transcribe
-                print(f"Transcription saved to: s3://{bucket_name}/{transcription_output_key}")
-                return {
-                    'statusCode': 200,
-                    'body': json.dumps(f'Transcription job {job_name} completed and saved to S3.')
-                }
-            elif job_status == 'FAILED':
-                failure_reason = status_response['TranscriptionJob'].get('FailureReason', 'Unknown reason')
-                print(f"Transcription job {job_name} failed: {failure_reason}")
-                return {
-                    'statusCode': 500,
-                    'body': json.dumps(f'Transcription job {job_name} failed: {failure_reason}')
-                }
-            time.sleep(10) # Wait 10 seconds before checking again
-
-        print(f"Transcription job {job_name} did not complete within the allowed time.")
-        return {
-            'statusCode': 504,
-            'body': json.dumps(f'Transcription job {job_name} timed out.')
-        }
+        if object_exists(s3_client, bucket_name, transcription_output_key):
+            print(f"Transcript {transcription_output_key} already exists. Skipping.")
+            return response(200, 'Transcript already exists, skipping transcription.')
 
+        job_name = content_job_name(etag or s3_client.head_object(Bucket=bucket_name, Key=object_key)['ETag'])
+        job = get_job(transcribe_client, job_name)
+        if job and (job['TranscriptionJobStatus'] == 'FAILED' or (
+            job['TranscriptionJobStatus'] == 'COMPLETED'
+            and not object_exists(s3_client, bucket_name, job_transcript_key(job, bucket_name))
+        )):
+            # Nothing to reuse: the job failed, or its transcript has been deleted since.
+            transcribe_client.delete_transcription_job(TranscriptionJobName=job_name)
+            job = None
+        if job:
+            return reuse_job(job, bucket_name, media_uri, transcription_output_key, s3_client, transcribe_client)
+
+        try:
+            # If you want to enable speaker labeling, add
+            # 'Settings': {'ShowSpeakerLabels': True, 'MaxSpeakerLabels': 2} (2-10).
+            transcribe_client.start_transcription_job(
+                TranscriptionJobName=job_name,
+                LanguageCode='en-US',  # You can change this to your audio's language
+                MediaFormat=media_format,
+                Media={'MediaFileUri': media_uri},
+                OutputBucketName=bucket_name, # Output to the same bucket
+                OutputKey=transcription_output_key # Specify the full output key
+            )
+        except ClientError as e:
+            if _error_code(e) != 'ConflictException':
+                raise
+            # Another invocation started the job for the same content first.
+            return reuse_job(get_job(transcribe_client, job_name), bucket_name, media_uri, transcription_output_key, s3_client, transcribe_client)
+    except Exception as e:
+        print(f"Error starting transcription for {media_uri}: {e}")
+        if is_throttling_error(e):
+            return response(429, f'Throttled starting transcription: {str(e)}')
+        return response(500, f'Error transcribing audio: {str(e)}')
+
+    # Completion is handled by completion_handler when Transcribe emits the job's state change.
+    print(f"Started transcription job: {job_name} for {media_uri}")
+    return response(202, f'Transcription job {job_name} started.')
+
+def _s3_objects(record):
+    """(bucket, key, etag) for each object in one event record: a direct S3 record, or an SQS message carrying an S3 event."""
+    if 's3' in record:
+        s3_object = record['s3']['object']
+        return [(record['s3']['bucket']['name'], urllib.parse.unquote_plus(s3_object['key'], encoding='utf-8'), s3_object.get('eTag'))]
+    body = json.loads(record['body'])
+    return [item for inner in body.get('Records', []) for item in _s3_objects(inner)]
+
+def _record_id(record):
+    """Identifier Lambda expects in batchItemFailures: the SQS messageId, else the object key."""
+    return record.get('messageId') or record.get('s3', {}).get('object', {}).get('key', '')
+
+def _process_record(record, s3_client, transcribe_client, queue=None):
+    """Starts (or queues) the jobs for one record; returns True when it should be retried."""
+    try:
+        objects = _s3_objects(record)
+    except (KeyError, TypeError, ValueError) as e:
+        # Malformed records will never succeed, so they are dropped rather than retried.
+        print(f"Error extracting S3 event data: {e}")
+        return False
+    if queue is not None:
+        try:
+            queue.enqueue([{'bucket': bucket_name, 'key': object_key, 'etag': etag} for bucket_name, object_key, etag in objects])
+            return False
+        except Exception as e:
+            print(f"Error queueing {objects}: {e}")
+            return True
+    results = [start_transcription(bucket_name, object_key, etag, s3_client, transcribe_client) for bucket_name, object_key, etag in objects]
+    # Throttled starts (429) are retried along with other transient failures.
+    return any(result['statusCode'] == 429 or result['statusCode'] >= 500 for result in results)
+
+def dispatcher_for(queue, s3_client, transcribe_client):
+    return Dispatcher(
+        queue,
+        transcribe_client,
+        lambda payload: start_transcription(payload['bucket'], payload['key'], payload.get('etag'), s3_client, transcribe_client),
+        MAX_CONCURRENCY,
+        JOB_NAME_PREFIX,
+        base_delay=DISPATCH_RETRY_BASE_SECONDS,
+        max_delay=DISPATCH_RETRY_MAX_SECONDS,
+        parallelism=START_CONCURRENCY
+    )
+
+def lambda_handler(event, context, s3_client=None, transcribe_client=None, queue=None):
+    """
+    AWS Lambda function to transcribe audio files uploaded to S3.
+
+    This function is triggered by S3 PutObject events, delivered directly or through SQS.
+    Without a dispatch queue it starts an AWS Transcribe job for every uploaded audio file
+    in the batch, up to START_CONCURRENCY at a time, and returns without waiting for them.
+    With one, the uploads are only queued; dispatch_handler starts them as the
+    concurrency limit allows. For SQS batches, records that could not be started or
+    queued are listed in `batchItemFailures`, so only they are retried. Direct S3 invokes
+    are asynchronous and only retried when the handler raises, so there a failed record
+    fails the invocation.
+    """
+    print(f"Received event: {json.dumps(event)}")
+
+    records = event.get('Records') if isinstance(event, dict) else None
+    if not records:
+        print("Error extracting S3 event data: no Records")
+        return response(400, 'Invalid S3 event structure.')
+
+    s3_client = s3_client or get_client('s3')
+    transcribe_client = transcribe_client or get_client('transcribe')
+    queue = queue or get_dispatch_queue()
+    with ThreadPoolExecutor(max_workers=min(START_CONCURRENCY, len(records))) as executor:
+        retry = list(executor.map(lambda record: _process_record(record, s3_client, transcribe_client, queue), records))
+
+    failures = [{'itemIdentifier': _record_id(record)} for record, failed in zip(records, retry) if failed]
+    print(f"Processed {len(records)} records, {len(failures)} failed.")
+    result = response(500 if failures else 202, f'{len(records) - len(failures)} of {len(records)} records processed.')
+    result['batchItemFailures'] = failures
+    if failures and not any(record.get('eventSource') == 'aws:sqs' for record in records):
+        # Lambda ignores batchItemFailures on async invokes; only an error gets them retried.
+        raise RuntimeError(f"Failed to process records: {[failure['itemIdentifier'] for failure in failures]}")
+    return result
+
+def dispatch_handler(event, context, s3_client=None, transcribe_client=None, queue=None):
+    """
+    AWS Lambda function that drains the dispatch queue.
+
+    Triggered on a schedule (e.g. every minute). Runs dispatch passes until the queue has
+    nothing admissible left or the invocation is close to its timeout, and returns the
+    last pass's queue depth, in-flight count and wait times. This is the only handler that
+    dispatches; deploy it with a reserved concurrency of 1, so passes never overlap and
+    together admit more than TRANSCRIBE_MAX_CONCURRENCY.
+    """
+    queue = queue or get_dispatch_queue()
+    if queue is None:
+        return response(200, 'No dispatch queue configured.')
+    dispatcher = dispatcher_for(queue, s3_client or get_client('s3'), transcribe_client or get_client('transcribe'))
+    while True:
+        stats = dispatcher.dispatch()
+        remaining_ms = context.get_remaining_time_in_millis() if context else float('inf')
+        if stats['admitted'] == 0 or stats['throttled'] or remaining_ms < 30000:
+            break
+    result = response(200, f"Dispatch queue depth {stats['depth']}.")
+    result['dispatch'] = stats
+    return result
+
+def completion_handler(event, context, s3_client=None, transcribe_client=None):
+    """
+    AWS Lambda function for finished transcription jobs.
+
+    Triggered by an EventBridge rule on "Transcribe Job State Change" events with
+    TranscriptionJobStatus COMPLETED or FAILED. Completed transcripts are reported to the
+    API's transcript index (after their compact derivatives are written) and copied to
+    uploads of the same content that were waiting on the job; failures are logged with Transcribe's reason.
+    The freed slot is filled by the next scheduled dispatch_handler pass.
+    """
+    print(f"Received event: {json.dumps(event)}")
+
+    try:
+        detail = event['detail']
+        job_name = detail['TranscriptionJobName']
+        job_status = detail['TranscriptionJobStatus']
+    except KeyError as e:
+        print(f"Error extracting job state change data: {e}")
+        return response(400, 'Invalid job state change event structure.')
+
+    if not job_name.startswith(JOB_NAME_PREFIX):
+        print(f"Skipping job {job_name}: not started by this pipeline.")
+        return response(200, 'Job not started by this pipeline, skipping.')
+
+    transcribe_client = transcribe_client or get_client('transcribe')
+    s3_client = s3_client or get_client('s3')
+    try:
+        job = transcribe_client.get_transcription_job(TranscriptionJobName=job_name)['TranscriptionJob']
+    except Exception as e:
+        print(f"Error reading transcription job {job_name}: {e}")
+        return response(500, f'Error reading transcription job {job_name}: {str(e)}')
+
+    if job_status == 'FAILED':
+        # Waiting uploads are served once a later upload of the content restarts the job.
+        failure_reason = job.get('FailureReason', 'Unknown reason')
+        print(f"Transcription job {job_name} failed: {failure_reason}")
+        return response(200, f'Transcription job {job_name} failed: {failure_reason}')
+    if job_status != 'COMPLETED':
+        print(f"Ignoring transcription job {job_name} in state {job_status}.")
+        return response(200, f'Transcription job {job_name} is {job_status}.')
+
+    media_uri = job.get('Media', {}).get('MediaFileUri', '')
+    bucket_name = urllib.parse.urlparse(media_uri).netloc or None
+    transcription_output_key = job_transcript_key(job, bucket_name)
+    print(f"Transcription job {job_name} completed. Transcription saved to: s3://{bucket_name}/{transcription_output_key}")
+    generate_derivatives(s3_client, bucket_name, transcription_output_key)
+    notify_transcript_ready(transcription_output_key)
+    try:
+        deliver_to_waiters(s3_client, bucket_name, job_name, transcription_output_key)
     except Exception as e:
-        print(f"Error during transcription process: {e}")
-        return {
-            'statusCode': 500,
-            'body': json.dumps(f'Error transcribing audio: {str(e)}')
-        }
+        print(f"Error copying transcript of job {job_name} to waiting uploads: {e}")
+        return response(500, f'Error copying transcript of job {job_name}: {str(e)}')
+    return response(200, f'Transcription job {job_name} completed and saved to S3.')
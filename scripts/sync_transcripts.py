@@ -0,0 +1,42 @@
+# scripts/sync_transcripts.py
+"""
+Backfill / repair the transcripts table from S3.
+
+Lists the whole transcript prefix page by page (following ContinuationToken, so buckets
+with more than 1000 transcripts are fully covered) and upserts one row per object:
+    python scripts/sync_transcripts.py            # add or refresh rows
+    python scripts/sync_transcripts.py --prune    # also drop rows whose object is gone
+    python scripts/sync_transcripts.py --search   # also index text of transcripts not yet searchable
+
+Run it once after deploying the transcripts table, and again whenever the index may
+have missed notifications from the Lambda.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db.database import SessionLocal, init_db  # noqa: E402
+from src.utils.aws import async_s3_client  # noqa: E402
+from src.utils.transcripts import sync_transcripts  # noqa: E402
+
+async def main(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        stats = await sync_transcripts(db, async_s3_client, prune=args.prune, index_text=args.search)
+    finally:
+        db.close()
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prune", action="store_true", help="Delete index rows whose S3 object no longer exists")
+    parser.add_argument("--search", action="store_true", help="Index the text of transcripts that are not searchable yet")
+    parser.add_argument("--skip-init", action="store_true", help="Do not create missing tables first")
+    cli_args = parser.parse_args()
+    if not cli_args.skip_init:
+        init_db()
+    asyncio.run(main(cli_args))
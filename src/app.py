@@ -1,16 +1,38 @@
 # src/app.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from src.routes.auth import auth_router
 from src.routes.upload import upload_router
 from src.routes.files import files_router
+from src.routes.internal import internal_router
+from src.routes.metrics import metrics_router
+from src.routes.debug import debug_router
 from src.config import Config
-from src.log import logger
+from src.log import RequestIdMiddleware, get_logger, queue_handler
+from src.metrics import (
+    LOG_QUEUE_DEPTH, LOG_RECORDS_DROPPED, USER_CACHE_HITS, USER_CACHE_MISSES, USER_CACHE_SIZE, MetricsMiddleware
+)
+from src.profiling import ProfilingMiddleware
+from src.utils.aws import async_s3_client
+from src.utils.deletion import deletion_worker
+from src.utils.user_cache import user_cache
+
+logger = get_logger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Drain the S3 deletion outbox in the background while the app runs.
+    if Config.DELETION_WORKER_ENABLED:
+        deletion_worker.start(async_s3_client)
+    yield
+    await deletion_worker.stop()
 
 app = FastAPI(
     title=Config.APP_NAME,
     version=Config.APP_VERSION,
-    description="G7Static Backend API for user authentication and file uploads."
+    description="G7Static Backend API for user authentication and file uploads.",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -25,11 +47,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Request-ID"],  # Pagination cursor for /files/audio and /files/transcripts; log correlation ID
 )
 
+# Not installed at all unless enabled, so unprofiled deployments pay nothing
+if Config.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Outside profiling, so profiled requests' log lines carry their request ID too
+app.add_middleware(RequestIdMiddleware)
+
+# Outermost, so request latency includes every other middleware
+if Config.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    LOG_QUEUE_DEPTH.set_function(queue_handler.queue.qsize)
+    LOG_RECORDS_DROPPED.set_function(lambda: queue_handler.dropped)
+    USER_CACHE_HITS.set_function(lambda: user_cache.hits)
+    USER_CACHE_MISSES.set_function(lambda: user_cache.misses)
+    USER_CACHE_SIZE.set_function(user_cache.backend.size)
+
 app.include_router(auth_router)
 app.include_router(upload_router)
 app.include_router(files_router)
+app.include_router(internal_router)
+app.include_router(metrics_router)
+app.include_router(debug_router)
 
 @app.get('/')
 def greet() -> str:
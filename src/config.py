@@ -28,6 +28,9 @@ class Config:
     MYSQL_DATABASE: str = os.getenv("MYSQL_DATABASE")
     MYSQL_POOL_SIZE: int = int(os.getenv("MYSQL_POOL_SIZE"))
     MYSQL_POOL_RECYCLE: int = int(os.getenv("MYSQL_POOL_RECYCLE"))
+    DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL")  # e.g. sqlite:///./g7static.db; defaults to pymysql with the settings above
+    DB_ASYNC_MODE: bool = os.getenv("DB_ASYNC_MODE", "false").lower() == "true"  # Native AsyncSession repositories
+    ASYNC_DATABASE_URL: Optional[str] = os.getenv("ASYNC_DATABASE_URL")  # e.g. sqlite+aiosqlite:///./g7static.db; defaults to aiomysql
 
     # Application Settings
     APP_NAME: str = os.getenv("APP_NAME")
@@ -36,6 +39,57 @@ class Config:
     APP_HOST: str = os.getenv("APP_HOST")
     FRONTEND_ORIGINS: Union[str, list[str]] = os.getenv("FRONTEND_ORIGINS")
     MAX_UPLOAD_FILE_SIZE_MB: int = int(os.getenv("MAX_UPLOAD_FILE_SIZE_MB"))
+    INTERNAL_API_TOKEN: Optional[str] = os.getenv("INTERNAL_API_TOKEN")  # Shared with the Lambda; /internal is off when unset
+
+    # Concurrency Settings
+    IO_THREAD_POOL_SIZE: int = int(os.getenv("IO_THREAD_POOL_SIZE", "32"))  # Workers for blocking S3/DB calls
+    S3_MULTIPART_PART_SIZE_MB: int = int(os.getenv("S3_MULTIPART_PART_SIZE_MB", "8"))  # Minimum 5 (S3 limit)
+    S3_MULTIPART_CONCURRENCY: int = int(os.getenv("S3_MULTIPART_CONCURRENCY", "4"))  # Parts in flight per upload
+    S3_MULTIPART_POOL_SIZE: int = int(os.getenv("S3_MULTIPART_POOL_SIZE", "16"))  # Part workers shared by all uploads
+    S3_PRESIGNED_PART_EXPIRY_SECONDS: int = int(os.getenv("S3_PRESIGNED_PART_EXPIRY_SECONDS", "3600"))  # Direct-to-S3 part URLs
+
+    # Authenticated-User Cache
+    USER_CACHE_ENABLED: bool = os.getenv("USER_CACHE_ENABLED", "true").lower() == "true"
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+    USER_CACHE_MAX_SIZE: int = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+    USER_CACHE_BACKEND: str = os.getenv("USER_CACHE_BACKEND", "memory").lower()  # "memory" or "redis"
+    USER_CACHE_REDIS_URL: str = os.getenv("USER_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+    # Presigned Download URL Cache
+    PRESIGNED_URL_EXPIRY_SECONDS: int = int(os.getenv("PRESIGNED_URL_EXPIRY_SECONDS", "3600"))
+    PRESIGNED_URL_REFRESH_MARGIN_SECONDS: int = int(os.getenv("PRESIGNED_URL_REFRESH_MARGIN_SECONDS", "300"))  # Re-sign when less is left
+    PRESIGNED_URL_CACHE_ENABLED: bool = os.getenv("PRESIGNED_URL_CACHE_ENABLED", "true").lower() == "true"
+    PRESIGNED_URL_CACHE_MAX_SIZE: int = int(os.getenv("PRESIGNED_URL_CACHE_MAX_SIZE", "10000"))
+
+    # Background S3 Deletion Queue
+    DELETION_WORKER_ENABLED: bool = os.getenv("DELETION_WORKER_ENABLED", "true").lower() == "true"  # Drain pending_deletions in this process
+    DELETION_POLL_INTERVAL_SECONDS: float = float(os.getenv("DELETION_POLL_INTERVAL_SECONDS", "10"))
+    DELETION_BATCH_SIZE: int = int(os.getenv("DELETION_BATCH_SIZE", "1000"))  # Keys per DeleteObjects call (max 1000)
+    DELETION_RETRY_BASE_SECONDS: int = int(os.getenv("DELETION_RETRY_BASE_SECONDS", "30"))  # Doubles after each failed attempt
+    DELETION_RETRY_MAX_SECONDS: int = int(os.getenv("DELETION_RETRY_MAX_SECONDS", "3600"))
+
+    # Content-Addressed Storage: audio shared across users by content, with reference counts
+    CONTENT_ADDRESSED_STORAGE: bool = os.getenv("CONTENT_ADDRESSED_STORAGE", "false").lower() == "true"
+    SHARED_CONTENT_OWNER: str = "shared-content"  # Key folder for shared audio; '-' keeps it out of the username space
+
+    # Audio Header Probe: reject uploads whose bytes are not the audio their extension claims
+    AUDIO_PROBE_ENABLED: bool = os.getenv("AUDIO_PROBE_ENABLED", "true").lower() == "true"
+
+    # Metrics (Prometheus text format on /metrics)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN: Optional[str] = os.getenv("METRICS_TOKEN")  # Bearer token scrapers must send; /metrics is 404 without one
+
+    # Request Profiling (span trees, optional CPU stacks, served on /debug/profiles)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_TOKEN: Optional[str] = os.getenv("PROFILING_TOKEN")  # Sent as X-Profile to profile a request; also guards /debug
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))  # Fraction of all requests profiled
+    PROFILING_BUFFER_SIZE: int = int(os.getenv("PROFILING_BUFFER_SIZE", "200"))  # Profiles kept, newest first
+    PROFILING_CPU_INTERVAL_MS: float = float(os.getenv("PROFILING_CPU_INTERVAL_MS", "5"))  # Stack sampling interval
+
+    # Password Hashing Pool
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))  # Waiting calls before 503
+    PASSWORD_HASH_USE_PROCESSES: bool = os.getenv("PASSWORD_HASH_USE_PROCESSES", "false").lower() == "true"
 
     # JWT Settings
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY")
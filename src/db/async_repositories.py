@@ -0,0 +1,445 @@
+# src/db/async_repositories.py
+"""
+AsyncSession-backed repositories for G7Static's native async database mode.
+They mirror UserRepository and FileRepository method for method, so routes can use
+either one through the awaitable helpers at the bottom of this module.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, update, and_, or_
+from src.db.repositories import (
+    UserRepository, FileRepository, TranscriptRepository, BlobRepository, DeletionRepository, FileCursor, TranscriptCursor, Segment,
+    file_page_query, content_match_query, transcript_page_query, segment_search_query, stored_stem_query, blob_stem_query, blob_owners_query, match_stored_stem, due_deletions_query, lease_deletions
+)
+from src.models.models import User, File, Transcript, PendingDeletion, TranscriptSegment, ContentBlob
+from src.utils.concurrency import AsyncProxy, run_io
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple, Callable, Union
+from datetime import datetime
+import uuid
+from collections import Counter
+
+if TYPE_CHECKING:
+    # Imported for annotations only: sqlalchemy.ext.asyncio needs greenlet,
+    # which sync-mode deployments do not have to install.
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+class AsyncUserRepository:
+    def __init__(self, db: "AsyncSession"):
+        self.db = db
+
+    async def create_user(self, username: str, password: str, created_by: str = "system") -> User:
+        """
+        Create a new user.
+        The password argument should be the HASHED password.
+        """
+        user = User(
+            username=username,
+            hashed_password=password, # Use the provided password hash directly
+            created_by=created_by,
+            updated_by=created_by
+        )
+        self.db.add(user)
+        await self.db.flush()  # Get the ID without committing
+        return user
+
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        """Get a user by username."""
+        return await self.db.scalar(
+            select(User).where(
+                and_(
+                    User.username == username,
+                    User.status == 'active'
+                )
+            )
+        )
+
+    async def update_status(self, user: User, status: str, updated_by: str) -> User:
+        """
+        Change a user's status (e.g. 'active' -> 'inactive').
+        The authenticated-user cache drops the user once the transaction commits.
+        """
+        user.status = status
+        user.updated_by = updated_by
+        await self.db.flush()
+        return user
+
+class AsyncFileRepository:
+    def __init__(self, db: "AsyncSession"):
+        self.db = db
+
+    async def create_file(self, user_id: int, file_data: Dict[str, Any], created_by: str) -> File:
+        """Create a new file record. Uses `file_data['file_id']` when the upload's S3 key was built from it."""
+        file = File(
+            user_id=user_id,
+            file_id=file_data.get('file_id') or str(uuid.uuid4()),
+            original_filename=file_data['original_filename'],
+            stored_filename=file_data['stored_filename'],
+            md5_hash=file_data.get('md5_hash'),
+            content_etag=file_data.get('content_etag'),
+            s3_key=file_data['s3_key'],
+            file_size=file_data['file_size'],
+            mime_type=file_data['mime_type'],
+            duration_seconds=file_data.get('duration_seconds'),
+            sample_rate=file_data.get('sample_rate'),
+            channels=file_data.get('channels'),
+            blob_id=file_data.get('blob_id'),
+            created_by=created_by,
+            updated_by=created_by
+        )
+        self.db.add(file)
+        await self.db.flush()  # Get the ID without committing
+        return file
+
+    async def get_file_by_hash(self, user_id: int, md5_hash: str) -> Optional[File]:
+        """Get a file by MD5 hash and user ID."""
+        return await self.db.scalar(
+            select(File).where(
+                and_(
+                    File.user_id == user_id,
+                    File.md5_hash == md5_hash,
+                    File.status == 'active'
+                )
+            )
+        )
+
+    async def get_files_by_hashes(self, user_id: int, md5_hashes: List[str]) -> List[File]:
+        """Get a user's active files matching any of the given MD5 hashes, in one query."""
+        if not md5_hashes:
+            return []
+        result = await self.db.scalars(
+            select(File).where(
+                and_(
+                    File.user_id == user_id,
+                    File.md5_hash.in_(md5_hashes),
+                    File.status == 'active'
+                )
+            )
+        )
+        return result.all()
+
+    async def get_files_by_content(self, user_id: int, md5_hashes: List[str], content_etags: List[str]) -> List[File]:
+        """Get a user's active files matching any of the given MD5 hashes or content ETags, in one query."""
+        if not md5_hashes and not content_etags:
+            return []
+        result = await self.db.scalars(content_match_query(user_id, md5_hashes, content_etags))
+        return result.all()
+
+    async def get_file_by_file_id(self, user_id: int, file_id: str) -> Optional[File]:
+        """Get a file by its public file_id and user ID."""
+        return await self.db.scalar(
+            select(File).where(
+                and_(
+                    File.user_id == user_id,
+                    File.file_id == file_id,
+                    File.status == 'active'
+                )
+            )
+        )
+
+    async def get_file_keys_by_file_ids(self, user_id: int, file_ids: List[str]) -> Dict[str, str]:
+        """Map a user's active file_ids to their S3 keys, in one query. Unknown ids are left out."""
+        if not file_ids:
+            return {}
+        result = await self.db.execute(
+            select(File.file_id, File.s3_key).where(
+                and_(
+                    File.user_id == user_id,
+                    File.file_id.in_(file_ids),
+                    File.status == 'active'
+                )
+            )
+        )
+        return dict(result.all())
+
+    async def delete_file(self, file_to_delete: File) -> None:
+        """Schedules a File object for deletion from the database."""
+        await self.db.delete(file_to_delete)
+
+    async def get_files_for_delete(self, user_id: int, file_ids: List[str]) -> List[Any]:
+        """Get (id, file_id, s3_key, blob_id) rows for a user's active files among the given file_ids, in one query."""
+        if not file_ids:
+            return []
+        result = await self.db.execute(
+            select(File.id, File.file_id, File.s3_key, File.blob_id).where(
+                and_(
+                    File.user_id == user_id,
+                    File.file_id.in_(file_ids),
+                    File.status == 'active'
+                )
+            )
+        )
+        return result.all()
+
+    async def delete_files_by_ids(self, ids: List[int]) -> int:
+        """Delete file rows in bulk; returns how many were removed."""
+        if not ids:
+            return 0
+        result = await self.db.execute(delete(File).where(File.id.in_(ids)))
+        return result.rowcount
+
+    async def get_files_page(self, user_id: int, limit: int, cursor: Optional[FileCursor] = None) -> List[Any]:
+        """Get one page of a user's files as lightweight rows, newest first."""
+        result = await self.db.execute(file_page_query(user_id, limit, cursor))
+        return result.all()
+
+    async def get_file_by_stored_stem(self, user_id: int, stem: str) -> Optional[File]:
+        """Get the file a transcript was produced from, by its stored filename without extension."""
+        result = await self.db.scalars(stored_stem_query(user_id, stem))
+        return match_stored_stem(result.all(), stem)
+
+    async def get_files_by_user_id(self, user_id: int) -> List[File]:
+        """Get all files for a user."""
+        result = await self.db.scalars(
+            select(File).where(
+                and_(
+                    File.user_id == user_id,
+                    File.status == 'active'
+                )
+            ).order_by(File.created_at.desc())
+        )
+        return result.all()
+
+class AsyncTranscriptRepository:
+    def __init__(self, db: "AsyncSession"):
+        self.db = db
+
+    async def upsert_transcript(self, user_id: int, file_id: Optional[int], transcript_data: Dict[str, Any], updated_by: str) -> Transcript:
+        """Record a transcript, or refresh the size and completion time of a known one."""
+        transcript = await self.db.scalar(select(Transcript).where(Transcript.s3_key == transcript_data['s3_key']))
+        if transcript is None:
+            transcript = Transcript(user_id=user_id, s3_key=transcript_data['s3_key'], created_by=updated_by)
+            self.db.add(transcript)
+        transcript.file_id = file_id
+        transcript.file_size = transcript_data['file_size']
+        transcript.completed_at = transcript_data['completed_at']
+        transcript.updated_by = updated_by
+        await self.db.flush()
+        return transcript
+
+    async def get_transcript_by_key(self, user_id: int, s3_key: str) -> Optional[Transcript]:
+        """Get a user's transcript by its S3 key."""
+        return await self.db.scalar(
+            select(Transcript).where(
+                and_(
+                    Transcript.user_id == user_id,
+                    Transcript.s3_key == s3_key
+                )
+            )
+        )
+
+    async def get_existing_keys(self, user_id: int, s3_keys: List[str]) -> List[str]:
+        """Return which of the given transcript keys are indexed for the user, in one query."""
+        if not s3_keys:
+            return []
+        result = await self.db.scalars(
+            select(Transcript.s3_key).where(
+                and_(
+                    Transcript.user_id == user_id,
+                    Transcript.s3_key.in_(s3_keys)
+                )
+            )
+        )
+        return result.all()
+
+    async def get_transcripts_for_delete(self, user_id: int, s3_keys: List[str], file_row_ids: List[int]) -> List[Any]:
+        """Get (id, s3_key) rows for a user's transcripts matching the given keys or produced from the given files."""
+        if not s3_keys and not file_row_ids:
+            return []
+        result = await self.db.execute(
+            select(Transcript.id, Transcript.s3_key).where(
+                and_(
+                    Transcript.user_id == user_id,
+                    or_(Transcript.s3_key.in_(s3_keys), Transcript.file_id.in_(file_row_ids))
+                )
+            )
+        )
+        return result.all()
+
+    async def get_transcripts_page(self, user_id: int, limit: int, cursor: Optional[TranscriptCursor] = None) -> List[Any]:
+        """Get one page of a user's transcripts as lightweight rows, newest first."""
+        result = await self.db.execute(transcript_page_query(user_id, limit, cursor))
+        return result.all()
+
+    async def get_all_keys(self) -> Dict[str, int]:
+        """Map every indexed transcript key to its row id (used by the S3 backfill)."""
+        result = await self.db.execute(select(Transcript.s3_key, Transcript.id))
+        return dict(result.all())
+
+    async def delete_transcript(self, transcript: Transcript) -> None:
+        """Schedules a Transcript object and its search segments for deletion from the database."""
+        await self.db.execute(delete(TranscriptSegment).where(TranscriptSegment.transcript_id == transcript.id))
+        await self.db.delete(transcript)
+
+    async def delete_transcripts_by_ids(self, ids: List[int]) -> int:
+        """Delete transcript rows and their search segments in bulk; returns how many transcripts were removed."""
+        if not ids:
+            return 0
+        await self.db.execute(delete(TranscriptSegment).where(TranscriptSegment.transcript_id.in_(ids)))
+        result = await self.db.execute(delete(Transcript).where(Transcript.id.in_(ids)))
+        return result.rowcount
+
+    async def replace_segments(self, transcript: Transcript, segments: List[Segment]) -> int:
+        """Re-index a transcript's text: drops its old segments and adds the given ones."""
+        await self.db.execute(delete(TranscriptSegment).where(TranscriptSegment.transcript_id == transcript.id))
+        self.db.add_all([
+            TranscriptSegment(transcript_id=transcript.id, user_id=transcript.user_id, start_time=start, end_time=end, text=text)
+            for start, end, text in segments
+        ])
+        await self.db.flush()
+        return len(segments)
+
+    async def get_segmented_transcript_ids(self) -> List[int]:
+        """Ids of transcripts whose text is already in the search index (used by the S3 backfill)."""
+        result = await self.db.scalars(select(TranscriptSegment.transcript_id).distinct())
+        return result.all()
+
+    async def search_segments(self, user_id: int, terms: List[str], limit: int) -> List[Any]:
+        """Full-text search over a user's transcript segments, best match first."""
+        dialect = self.db.get_bind().dialect.name
+        result = await self.db.execute(segment_search_query(dialect, user_id, terms, limit))
+        return result.all()
+
+class AsyncBlobRepository:
+    def __init__(self, db: "AsyncSession"):
+        self.db = db
+
+    async def get_blob_by_content(self, md5_hash: str, file_size: int) -> Optional[ContentBlob]:
+        """Get the shared blob holding this content, if any."""
+        return await self.db.scalar(
+            select(ContentBlob).where(
+                and_(
+                    ContentBlob.md5_hash == md5_hash,
+                    ContentBlob.file_size == file_size
+                )
+            )
+        )
+
+    async def create_blob(self, blob_data: Dict[str, Any]) -> ContentBlob:
+        """Record newly stored content with one reference. Raises IntegrityError if another upload stored it first."""
+        blob = ContentBlob(ref_count=1, **blob_data)
+        self.db.add(blob)
+        await self.db.flush()
+        return blob
+
+    async def add_reference(self, blob_id: int) -> bool:
+        """
+        Count one more file using the blob, in one conditional UPDATE that is safe under
+        concurrent uploads and deletes. Returns False when the blob has no references left,
+        i.e. a delete released it and its row and objects are going away.
+        """
+        result = await self.db.execute(
+            update(ContentBlob)
+            .where(and_(ContentBlob.id == blob_id, ContentBlob.ref_count > 0))
+            .values(ref_count=ContentBlob.ref_count + 1)
+        )
+        return result.rowcount > 0
+
+    async def forget(self, blob: ContentBlob) -> None:
+        """
+        Drop a blob whose row another session deleted from this session, so a new row
+        for the same content can take its primary key without clashing in the identity map.
+        """
+        if blob in self.db:
+            self.db.expunge(blob)
+
+    async def release(self, blob_ids: List[int]) -> List[ContentBlob]:
+        """
+        Drop one reference per entry in `blob_ids` and delete the blobs nobody uses any more.
+        Returns the deleted blobs, whose objects the caller queues for removal.
+        """
+        if not blob_ids:
+            return []
+        await self.db.flush()  # File rows deleted through the session must go before their blobs
+        for blob_id, count in Counter(blob_ids).items():
+            await self.db.execute(update(ContentBlob).where(ContentBlob.id == blob_id).values(ref_count=ContentBlob.ref_count - count))
+        result = await self.db.scalars(
+            select(ContentBlob).where(and_(ContentBlob.id.in_(set(blob_ids)), ContentBlob.ref_count <= 0)).with_for_update()
+        )
+        unused = result.all()
+        if unused:
+            await self.db.execute(delete(ContentBlob).where(ContentBlob.id.in_([blob.id for blob in unused])))
+        return unused
+
+    async def get_blob_by_stored_stem(self, stem: str) -> Optional[ContentBlob]:
+        """Get the blob whose object is named `stem` plus an extension."""
+        return await self.db.scalar(blob_stem_query(stem))
+
+    async def set_transcript_key(self, blob: ContentBlob, transcript_key: str) -> None:
+        blob.transcript_key = transcript_key
+        await self.db.flush()
+
+    async def get_blob_owners(self, blob_id: int) -> List[Tuple[str, str]]:
+        """(username, stored_filename) of every active file referencing the blob."""
+        result = await self.db.execute(blob_owners_query(blob_id))
+        return result.all()
+
+class AsyncDeletionRepository:
+    def __init__(self, db: "AsyncSession"):
+        self.db = db
+
+    async def enqueue(self, s3_keys: List[str], created_by: str, now: datetime) -> None:
+        """Schedule S3 objects for deletion. The caller commits together with the row delete."""
+        self.db.add_all([
+            PendingDeletion(s3_key=s3_key, attempts=0, next_attempt_at=now, created_by=created_by)
+            for s3_key in dict.fromkeys(s3_keys)
+        ])
+
+    async def claim_due(self, now: datetime, limit: int, backoff: Callable[[int], float]) -> List[Tuple[int, str]]:
+        """Lease up to `limit` due rows and return their (id, s3_key). The caller commits."""
+        result = await self.db.scalars(due_deletions_query(now, limit))
+        claimed = lease_deletions(result.all(), now, backoff)
+        await self.db.flush()
+        return claimed
+
+    async def delete_by_ids(self, ids: List[int]) -> int:
+        """Remove finished outbox rows; returns how many were removed."""
+        if not ids:
+            return 0
+        result = await self.db.execute(delete(PendingDeletion).where(PendingDeletion.id.in_(ids)))
+        return result.rowcount
+
+    async def record_errors(self, errors: Dict[int, str]) -> None:
+        """Store the latest failure message on each row that is due for a retry."""
+        for row_id, error in errors.items():
+            await self.db.execute(update(PendingDeletion).where(PendingDeletion.id == row_id).values(last_error=error[:1024]))
+
+# --- Mode-independent helpers ---
+# Routes receive whichever session `get_db` is configured to yield and use these
+# helpers, which return awaitable repositories for both modes: the sync ones run in
+# the I/O pool for a Session, and native async ones for an AsyncSession.
+
+def user_repository(db: Union[Session, "AsyncSession"]) -> Union[AsyncProxy, AsyncUserRepository]:
+    if isinstance(db, Session):
+        return AsyncProxy(UserRepository(db))
+    return AsyncUserRepository(db)
+
+def file_repository(db: Union[Session, "AsyncSession"]) -> Union[AsyncProxy, AsyncFileRepository]:
+    if isinstance(db, Session):
+        return AsyncProxy(FileRepository(db))
+    return AsyncFileRepository(db)
+
+def transcript_repository(db: Union[Session, "AsyncSession"]) -> Union[AsyncProxy, AsyncTranscriptRepository]:
+    if isinstance(db, Session):
+        return AsyncProxy(TranscriptRepository(db))
+    return AsyncTranscriptRepository(db)
+
+def blob_repository(db: Union[Session, "AsyncSession"]) -> Union[AsyncProxy, AsyncBlobRepository]:
+    if isinstance(db, Session):
+        return AsyncProxy(BlobRepository(db))
+    return AsyncBlobRepository(db)
+
+def deletion_repository(db: Union[Session, "AsyncSession"]) -> Union[AsyncProxy, AsyncDeletionRepository]:
+    if isinstance(db, Session):
+        return AsyncProxy(DeletionRepository(db))
+    return AsyncDeletionRepository(db)
+
+async def commit(db: Union[Session, "AsyncSession"]) -> None:
+    if isinstance(db, Session):
+        await run_io(db.commit)
+    else:
+        await db.commit()
+
+async def rollback(db: Union[Session, "AsyncSession"]) -> None:
+    if isinstance(db, Session):
+        await run_io(db.rollback)
+    else:
+        await db.rollback()
@@ -7,30 +7,42 @@ from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
 from src.config import Config
 from sqlalchemy.pool import QueuePool
-from contextlib import contextmanager
-from typing import Generator
-from src.log import logger
+from contextlib import contextmanager, asynccontextmanager
+from typing import Any, AsyncGenerator, Generator
+from src.log import get_logger
+from src.metrics import instrument_engine
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
 
+logger = get_logger(__name__)
+
 # Create SQLAlchemy base class for declarative models
 Base = declarative_base()
 
 # Create SQLAlchemy engine with connection pooling
-DATABASE_URL = (
+DATABASE_URL = Config.DATABASE_URL or (
     f"mysql+pymysql://{Config.MYSQL_USER}:{Config.MYSQL_PASSWORD}@"
     f"{Config.MYSQL_HOST}:{Config.MYSQL_PORT}/{Config.MYSQL_DATABASE}"
 )
 
-engine = create_engine(
-    DATABASE_URL,
-    poolclass=QueuePool,
-    pool_size=Config.MYSQL_POOL_SIZE,
-    max_overflow=10,
-    pool_timeout=30,
-    pool_recycle=Config.MYSQL_POOL_RECYCLE,
-    pool_pre_ping=True,  # Enable connection health checks
-    echo=False  # Set to True for SQL query logging (useful for debugging)
-)
+def create_sync_db_engine(url: str = DATABASE_URL) -> Any:
+    """Builds the sync engine; pool settings only apply to server databases."""
+    if url.startswith("sqlite"):
+        # Sessions are used from the I/O pool's threads
+        return create_engine(url, connect_args={"check_same_thread": False}, echo=False)
+    return create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=Config.MYSQL_POOL_SIZE,
+        max_overflow=10,
+        pool_timeout=30,
+        pool_recycle=Config.MYSQL_POOL_RECYCLE,
+        pool_pre_ping=True,  # Enable connection health checks
+        echo=False  # Set to True for SQL query logging (useful for debugging)
+    )
+
+engine = create_sync_db_engine()
+if Config.METRICS_ENABLED:
+    instrument_engine(engine, "sync")
 
 # Create sessionmaker
 SessionLocal = sessionmaker(
@@ -39,7 +51,45 @@ SessionLocal = sessionmaker(
     autoflush=False
 )
 
-def get_db() -> Generator[Session, None, None]:
+# Optional native async engine (aiomysql in production, aiosqlite for local testing).
+# sqlalchemy.ext.asyncio (and its greenlet dependency) plus the async driver are only
+# imported when DB_ASYNC_MODE is enabled.
+ASYNC_DATABASE_URL = Config.ASYNC_DATABASE_URL or (
+    f"mysql+aiomysql://{Config.MYSQL_USER}:{Config.MYSQL_PASSWORD}@"
+    f"{Config.MYSQL_HOST}:{Config.MYSQL_PORT}/{Config.MYSQL_DATABASE}"
+)
+
+def create_async_db_engine(url: str = ASYNC_DATABASE_URL) -> Any:
+    """Builds the async engine; pool settings only apply to server databases."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    pool_kwargs = {} if url.startswith("sqlite") else {
+        "pool_size": Config.MYSQL_POOL_SIZE,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_recycle": Config.MYSQL_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+    return create_async_engine(url, echo=False, **pool_kwargs)
+
+async_engine = None
+AsyncSessionLocal = None
+# The session type routes receive from `get_db`
+DbSession: Any = Session
+
+if Config.DB_ASYNC_MODE:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    async_engine = create_async_db_engine()
+    if Config.METRICS_ENABLED:
+        instrument_engine(async_engine.sync_engine, "async")
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine,
+        autoflush=False,
+        expire_on_commit=False  # Expired attributes cannot lazy-load under asyncio
+    )
+    DbSession = AsyncSession
+
+def get_sync_db() -> Generator[Session, None, None]:
     """
     Dependency that provides a database session and ensures it's closed.
     """
@@ -49,25 +99,53 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+async def get_async_db() -> AsyncGenerator[Any, None]:
+    """
+    Dependency that provides a native AsyncSession and ensures it's closed.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@asynccontextmanager
+async def open_db_session() -> AsyncGenerator[Any, None]:
+    """
+    Session of the configured mode for background tasks that run outside a request.
+    """
+    if Config.DB_ASYNC_MODE:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+# The dependency routes use: native async sessions when DB_ASYNC_MODE is on,
+# otherwise sync sessions whose calls routes run in the I/O pool.
+get_db = get_async_db if Config.DB_ASYNC_MODE else get_sync_db
+
 def init_db() -> None:
     """
     Initialize database by creating the database if it doesn't exist,
     then creating all tables within it.
     Also attempts to test the database connection.
+    A DATABASE_URL database is expected to exist already (SQLite creates its file).
     """
     logger.info("Attempting to initialize database...")
     try:
-        # First, connect to MySQL without specifying a database to create it if it doesn't exist
-        temp_engine_url = (
-            f"mysql+pymysql://{Config.MYSQL_USER}:{Config.MYSQL_PASSWORD}@"
-            f"{Config.MYSQL_HOST}:{Config.MYSQL_PORT}/" # Connect without a specific database
-        )
-        temp_engine = create_engine(temp_engine_url)
-
-        with temp_engine.connect() as connection:
-            connection.execute(text(f"CREATE DATABASE IF NOT EXISTS {Config.MYSQL_DATABASE}"))
-            connection.commit() # Commit the database creation
-        logger.info(f"Database '{Config.MYSQL_DATABASE}' ensured to exist.")
+        if not Config.DATABASE_URL:
+            # First, connect to MySQL without specifying a database to create it if it doesn't exist
+            temp_engine_url = (
+                f"mysql+pymysql://{Config.MYSQL_USER}:{Config.MYSQL_PASSWORD}@"
+                f"{Config.MYSQL_HOST}:{Config.MYSQL_PORT}/" # Connect without a specific database
+            )
+            temp_engine = create_engine(temp_engine_url)
+
+            with temp_engine.connect() as connection:
+                connection.execute(text(f"CREATE DATABASE IF NOT EXISTS {Config.MYSQL_DATABASE}"))
+                connection.commit() # Commit the database creation
+            logger.info("Database '%s' ensured to exist.", Config.MYSQL_DATABASE)
 
         # Now, proceed with the main engine (which connects to the specific database)
         # Test connection by trying to connect
@@ -77,17 +155,29 @@ def init_db() -> None:
 
         # Import models here to ensure they are registered with Base.metadata
         # This prevents circular imports if models import Base from this file
-        from src.models.models import User, File # noqa: F401, E501
+        from src.models.models import User, File, Transcript, PendingDeletion, TranscriptSegment, ContentBlob # noqa: F401, E501
 
         # Create tables
         Base.metadata.create_all(bind=engine)
         logger.info("All database tables created or already exist.")
     except OperationalError as e:
-        logger.error(f"Database connection or creation failed: {e}")
+        logger.error("Database connection or creation failed: %s", e)
         raise ConnectionRefusedError(f"Could not connect to or create the database. Please check connection details and ensure the MySQL server is running: {e}")
     except SQLAlchemyError as e:
-        logger.error(f"SQLAlchemy error during database initialization: {e}", exc_info=True)
+        logger.error("SQLAlchemy error during database initialization: %s", e, exc_info=True)
         raise RuntimeError(f"Database initialization failed due to a SQLAlchemy error: {e}")
     except Exception as e:
-        logger.error(f"An unexpected error occurred during database initialization: {e}", exc_info=True)
-        raise RuntimeError(f"An unexpected error occurred during database initialization: {e}")
\ No newline at end of file
+        logger.error("An unexpected error occurred during database initialization: %s", e, exc_info=True)
+        raise RuntimeError(f"An unexpected error occurred during database initialization: {e}")
+
+async def init_async_db() -> None:
+    """
+    Create all tables through the async engine.
+    Used when DB_ASYNC_MODE points ASYNC_DATABASE_URL at a database that init_db()
+    does not manage, such as a local aiosqlite file.
+    """
+    from src.models.models import User, File, Transcript, PendingDeletion, TranscriptSegment, ContentBlob # noqa: F401, E501
+
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    logger.info("All database tables created or already exist (async engine).")
\ No newline at end of file
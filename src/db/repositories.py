@@ -4,11 +4,160 @@ Database repositories for G7Static.
 Implements clean, reusable database access patterns.
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import select, and_
-from src.models.models import User, File
-from typing import Optional, Dict, Any, List
+from sqlalchemy import select, delete, update, and_, or_, func, literal_column, table, column, Select
+from sqlalchemy.dialects.mysql import match
+from src.models.models import User, File, Transcript, PendingDeletion, TranscriptSegment, ContentBlob
+from typing import Optional, Dict, Any, List, Tuple, Callable
+from collections import Counter
+from datetime import datetime, timedelta
+import os
 import uuid
 
+# Cursor for keyset pagination over a user's files: (created_at, id) of the last row seen.
+FileCursor = Tuple[datetime, int]
+# Same idea for transcripts: (completed_at, id) of the last row seen.
+TranscriptCursor = Tuple[datetime, int]
+# A timed piece of transcript text: (start seconds, end seconds, text).
+Segment = Tuple[float, float, str]
+
+# SQLite's FTS5 mirror of transcript_segments.text (see models.py); rowid is the segment id.
+segments_fts = table('transcript_segments_fts', column('rowid'))
+
+def file_page_query(user_id: int, limit: int, cursor: Optional[FileCursor] = None) -> Select:
+    """
+    Builds the keyset-paginated listing query, newest first.
+    Selects only the columns FileDetail needs plus `id` for the next cursor, and is
+    served by the (user_id, status, created_at, id) index.
+    """
+    query = select(
+        File.id, File.file_id, File.original_filename, File.file_size, File.created_at,
+        File.duration_seconds, File.sample_rate, File.channels
+    ).where(
+        and_(
+            File.user_id == user_id,
+            File.status == 'active'
+        )
+    )
+    if cursor is not None:
+        created_at, last_id = cursor
+        query = query.where(
+            or_(
+                File.created_at < created_at,
+                and_(File.created_at == created_at, File.id < last_id)
+            )
+        )
+    return query.order_by(File.created_at.desc(), File.id.desc()).limit(limit)
+
+def content_match_query(user_id: int, md5_hashes: List[str], content_etags: List[str]) -> Select:
+    """A user's active files whose MD5 or content ETag is among the given ones."""
+    return select(File).where(
+        and_(
+            File.user_id == user_id,
+            or_(File.md5_hash.in_(md5_hashes), File.content_etag.in_(content_etags)),
+            File.status == 'active'
+        )
+    )
+
+def transcript_page_query(user_id: int, limit: int, cursor: Optional[TranscriptCursor] = None) -> Select:
+    """
+    Builds the keyset-paginated transcript listing query, newest first.
+    Columns are labelled to match TranscriptDetail; served by the (user_id, completed_at, id) index.
+    """
+    query = select(
+        Transcript.id,
+        Transcript.s3_key.label('key'),
+        Transcript.file_size.label('size'),
+        Transcript.completed_at.label('last_modified')
+    ).where(Transcript.user_id == user_id)
+    if cursor is not None:
+        completed_at, last_id = cursor
+        query = query.where(
+            or_(
+                Transcript.completed_at < completed_at,
+                and_(Transcript.completed_at == completed_at, Transcript.id < last_id)
+            )
+        )
+    return query.order_by(Transcript.completed_at.desc(), Transcript.id.desc()).limit(limit)
+
+def segment_search_query(dialect: str, user_id: int, terms: List[str], limit: int) -> Select:
+    """
+    Builds the ranked full-text search over a user's transcript segments, best match first.
+    SQLite matches all terms through FTS5 and ranks by BM25; MySQL uses the FULLTEXT index
+    in natural language mode and ranks by relevance.
+    """
+    if dialect == 'sqlite':
+        fts_table = literal_column('transcript_segments_fts')
+        score = -func.bm25(fts_table)  # bm25() is lower for better matches
+        fts_query = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        matched = select().select_from(TranscriptSegment).join(
+            segments_fts, segments_fts.c.rowid == TranscriptSegment.id
+        ).where(fts_table.op('MATCH')(fts_query))
+    else:
+        score = match(TranscriptSegment.text, against=' '.join(terms)).in_natural_language_mode()
+        matched = select().select_from(TranscriptSegment).where(score > 0)
+    return matched.add_columns(
+        Transcript.s3_key.label('key'),
+        File.file_id,
+        TranscriptSegment.start_time,
+        TranscriptSegment.end_time,
+        TranscriptSegment.text.label('snippet'),
+        score.label('score')
+    ).join(
+        Transcript, Transcript.id == TranscriptSegment.transcript_id
+    ).outerjoin(
+        File, File.id == Transcript.file_id
+    ).where(
+        TranscriptSegment.user_id == user_id
+    ).order_by(literal_column('score').desc(), TranscriptSegment.id).limit(limit)
+
+def stored_stem_query(user_id: int, stem: str) -> Select:
+    """
+    Finds a user's active files whose stored filename is `stem` plus an extension,
+    e.g. 'meeting' -> 'meeting.mp3'. The caller still checks the stem exactly.
+    """
+    pattern = stem.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '.%'
+    return select(File).where(
+        and_(
+            File.user_id == user_id,
+            File.stored_filename.like(pattern, escape='\\'),
+            File.status == 'active'
+        )
+    ).order_by(File.created_at.desc())
+
+def blob_stem_query(stem: str) -> Select:
+    """Finds the blob stored as `.../{stem}.{ext}`, e.g. for the transcript of its object."""
+    pattern = '%/' + stem.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '.%'
+    return select(ContentBlob).where(ContentBlob.s3_key.like(pattern, escape='\\'))
+
+def blob_owners_query(blob_id: int) -> Select:
+    """(username, stored_filename) of every active file that references the blob."""
+    return select(User.username, File.stored_filename).join(User, User.id == File.user_id).where(
+        and_(
+            File.blob_id == blob_id,
+            File.status == 'active'
+        )
+    )
+
+def due_deletions_query(now: datetime, limit: int) -> Select:
+    """
+    Selects outbox rows that are due, oldest first. Rows are locked with SKIP LOCKED so
+    several API workers can drain the table without claiming the same rows (ignored on SQLite).
+    """
+    return select(PendingDeletion).where(
+        PendingDeletion.next_attempt_at <= now
+    ).order_by(PendingDeletion.next_attempt_at, PendingDeletion.id).limit(limit).with_for_update(skip_locked=True)
+
+def lease_deletions(rows: List[PendingDeletion], now: datetime, backoff: Callable[[int], float]) -> List[Tuple[int, str]]:
+    """Counts an attempt on each row and pushes it to its retry time, so a crashed worker's rows come back later."""
+    for row in rows:
+        row.attempts += 1
+        row.next_attempt_at = now + timedelta(seconds=backoff(row.attempts))
+    return [(row.id, row.s3_key) for row in rows]
+
+def match_stored_stem(files: List[File], stem: str) -> Optional[File]:
+    """Returns the newest file whose stored filename minus extension is exactly `stem`."""
+    return next((f for f in files if os.path.splitext(f.stored_filename)[0] == stem), None)
+
 class UserRepository:
     def __init__(self, db: Session):
         self.db = db
@@ -39,21 +188,36 @@ class UserRepository:
             )
         )
 
+    def update_status(self, user: User, status: str, updated_by: str) -> User:
+        """
+        Change a user's status (e.g. 'active' -> 'inactive').
+        The authenticated-user cache drops the user once the transaction commits.
+        """
+        user.status = status
+        user.updated_by = updated_by
+        self.db.flush()
+        return user
+
 class FileRepository:
     def __init__(self, db: Session):
         self.db = db
 
     def create_file(self, user_id: int, file_data: Dict[str, Any], created_by: str) -> File:
-        """Create a new file record."""
+        """Create a new file record. Uses `file_data['file_id']` when the upload's S3 key was built from it."""
         file = File(
             user_id=user_id,
-            file_id=str(uuid.uuid4()),
+            file_id=file_data.get('file_id') or str(uuid.uuid4()),
             original_filename=file_data['original_filename'],
             stored_filename=file_data['stored_filename'],
-            md5_hash=file_data['md5_hash'],
+            md5_hash=file_data.get('md5_hash'),
+            content_etag=file_data.get('content_etag'),
             s3_key=file_data['s3_key'],
             file_size=file_data['file_size'],
             mime_type=file_data['mime_type'],
+            duration_seconds=file_data.get('duration_seconds'),
+            sample_rate=file_data.get('sample_rate'),
+            channels=file_data.get('channels'),
+            blob_id=file_data.get('blob_id'),
             created_by=created_by,
             updated_by=created_by
         )
@@ -73,6 +237,26 @@ class FileRepository:
             )
         )
         
+    def get_files_by_hashes(self, user_id: int, md5_hashes: List[str]) -> List[File]:
+        """Get a user's active files matching any of the given MD5 hashes, in one query."""
+        if not md5_hashes:
+            return []
+        return self.db.scalars(
+            select(File).where(
+                and_(
+                    File.user_id == user_id,
+                    File.md5_hash.in_(md5_hashes),
+                    File.status == 'active'
+                )
+            )
+        ).all()
+
+    def get_files_by_content(self, user_id: int, md5_hashes: List[str], content_etags: List[str]) -> List[File]:
+        """Get a user's active files matching any of the given MD5 hashes or content ETags, in one query."""
+        if not md5_hashes and not content_etags:
+            return []
+        return self.db.scalars(content_match_query(user_id, md5_hashes, content_etags)).all()
+
     def get_file_by_file_id(self, user_id: int, file_id: str) -> Optional[File]:
         """Get a file by its public file_id and user ID."""
         return self.db.scalar(
@@ -85,10 +269,52 @@ class FileRepository:
             )
         )
 
+    def get_file_keys_by_file_ids(self, user_id: int, file_ids: List[str]) -> Dict[str, str]:
+        """Map a user's active file_ids to their S3 keys, in one query. Unknown ids are left out."""
+        if not file_ids:
+            return {}
+        return dict(self.db.execute(
+            select(File.file_id, File.s3_key).where(
+                and_(
+                    File.user_id == user_id,
+                    File.file_id.in_(file_ids),
+                    File.status == 'active'
+                )
+            )
+        ).all())
+
     def delete_file(self, file_to_delete: File) -> None:
         """Schedules a File object for deletion from the database."""
         self.db.delete(file_to_delete)
 
+    def get_files_for_delete(self, user_id: int, file_ids: List[str]) -> List[Any]:
+        """Get (id, file_id, s3_key, blob_id) rows for a user's active files among the given file_ids, in one query."""
+        if not file_ids:
+            return []
+        return self.db.execute(
+            select(File.id, File.file_id, File.s3_key, File.blob_id).where(
+                and_(
+                    File.user_id == user_id,
+                    File.file_id.in_(file_ids),
+                    File.status == 'active'
+                )
+            )
+        ).all()
+
+    def delete_files_by_ids(self, ids: List[int]) -> int:
+        """Delete file rows in bulk; returns how many were removed."""
+        if not ids:
+            return 0
+        return self.db.execute(delete(File).where(File.id.in_(ids))).rowcount
+
+    def get_files_page(self, user_id: int, limit: int, cursor: Optional[FileCursor] = None) -> List[Any]:
+        """Get one page of a user's files as lightweight rows, newest first."""
+        return self.db.execute(file_page_query(user_id, limit, cursor)).all()
+
+    def get_file_by_stored_stem(self, user_id: int, stem: str) -> Optional[File]:
+        """Get the file a transcript was produced from, by its stored filename without extension."""
+        return match_stored_stem(self.db.scalars(stored_stem_query(user_id, stem)).all(), stem)
+
     def get_files_by_user_id(self, user_id: int) -> List[File]:
         """Get all files for a user."""
         return self.db.scalars(
@@ -98,4 +324,198 @@ class FileRepository:
                     File.status == 'active'
                 )
             ).order_by(File.created_at.desc())
-        ).all()
\ No newline at end of file
+        ).all()
+
+class TranscriptRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def upsert_transcript(self, user_id: int, file_id: Optional[int], transcript_data: Dict[str, Any], updated_by: str) -> Transcript:
+        """Record a transcript, or refresh the size and completion time of a known one."""
+        transcript = self.db.scalar(select(Transcript).where(Transcript.s3_key == transcript_data['s3_key']))
+        if transcript is None:
+            transcript = Transcript(user_id=user_id, s3_key=transcript_data['s3_key'], created_by=updated_by)
+            self.db.add(transcript)
+        transcript.file_id = file_id
+        transcript.file_size = transcript_data['file_size']
+        transcript.completed_at = transcript_data['completed_at']
+        transcript.updated_by = updated_by
+        self.db.flush()
+        return transcript
+
+    def get_transcript_by_key(self, user_id: int, s3_key: str) -> Optional[Transcript]:
+        """Get a user's transcript by its S3 key."""
+        return self.db.scalar(
+            select(Transcript).where(
+                and_(
+                    Transcript.user_id == user_id,
+                    Transcript.s3_key == s3_key
+                )
+            )
+        )
+
+    def get_existing_keys(self, user_id: int, s3_keys: List[str]) -> List[str]:
+        """Return which of the given transcript keys are indexed for the user, in one query."""
+        if not s3_keys:
+            return []
+        return self.db.scalars(
+            select(Transcript.s3_key).where(
+                and_(
+                    Transcript.user_id == user_id,
+                    Transcript.s3_key.in_(s3_keys)
+                )
+            )
+        ).all()
+
+    def get_transcripts_for_delete(self, user_id: int, s3_keys: List[str], file_row_ids: List[int]) -> List[Any]:
+        """Get (id, s3_key) rows for a user's transcripts matching the given keys or produced from the given files."""
+        if not s3_keys and not file_row_ids:
+            return []
+        return self.db.execute(
+            select(Transcript.id, Transcript.s3_key).where(
+                and_(
+                    Transcript.user_id == user_id,
+                    or_(Transcript.s3_key.in_(s3_keys), Transcript.file_id.in_(file_row_ids))
+                )
+            )
+        ).all()
+
+    def get_transcripts_page(self, user_id: int, limit: int, cursor: Optional[TranscriptCursor] = None) -> List[Any]:
+        """Get one page of a user's transcripts as lightweight rows, newest first."""
+        return self.db.execute(transcript_page_query(user_id, limit, cursor)).all()
+
+    def get_all_keys(self) -> Dict[str, int]:
+        """Map every indexed transcript key to its row id (used by the S3 backfill)."""
+        return dict(self.db.execute(select(Transcript.s3_key, Transcript.id)).all())
+
+    def delete_transcript(self, transcript: Transcript) -> None:
+        """Schedules a Transcript object and its search segments for deletion from the database."""
+        self.db.execute(delete(TranscriptSegment).where(TranscriptSegment.transcript_id == transcript.id))
+        self.db.delete(transcript)
+
+    def delete_transcripts_by_ids(self, ids: List[int]) -> int:
+        """Delete transcript rows and their search segments in bulk; returns how many transcripts were removed."""
+        if not ids:
+            return 0
+        self.db.execute(delete(TranscriptSegment).where(TranscriptSegment.transcript_id.in_(ids)))
+        return self.db.execute(delete(Transcript).where(Transcript.id.in_(ids))).rowcount
+
+    def replace_segments(self, transcript: Transcript, segments: List[Segment]) -> int:
+        """Re-index a transcript's text: drops its old segments and adds the given ones."""
+        self.db.execute(delete(TranscriptSegment).where(TranscriptSegment.transcript_id == transcript.id))
+        self.db.add_all([
+            TranscriptSegment(transcript_id=transcript.id, user_id=transcript.user_id, start_time=start, end_time=end, text=text)
+            for start, end, text in segments
+        ])
+        self.db.flush()
+        return len(segments)
+
+    def get_segmented_transcript_ids(self) -> List[int]:
+        """Ids of transcripts whose text is already in the search index (used by the S3 backfill)."""
+        return self.db.scalars(select(TranscriptSegment.transcript_id).distinct()).all()
+
+    def search_segments(self, user_id: int, terms: List[str], limit: int) -> List[Any]:
+        """Full-text search over a user's transcript segments, best match first."""
+        dialect = self.db.get_bind().dialect.name
+        return self.db.execute(segment_search_query(dialect, user_id, terms, limit)).all()
+
+class BlobRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_blob_by_content(self, md5_hash: str, file_size: int) -> Optional[ContentBlob]:
+        """Get the shared blob holding this content, if any."""
+        return self.db.scalar(
+            select(ContentBlob).where(
+                and_(
+                    ContentBlob.md5_hash == md5_hash,
+                    ContentBlob.file_size == file_size
+                )
+            )
+        )
+
+    def create_blob(self, blob_data: Dict[str, Any]) -> ContentBlob:
+        """Record newly stored content with one reference. Raises IntegrityError if another upload stored it first."""
+        blob = ContentBlob(ref_count=1, **blob_data)
+        self.db.add(blob)
+        self.db.flush()
+        return blob
+
+    def add_reference(self, blob_id: int) -> bool:
+        """
+        Count one more file using the blob, in one conditional UPDATE that is safe under
+        concurrent uploads and deletes. Returns False when the blob has no references left,
+        i.e. a delete released it and its row and objects are going away.
+        """
+        result = self.db.execute(
+            update(ContentBlob)
+            .where(and_(ContentBlob.id == blob_id, ContentBlob.ref_count > 0))
+            .values(ref_count=ContentBlob.ref_count + 1)
+        )
+        return result.rowcount > 0
+
+    def forget(self, blob: ContentBlob) -> None:
+        """
+        Drop a blob whose row another session deleted from this session, so a new row
+        for the same content can take its primary key without clashing in the identity map.
+        """
+        if blob in self.db:
+            self.db.expunge(blob)
+
+    def release(self, blob_ids: List[int]) -> List[ContentBlob]:
+        """
+        Drop one reference per entry in `blob_ids` and delete the blobs nobody uses any more.
+        Returns the deleted blobs, whose objects the caller queues for removal.
+        """
+        if not blob_ids:
+            return []
+        self.db.flush()  # File rows deleted through the session must go before their blobs
+        for blob_id, count in Counter(blob_ids).items():
+            self.db.execute(update(ContentBlob).where(ContentBlob.id == blob_id).values(ref_count=ContentBlob.ref_count - count))
+        unused = self.db.scalars(
+            select(ContentBlob).where(and_(ContentBlob.id.in_(set(blob_ids)), ContentBlob.ref_count <= 0)).with_for_update()
+        ).all()
+        if unused:
+            self.db.execute(delete(ContentBlob).where(ContentBlob.id.in_([blob.id for blob in unused])))
+        return unused
+
+    def get_blob_by_stored_stem(self, stem: str) -> Optional[ContentBlob]:
+        """Get the blob whose object is named `stem` plus an extension."""
+        return self.db.scalar(blob_stem_query(stem))
+
+    def set_transcript_key(self, blob: ContentBlob, transcript_key: str) -> None:
+        blob.transcript_key = transcript_key
+        self.db.flush()
+
+    def get_blob_owners(self, blob_id: int) -> List[Tuple[str, str]]:
+        """(username, stored_filename) of every active file referencing the blob."""
+        return self.db.execute(blob_owners_query(blob_id)).all()
+
+class DeletionRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, s3_keys: List[str], created_by: str, now: datetime) -> None:
+        """Schedule S3 objects for deletion. The caller commits together with the row delete."""
+        self.db.add_all([
+            PendingDeletion(s3_key=s3_key, attempts=0, next_attempt_at=now, created_by=created_by)
+            for s3_key in dict.fromkeys(s3_keys)
+        ])
+
+    def claim_due(self, now: datetime, limit: int, backoff: Callable[[int], float]) -> List[Tuple[int, str]]:
+        """Lease up to `limit` due rows and return their (id, s3_key). The caller commits."""
+        rows = self.db.scalars(due_deletions_query(now, limit)).all()
+        claimed = lease_deletions(rows, now, backoff)
+        self.db.flush()
+        return claimed
+
+    def delete_by_ids(self, ids: List[int]) -> int:
+        """Remove finished outbox rows; returns how many were removed."""
+        if not ids:
+            return 0
+        return self.db.execute(delete(PendingDeletion).where(PendingDeletion.id.in_(ids))).rowcount
+
+    def record_errors(self, errors: Dict[int, str]) -> None:
+        """Store the latest failure message on each row that is due for a retry."""
+        for row_id, error in errors.items():
+            self.db.execute(update(PendingDeletion).where(PendingDeletion.id == row_id).values(last_error=error[:1024]))
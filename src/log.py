@@ -1,36 +1,210 @@
 # src/log.py
 """
 Logging configuration for G7Static.
-Sets up a logger with both console and file handlers, configurable log level, and professional formatting.
+Modules log through children of the "G7StaticLogs" logger (`get_logger(__name__)`). The
+logging thread only renders the message and puts the record on an in-memory queue; a
+background listener thread writes it to the console and to a size-rotated file, so slow
+disks or terminals never add to request latency. When the queue is full, records are
+dropped and counted instead of blocking the request.
+
+LOG_FORMAT=json writes one JSON object per line, carrying the ID and user of the request
+that logged it. LOG_SAMPLING keeps a fraction of the DEBUG and INFO lines of chosen
+loggers, e.g. "routes.files=0.1,routes.auth=0.5"; warnings and errors are always kept.
 """
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
+import random
+import re
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 LOG_FILE = os.getenv("LOG_FILE", "g7static.log")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # 'text' or 'json'
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # 0 disables rotation
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+
+ROOT_LOGGER_NAME = "G7StaticLogs"
+REQUEST_ID_HEADER = b'x-request-id'
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')  # Client-supplied IDs end up in log lines
+
+_request_id: ContextVar[Optional[str]] = ContextVar('g7_request_id', default=None)
+_user: ContextVar[Optional[str]] = ContextVar('g7_log_user', default=None)
+
+def get_logger(name: str) -> logging.Logger:
+    """Child of the G7Static logger for a module, e.g. `get_logger(__name__)` in src/routes/files.py -> G7StaticLogs.routes.files."""
+    return logging.getLogger(ROOT_LOGGER_NAME).getChild(name.removeprefix("src."))
+
+def bind_user(username: Optional[str]) -> None:
+    """Attaches the authenticated user to the log records of the rest of the current request."""
+    _user.set(username)
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the current request's ID and user. Runs in the logging thread, where the context variables live."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        record.user = _user.get()
+        return True
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """Parses "routes.files=0.1,routes.auth=0.5" into full logger names and keep-rates."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, rate = item.partition('=')
+        name = name.strip()
+        if name != ROOT_LOGGER_NAME and not name.startswith(ROOT_LOGGER_NAME + '.'):
+            name = f"{ROOT_LOGGER_NAME}.{name}"
+        value = float(rate)
+        if not 0.0 <= value <= 1.0:
+            raise ValueError(f"LOG_SAMPLING rate for '{name}' must be between 0 and 1, got {rate}")
+        rates[name] = value
+    return rates
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a random fraction of the DEBUG and INFO records of the configured loggers. A
+    logger without its own rate uses its nearest configured ancestor's.
+    """
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            candidate = name
+            while candidate and candidate not in self.rates:
+                candidate = candidate.rpartition('.')[0]
+            rate = self._resolved[name] = self.rates.get(candidate, 1.0)
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
 
-logger = logging.getLogger("G7StaticLogs")
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message, request_id, user and any exception."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'user': getattr(record, 'user', None),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queues records for the listener thread, dropping (and counting) them when the queue is full."""
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message and traceback now, while the arguments are still valid, but
+        # leave the layout to the listener's formatters so JSON keeps separate fields.
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_traceback_formatter = logging.Formatter()
+
+def build_pipeline(handlers: List[logging.Handler], sampling: Optional[Dict[str, float]] = None,
+                   queue_size: int = LOG_QUEUE_SIZE) -> Tuple[NonBlockingQueueHandler, QueueListener]:
+    """Queue handler for the loggers plus the (not yet started) listener that feeds `handlers`."""
+    queue_handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+    if sampling:
+        queue_handler.addFilter(SamplingFilter(sampling))  # Before the context filter, so dropped records cost less
+    queue_handler.addFilter(RequestContextFilter())
+    return queue_handler, QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+
+class RequestIdMiddleware:
+    """
+    Pure ASGI middleware giving each request an ID for its log records: the client's
+    `X-Request-ID` when it is well-formed, a new one otherwise. The ID is echoed in the
+    response's `X-Request-ID` header.
+    """
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        supplied = dict(scope['headers']).get(REQUEST_ID_HEADER, b'').decode('latin-1')
+        request_id = supplied if _VALID_REQUEST_ID.match(supplied) else uuid.uuid4().hex
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message['type'] == 'http.response.start':
+                message = {**message, 'headers': [*message.get('headers', []), (REQUEST_ID_HEADER, request_id.encode())]}
+            await send(message)
+
+        token = _request_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_id.reset(token)
+
+logger = logging.getLogger(ROOT_LOGGER_NAME)
 logger.setLevel(LOG_LEVEL)
 
 # Formatter
-formatter = logging.Formatter(
-    fmt="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
+if LOG_FORMAT == "json":
+    formatter: logging.Formatter = JsonFormatter()
+else:
+    formatter = logging.Formatter(
+        fmt="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
 
 # Console Handler
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(formatter)
 console_handler.setLevel(LOG_LEVEL)
 
-# File Handler
-file_handler = logging.FileHandler(LOG_FILE)
+# File Handler, rotated once it reaches LOG_MAX_BYTES
+file_handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
 file_handler.setFormatter(formatter)
 file_handler.setLevel(LOG_LEVEL)
 
+queue_handler, listener = build_pipeline([console_handler, file_handler], parse_sampling(LOG_SAMPLING))
+
 # Avoid duplicate handlers if re-imported
 if not logger.hasHandlers():
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    logger.addHandler(queue_handler)
+    listener.start()
+    atexit.register(listener.stop)  # Flushes what is still queued on shutdown
 
-logger.propagate = False
\ No newline at end of file
+logger.propagate = False
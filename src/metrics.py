@@ -0,0 +1,352 @@
+# src/metrics.py
+"""
+In-process metrics for G7Static, exposed in the Prometheus text format on /metrics.
+Counters, gauges and histograms live in one `registry`; recording a value is a dict
+lookup and a few additions under a per-metric lock, so instrumenting hot paths is cheap.
+Tests read values back with `registry.sample(...)` instead of scraping a collector.
+
+What is recorded:
+    http_request_duration_seconds   per route template, method and status (MetricsMiddleware)
+    s3_request_duration_seconds     per S3 operation, via botocore call events
+    s3_request_errors_total         per S3 operation and error code
+    db_query_duration_seconds       per statement type, via SQLAlchemy cursor events
+    db_query_errors_total           per statement type
+    db_pool_checked_out / db_pool_overflow    QueuePool state, read at scrape time
+    upload_bytes_total / uploads_in_progress  audio uploads through the API
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+DB_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SQL_OPERATIONS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'BEGIN', 'COMMIT', 'ROLLBACK'}
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, Tuple[Tuple[str, str], ...], float]  # (sample name, (label, value) pairs, value)
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class _Metric(ABC):
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[str]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(value) for value in labels)
+
+    def _pairs(self, key: LabelValues) -> Tuple[Tuple[str, str], ...]:
+        return tuple(zip(self.labelnames, key))
+
+    @abstractmethod
+    def samples(self) -> Iterator[Sample]:
+        ...
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name}{_format_labels(pairs)} {_format_value(value)}" for name, pairs, value in self.samples())
+        return lines
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, self._pairs(key), value
+
+class Gauge(_Metric):
+    """A value that goes up and down, or one read from `set_function` at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._functions: Dict[LabelValues, Callable[[], float]] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], Optional[float]], *labels: str) -> None:
+        """Reads the value from `function` at scrape time; a None result means unknown and exposes no sample."""
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    @contextmanager
+    def track_in_progress(self, *labels: str) -> Iterator[None]:
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+    def value(self, *labels: str) -> Optional[float]:
+        key = self._key(labels)
+        function = self._functions.get(key)
+        return function() if function is not None else self._values.get(key, 0)
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            values = dict(self._values)
+            functions = list(self._functions.items())
+        for key, function in functions:
+            try:
+                value = function()
+            except Exception:
+                value = None  # A failing callback drops the sample rather than the scrape
+            if value is None:
+                values.pop(key, None)
+            else:
+                values[key] = value
+        for key, value in values.items():
+            yield self.name, self._pairs(key), value
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._values: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            values = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        for key, counts, total, count in values:
+            pairs = self._pairs(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", pairs + (('le', _format_value(bound)),), cumulative
+            yield f"{self.name}_sum", pairs, total
+            yield f"{self.name}_count", pairs, count
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """The whole registry in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+    def sample(self, name: str, labels: Optional[Dict[str, str]] = None) -> Optional[float]:
+        """Value of one exposed sample (e.g. 'x_count' or 'x_bucket' with 'le'), or None if absent."""
+        wanted = labels or {}
+        for metric in list(self._metrics.values()):
+            if not name.startswith(metric.name):
+                continue
+            for sample_name, pairs, value in metric.samples():
+                if sample_name == name and dict(pairs) == wanted:
+                    return value
+        return None
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route template.', ('method', 'route', 'status'))
+S3_REQUEST_DURATION = registry.histogram(
+    's3_request_duration_seconds', 'S3 API call latency, retries included.', ('operation',))
+S3_REQUEST_ERRORS = registry.counter(
+    's3_request_errors_total', 'S3 API calls that failed.', ('operation', 'code'))
+DB_QUERY_DURATION = registry.histogram(
+    'db_query_duration_seconds', 'Database statement latency.', ('engine', 'operation'), DB_LATENCY_BUCKETS)
+DB_QUERY_ERRORS = registry.counter(
+    'db_query_errors_total', 'Database statements that raised.', ('engine', 'operation'))
+DB_POOL_CHECKED_OUT = registry.gauge(
+    'db_pool_checked_out', 'Connections currently checked out of the pool.', ('engine',))
+DB_POOL_OVERFLOW = registry.gauge(
+    'db_pool_overflow', 'Connections open beyond pool_size (negative while the pool is not full).', ('engine',))
+UPLOAD_BYTES = registry.counter(
+    'upload_bytes_total', 'Bytes of audio accepted, by upload path.', ('path',))
+UPLOADS_IN_PROGRESS = registry.gauge(
+    'uploads_in_progress', 'Audio uploads currently streaming through the API.')
+USER_CACHE_HITS = registry.gauge(
+    'user_cache_hits', 'get_current_user lookups served from the user cache, since startup.')
+USER_CACHE_MISSES = registry.gauge(
+    'user_cache_misses', 'get_current_user lookups that fell through to the database, since startup.')
+USER_CACHE_SIZE = registry.gauge(
+    'user_cache_size', 'Entries currently held by the user cache backend.')
+LOG_QUEUE_DEPTH = registry.gauge(
+    'log_queue_depth', 'Log records waiting for the background log writer.')
+LOG_RECORDS_DROPPED = registry.gauge(
+    'log_records_dropped', 'Log records dropped because the log queue was full, since startup.')
+
+# --- HTTP ---
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing each HTTP request. Requests are labelled with the matched
+    route's path template (e.g. /files/audio/{file_id}), not the raw path, so label
+    cardinality stays bounded; requests that match no route share 'unmatched'.
+    """
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                scope['method'], getattr(route, 'path', 'unmatched'), str(status_code)
+            )
+
+# --- S3 ---
+
+def _s3_before_call(model: Any, context: Dict[str, Any], **kwargs: Any) -> None:
+    context['metrics_started'] = time.perf_counter()
+
+def _s3_after_call(http_response: Any, parsed: Dict[str, Any], model: Any, context: Dict[str, Any], **kwargs: Any) -> None:
+    started = context.pop('metrics_started', None)
+    if started is not None:
+        S3_REQUEST_DURATION.observe(time.perf_counter() - started, model.name)
+    if http_response.status_code >= 300:
+        S3_REQUEST_ERRORS.inc(model.name, parsed.get('Error', {}).get('Code') or str(http_response.status_code))
+
+def _s3_after_call_error(exception: Exception, context: Dict[str, Any], **kwargs: Any) -> None:
+    # Connection-level failures never produce a response; the event name carries the operation.
+    started = context.pop('metrics_started', None)
+    operation = kwargs.get('event_name', '').rsplit('.', 1)[-1]
+    if started is not None:
+        S3_REQUEST_DURATION.observe(time.perf_counter() - started, operation)
+    S3_REQUEST_ERRORS.inc(operation, type(exception).__name__)
+
+def instrument_s3_client(client: Any) -> None:
+    """Times every API call of a boto3 S3 client through its event hooks (sync and AsyncProxy alike)."""
+    client.meta.events.register('before-call.s3', _s3_before_call)
+    client.meta.events.register('after-call.s3', _s3_after_call)
+    client.meta.events.register('after-call-error.s3', _s3_after_call_error)
+
+# --- SQLAlchemy ---
+
+def _sql_operation(statement: str) -> str:
+    verb = statement.lstrip()[:8].split(None, 1)
+    operation = verb[0].upper() if verb else ''
+    return operation if operation in SQL_OPERATIONS else 'OTHER'
+
+def instrument_engine(engine: Any, name: str) -> None:
+    """
+    Times statements with cursor events and exposes the pool's checked-out and overflow
+    counts. Takes a sync Engine; pass `async_engine.sync_engine` for the async one.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get('metrics_started')
+        if stack:
+            DB_QUERY_DURATION.observe(time.perf_counter() - stack.pop(), name, _sql_operation(statement))
+
+    @event.listens_for(engine, 'handle_error')
+    def _error(exception_context):
+        connection = exception_context.connection
+        stack = connection.info.get('metrics_started') if connection is not None else None
+        if stack:
+            stack.pop()
+        DB_QUERY_ERRORS.inc(name, _sql_operation(exception_context.statement or ''))
+
+    pool = engine.pool
+    if hasattr(pool, 'checkedout') and hasattr(pool, 'overflow'):
+        DB_POOL_CHECKED_OUT.set_function(pool.checkedout, name)
+        DB_POOL_OVERFLOW.set_function(pool.overflow, name)
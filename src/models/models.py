@@ -2,13 +2,18 @@
 """
 SQLAlchemy models for G7Static.
 """
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, BigInteger, Index
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, BigInteger, Index, Float, Text, DDL, event
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects import sqlite
 from src.db.database import Base # Base is imported from database.py
 from datetime import datetime
 from typing import Optional
 
+# SQLite stores CURRENT_TIMESTAMP as text without fractional seconds. Binding keyset cursor
+# values in the same format keeps `created_at < :cursor` a correct text comparison there.
+SQLITE_SERVER_TIMESTAMP = sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d")
+
 class User(Base):
     __tablename__ = "users"
 
@@ -37,22 +42,133 @@ class File(Base):
     file_id = Column(String(36), unique=True, nullable=False)  # UUID
     original_filename = Column(String(255), nullable=False)
     stored_filename = Column(String(255), nullable=False)
-    md5_hash = Column(String(32), nullable=False, index=True)
+    md5_hash = Column(String(32), nullable=True, index=True)  # Whole-file MD5 the API computed; NULL for direct uploads
+    # S3 multipart ETag of the content in the standard part layout ("{hex}-{parts}"); NULL before it was recorded
+    content_etag = Column(String(48), nullable=True)
     s3_key = Column(String(512), nullable=False)
     file_size = Column(BigInteger, nullable=False)  # Size in bytes
     mime_type = Column(String(128), nullable=False)
+    # From the audio header probe; NULL for files uploaded before it or when the header has no duration
+    duration_seconds = Column(Float, nullable=True)
+    sample_rate = Column(Integer, nullable=True)
+    channels = Column(Integer, nullable=True)
+    blob_id = Column(Integer, ForeignKey('content_blobs.id'), nullable=True)  # Set when s3_key is a shared blob
     status = Column(String(20), nullable=False, default='active')
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True).with_variant(SQLITE_SERVER_TIMESTAMP, "sqlite"), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     created_by = Column(String(50), nullable=False)
     updated_by = Column(String(50), nullable=False)
 
     # Relationships
     user = relationship("User", back_populates="files")
+    transcripts = relationship("Transcript", back_populates="file", passive_deletes=True)
 
     # Indices
     __table_args__ = (
         Index('idx_user_id_status', 'user_id', 'status'),
         Index('idx_md5_hash_user_id', 'md5_hash', 'user_id'),
+        Index('idx_content_etag_user_id', 'content_etag', 'user_id'),
         Index('idx_created_at', 'created_at'),
-    )
\ No newline at end of file
+        Index('idx_user_status_created_id', 'user_id', 'status', 'created_at', 'id'),  # Keyset listing
+        Index('idx_file_blob_id', 'blob_id'),
+    )
+
+class ContentBlob(Base):
+    """
+    Audio stored once per unique content (CONTENT_ADDRESSED_STORAGE). Files of any user
+    with the same MD5 and size reference it; the object and its transcript are deleted
+    when `ref_count` drops to zero.
+    """
+    __tablename__ = "content_blobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    md5_hash = Column(String(32), nullable=False)
+    file_size = Column(BigInteger, nullable=False)  # Size in bytes
+    s3_key = Column(String(512), unique=True, nullable=False)
+    mime_type = Column(String(128), nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    transcript_key = Column(String(512), nullable=True)  # Set once the blob's transcript is written
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    # Indices
+    __table_args__ = (
+        Index('idx_blob_content', 'md5_hash', 'file_size', unique=True),
+    )
+
+class Transcript(Base):
+    """Index of transcripts in S3, so listing them never needs an S3 LIST."""
+    __tablename__ = "transcripts"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    file_id = Column(Integer, ForeignKey('files.id', ondelete='SET NULL'), nullable=True)  # NULL once the audio is deleted
+    s3_key = Column(String(512), unique=True, nullable=False)
+    file_size = Column(BigInteger, nullable=False)  # Size in bytes
+    completed_at = Column(DateTime(timezone=True), nullable=False)  # S3 LastModified of the transcript
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    created_by = Column(String(50), nullable=False)
+    updated_by = Column(String(50), nullable=False)
+
+    # Relationships
+    file = relationship("File", back_populates="transcripts")
+
+    # Indices
+    __table_args__ = (
+        Index('idx_transcript_user_completed_id', 'user_id', 'completed_at', 'id'),  # Keyset listing
+    )
+
+class PendingDeletion(Base):
+    """
+    Outbox of S3 objects whose DB rows are already deleted. Rows are written in the same
+    transaction as the row delete and drained in batches by the background deletion worker.
+    """
+    __tablename__ = "pending_deletions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    s3_key = Column(String(512), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)  # UTC; the worker picks up rows that are due
+    last_error = Column(String(1024), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_by = Column(String(50), nullable=False)
+
+    # Indices
+    __table_args__ = (
+        Index('idx_pending_deletion_due', 'next_attempt_at', 'id'),
+    )
+
+class TranscriptSegment(Base):
+    """
+    Timed text of a transcript, one row per subtitle cue, for full-text search.
+    MySQL searches `text` through a FULLTEXT index; SQLite through the FTS5 table below.
+    """
+    __tablename__ = "transcript_segments"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    transcript_id = Column(Integer, ForeignKey('transcripts.id', ondelete='CASCADE'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)  # Copied from the transcript for filtering
+    start_time = Column(Float, nullable=False)  # Seconds from the start of the audio
+    end_time = Column(Float, nullable=False)
+    text = Column(Text, nullable=False)
+
+    # Indices
+    __table_args__ = (
+        Index('idx_segment_transcript', 'transcript_id'),
+        Index('idx_segment_text_fulltext', 'text', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
+
+# SQLite has no FULLTEXT indexes: an external-content FTS5 table mirrors `text`, kept in
+# sync by triggers, and its rowid is the segment id.
+for _statement in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS transcript_segments_fts USING fts5(text, content='transcript_segments', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS transcript_segments_ai AFTER INSERT ON transcript_segments BEGIN "
+    "INSERT INTO transcript_segments_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS transcript_segments_ad AFTER DELETE ON transcript_segments BEGIN "
+    "INSERT INTO transcript_segments_fts(transcript_segments_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS transcript_segments_au AFTER UPDATE ON transcript_segments BEGIN "
+    "INSERT INTO transcript_segments_fts(transcript_segments_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO transcript_segments_fts(rowid, text) VALUES (new.id, new.text); END",
+):
+    event.listen(TranscriptSegment.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
@@ -0,0 +1,244 @@
+# src/profiling.py
+"""
+Opt-in request profiling for G7Static.
+Routes mark their phases with `span("name")`. Outside a profiled request that is one
+ContextVar lookup returning a shared no-op, and with PROFILING_ENABLED off the
+middleware is not even installed, so normal requests pay nothing.
+
+A request is profiled when it carries `X-Profile: <PROFILING_TOKEN>`, or when it is
+picked by PROFILING_SAMPLE_RATE. Its spans form a tree (phases inside `run_io` calls nest
+under the span that started them) and are kept, with the request's route, status and
+timing, in a bounded ring buffer served by /debug/profiles. Adding `X-Profile-CPU: 1` to
+a token-authorized request also samples thread stacks while it runs; the result is a
+folded-stack profile (one `frame;frame;frame count` line per stack) that flame graph
+tools read directly. The sampler sees every thread, so concurrent requests show up too.
+"""
+import hmac
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from src.config import Config
+from src.utils.concurrency import run_io
+
+PROFILE_HEADER = b'x-profile'
+PROFILE_CPU_HEADER = b'x-profile-cpu'
+PROFILE_ID_HEADER = b'x-profile-id'
+MAX_STACK_DEPTH = 64
+MAX_PROFILE_STACKS = 200
+
+class Span:
+    __slots__ = ('name', 'start', 'end', 'attributes', 'children')
+
+    def __init__(self, name: str, start: float, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.attributes = attributes or {}
+        self.children: List['Span'] = []
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            'name': self.name,
+            'start_ms': round((self.start - origin) * 1000, 3),
+            'duration_ms': round((end - self.start) * 1000, 3),
+            **({'attributes': self.attributes} if self.attributes else {}),
+            **({'children': [child.to_dict(origin) for child in self.children]} if self.children else {}),
+        }
+
+class RequestProfile:
+    """One profiled request: its span tree and, if requested, its folded CPU stacks."""
+    def __init__(self, method: str, path: str, reason: str):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.reason = reason  # 'header' or 'sampled'
+        self.route: Optional[str] = None
+        self.status: Optional[int] = None
+        self.started_at = datetime.now(timezone.utc)
+        self.root = Span('request', time.perf_counter())
+        self.cpu_stacks: Optional[Dict[str, int]] = None
+        self.cpu_interval_ms: Optional[float] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'route': self.route,
+            'status': self.status,
+            'reason': self.reason,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(((self.root.end or time.perf_counter()) - self.root.start) * 1000, 3),
+            'cpu_profile': self.cpu_stacks is not None,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {**self.summary(), 'spans': self.root.to_dict(self.root.start)}
+        if self.cpu_stacks is not None:
+            result['cpu_interval_ms'] = self.cpu_interval_ms
+            result['cpu_samples'] = sum(self.cpu_stacks.values())
+            result['cpu_folded'] = [f"{stack} {count}" for stack, count in sorted(self.cpu_stacks.items(), key=lambda item: -item[1])]
+        return result
+
+class ProfileStore:
+    """Bounded ring buffer of finished profiles; the oldest are dropped first."""
+    def __init__(self, max_size: int):
+        self._profiles: deque = deque(maxlen=max(1, max_size))
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> List[RequestProfile]:
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return next((profile for profile in self._profiles if profile.id == profile_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+profile_store = ProfileStore(Config.PROFILING_BUFFER_SIZE)
+
+_current_span: ContextVar[Optional[Span]] = ContextVar('g7_profile_span', default=None)
+_NO_SPAN = nullcontext()  # Stateless, so one instance serves every unprofiled call
+
+def span(name: str, **attributes: Any):
+    """
+    Context manager timing a named phase of the current profiled request. A no-op when
+    the request is not profiled. Works in sync and async code and across `run_io`.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NO_SPAN
+    return _record_span(parent, name, attributes)
+
+@contextmanager
+def _record_span(parent: Span, name: str, attributes: Dict[str, Any]) -> Iterator[Span]:
+    child = Span(name, time.perf_counter(), attributes)
+    parent.children.append(child)  # list.append is atomic; spans from worker threads share parents
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+def _thread_cpu_time(thread_id: int) -> Optional[float]:
+    """CPU seconds a thread has used, where the platform exposes per-thread clocks (Linux)."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+    except (AttributeError, OSError):
+        return None
+
+class StackSampler:
+    """
+    Samples every other thread's stack at a fixed interval and counts folded stacks.
+    Threads whose CPU clock did not move since the last sample were blocked (waiting on
+    a queue, socket or lock) and are skipped, so the counts reflect CPU time.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='g7-profiler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Dict[str, int]:
+        self._stop.set()
+        self._thread.join()
+        return dict(self.stacks.most_common(MAX_PROFILE_STACKS))
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        cpu_times: Dict[int, Optional[float]] = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                cpu_time = _thread_cpu_time(thread_id)
+                previous = cpu_times.get(thread_id, 0.0)
+                cpu_times[thread_id] = cpu_time
+                if cpu_time is not None and (previous is None or cpu_time <= previous):
+                    continue
+                frames = []
+                while frame is not None and len(frames) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                frames.append(names.get(thread_id, str(thread_id)))
+                self.stacks[';'.join(reversed(frames))] += 1
+
+def is_profile_token(value: Optional[str]) -> bool:
+    return bool(Config.PROFILING_TOKEN) and value is not None and hmac.compare_digest(value, Config.PROFILING_TOKEN)
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware that starts a profile for requests carrying the profile token or
+    picked by the sample rate, and adds `X-Profile-Id` to their response.
+    """
+    def __init__(self, app: Any, sample_rate: float = Config.PROFILING_SAMPLE_RATE, store: ProfileStore = profile_store):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.store = store
+
+    def _reason(self, headers: Dict[bytes, bytes]) -> Optional[str]:
+        token = headers.get(PROFILE_HEADER)
+        if token is not None and is_profile_token(token.decode('latin-1')):
+            return 'header'
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope['headers'])
+        reason = self._reason(headers)
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope['method'], scope['path'], reason)
+        sampler = None
+        if reason == 'header' and headers.get(PROFILE_CPU_HEADER, b'').lower() in (b'1', b'true'):
+            sampler = StackSampler(Config.PROFILING_CPU_INTERVAL_MS / 1000)
+            profile.cpu_interval_ms = Config.PROFILING_CPU_INTERVAL_MS
+            sampler.start()
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message['type'] == 'http.response.start':
+                profile.status = message['status']
+                message = {**message, 'headers': [*message.get('headers', []), (PROFILE_ID_HEADER, profile.id.encode())]}
+            await send(message)
+
+        token = _current_span.set(profile.root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_span.reset(token)
+            profile.root.end = time.perf_counter()
+            if sampler is not None:
+                # Joining the sampler thread can take up to an interval; keep it off the event loop.
+                profile.cpu_stacks = await run_io(sampler.stop)
+            profile.route = getattr(scope.get('route'), 'path', None)
+            self.store.add(profile)
@@ -1,69 +1,89 @@
 # src/routes/auth.py
 from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from datetime import timedelta
 
-from src.log import logger
+from src.log import get_logger
+from src.profiling import span
 from src.schemas import UserCreate, Token, ErrorResponse
 from src.config import Config
-from src.db.database import get_db
-from src.db.repositories import UserRepository
-from src.utils.security import create_access_token, get_password_hash, verify_password
+from src.db.database import DbSession, get_db
+from src.db.async_repositories import user_repository, commit, rollback
+from src.routes.metrics import verify_metrics_access
+from src.utils.security import PasswordHasherBusyError, create_access_token, password_hasher
+from src.utils.user_cache import user_cache
+
+logger = get_logger(__name__)
 
 auth_router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+def _busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service is busy. Please retry shortly.",
+        headers={"Retry-After": "1"},
+    )
+
 @auth_router.post(
     "/register",
     response_model=Token,
     status_code=status.HTTP_201_CREATED,
     responses={
         409: {"model": ErrorResponse, "description": "Username already exists"},
-        500: {"model": ErrorResponse, "description": "Internal server error"}
+        500: {"model": ErrorResponse, "description": "Internal server error"},
+        503: {"model": ErrorResponse, "description": "Authentication service busy"}
     }
 )
-async def register(user_in: UserCreate, db: Session = Depends(get_db)) -> Token:
+async def register(user_in: UserCreate, db: DbSession = Depends(get_db)) -> Token:
     """
     Register a new user and return a JWT access token.
     """
-    user_repo = UserRepository(db)
-    
-    if user_repo.get_user_by_username(user_in.username):
-        logger.warning(f"Registration failed for existing username: {user_in.username}")
+    user_repo = user_repository(db)
+    with span("user_lookup"):
+        existing = await user_repo.get_user_by_username(user_in.username)
+    if existing:
+        logger.warning("Registration failed for existing username: %s", user_in.username)
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Username already exists",
         )
         
     try:
-        hashed_password = get_password_hash(user_in.password)
-        user = user_repo.create_user(
-            username=user_in.username, 
-            password=hashed_password,
-            created_by=user_in.username
-        )
-        db.commit()
-        logger.info(f"User '{user.username}' created successfully.")
+        with span("password_hash"):
+            hashed_password = await password_hasher.hash(user_in.password)
+        with span("create_user"):
+            await user_repo.create_user(
+                username=user_in.username, 
+                password=hashed_password,
+                created_by=user_in.username
+            )
+            await commit(db)
+        # Use the validated input rather than the expired ORM instance to avoid a lazy refresh query.
+        logger.info("User '%s' created successfully.", user_in.username)
 
         access_token_expires = timedelta(minutes=Config.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.username}, expires_delta=access_token_expires
+            data={"sub": user_in.username}, expires_delta=access_token_expires
         )
         return {"access_token": access_token, "token_type": "bearer"}
 
     except IntegrityError:
-        db.rollback()
-        logger.error(f"Database integrity error during registration for {user_in.username}.")
+        await rollback(db)
+        logger.error("Database integrity error during registration for %s.", user_in.username)
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Username already exists",
         )
     except HTTPException:
         raise # Re-raise HTTPException directly
+    except PasswordHasherBusyError:
+        await rollback(db)
+        logger.warning("Password hashing pool saturated; rejected registration for %s.", user_in.username)
+        raise _busy_exception()
     except Exception as e:
-        db.rollback()
-        logger.error(f"Error during user registration for {user_in.username}: {e}", exc_info=True)
+        await rollback(db)
+        logger.error("Error during user registration for %s: %s", user_in.username, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred during registration.",
@@ -74,19 +94,23 @@ async def register(user_in: UserCreate, db: Session = Depends(get_db)) -> Token:
     response_model=Token,
     responses={
         401: {"model": ErrorResponse, "description": "Incorrect username or password"},
-        500: {"model": ErrorResponse, "description": "Internal server error"}
+        500: {"model": ErrorResponse, "description": "Internal server error"},
+        503: {"model": ErrorResponse, "description": "Authentication service busy"}
     }
 )
-async def login(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(db: DbSession = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
     """ 
     Log in a user and return a JWT access token.
     """
     try:
-        user_repo = UserRepository(db)
-        user = user_repo.get_user_by_username(form_data.username)
+        user_repo = user_repository(db)
+        with span("user_lookup"):
+            user = await user_repo.get_user_by_username(form_data.username)
+        with span("password_verify"):
+            verified = user is not None and await password_hasher.verify(form_data.password, user.hashed_password)
 
-        if not user or not verify_password(form_data.password, user.hashed_password):
-            logger.warning(f"Failed login attempt for username: {form_data.username}")
+        if not verified:
+            logger.warning("Failed login attempt for username: %s", form_data.username)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
@@ -98,14 +122,25 @@ async def login(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestF
             data={"sub": user.username}, expires_delta=access_token_expires
         )
         
-        logger.info(f"User '{user.username}' logged in successfully.")
+        logger.info("User '%s' logged in successfully.", user.username)
         return {"access_token": access_token, "token_type": "bearer"}
     
     except HTTPException:
         raise # Re-raise HTTPException directly to return 401, not 500
+    except PasswordHasherBusyError:
+        logger.warning("Password hashing pool saturated; rejected login for %s.", form_data.username)
+        raise _busy_exception()
     except Exception as e:
-        logger.error(f"Error during login for {form_data.username}: {e}", exc_info=True)
+        logger.error("Error during login for %s: %s", form_data.username, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred during login.",
-        )
\ No newline at end of file
+        )
+
+@auth_router.get("/cache/stats", dependencies=[Depends(verify_metrics_access)])
+async def get_user_cache_stats() -> dict:
+    """
+    Return hit/miss counters for the authenticated-user cache.
+    Process-wide operational data, so it is guarded like /metrics rather than by user login.
+    """
+    return user_cache.stats()
\ No newline at end of file
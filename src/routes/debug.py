@@ -0,0 +1,38 @@
+# src/routes/debug.py
+"""
+Request profiles recorded by ProfilingMiddleware. Disabled (404) unless PROFILING_ENABLED
+and PROFILING_TOKEN are set; callers authenticate with `Authorization: Bearer <token>`.
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from typing import Any, Dict, List, Optional
+
+from src.config import Config
+from src.profiling import is_profile_token, profile_store
+
+debug_router = APIRouter(prefix="/debug", tags=["Debug"], include_in_schema=False)
+
+def verify_profiling_access(authorization: Optional[str] = Header(None)) -> None:
+    if not Config.PROFILING_ENABLED or not Config.PROFILING_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not is_profile_token(token):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid profiling token")
+
+@debug_router.get("/profiles", dependencies=[Depends(verify_profiling_access)])
+async def list_profiles(route: Optional[str] = Query(None, description="Only profiles of this route template"), limit: int = Query(50, ge=1, le=1000)) -> List[Dict[str, Any]]:
+    """Summaries of the buffered profiles, newest first."""
+    profiles = [profile for profile in profile_store.list() if route is None or profile.route == route]
+    return [profile.summary() for profile in profiles[:limit]]
+
+@debug_router.get("/profiles/{profile_id}", dependencies=[Depends(verify_profiling_access)])
+async def get_profile(profile_id: str) -> Dict[str, Any]:
+    """One profile with its span tree and, if it was recorded, its folded CPU stacks."""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return profile.to_dict()
+
+@debug_router.delete("/profiles", dependencies=[Depends(verify_profiling_access)])
+async def clear_profiles() -> Dict[str, str]:
+    profile_store.clear()
+    return {"message": "Profiles cleared."}
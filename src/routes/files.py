@@ -1,105 +1,301 @@
 # src/routes/files.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.exc import SQLAlchemyError
-from typing import List
-import boto3
+from typing import List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import base64
+import re
 
 from src.config import Config
-from src.db.database import get_db
-from src.db.repositories import FileRepository
-from src.log import logger
+from src.db.database import DbSession, get_db
+from src.db.async_repositories import file_repository, transcript_repository, commit, rollback
+from src.log import get_logger
+from src.profiling import span
 from src.models.models import User
-from src.schemas import FileDetail, TranscriptDetail, DownloadURLResponse, DeleteResponse
+from src.schemas import FileDetail, TranscriptDetail, TranscriptFormat, TranscriptSearchResult, DownloadURLResponse, DownloadURLBatchRequest, DownloadURLBatchResponse, DeleteResponse, BulkDeleteRequest, BulkDeleteResponse
 from src.utils.security import get_current_user
-from src.utils.aws import get_s3_client
+from src.utils.aws import get_async_s3_client
+from src.utils.concurrency import AsyncProxy
+from src.utils.blobs import release_blobs
+from src.utils.deletion import deletion_worker, enqueue_deletions
+from src.utils.transcripts import transcript_format_key, transcript_object_keys
+from src.utils.url_cache import presigned_url_cache
 from botocore.exceptions import ClientError
 
+logger = get_logger(__name__)
+
 files_router = APIRouter(prefix="/files", tags=["Files"])
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encodes a (created_at, id) keyset position as an opaque URL-safe token."""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{row_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
 @files_router.get("/audio", response_model=List[FileDetail])
-async def list_audio_files(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    file_repo = FileRepository(db)
-    return file_repo.get_files_by_user_id(current_user.id)
+async def list_audio_files(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of files to return"),
+    cursor: Optional[str] = Query(None, description=f"Opaque cursor from the previous page's {NEXT_CURSOR_HEADER} header"),
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """
+    List the user's audio files, newest first, one page at a time.
+    When more files exist, the cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    file_repo = file_repository(db)
+    # Fetch one extra row to learn whether another page follows.
+    with span("db_page_query"):
+        rows = await file_repo.get_files_page(current_user.id, limit + 1, decode_cursor(cursor) if cursor else None)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return [FileDetail.model_validate(row) for row in rows]
 
 @files_router.get("/transcripts", response_model=List[TranscriptDetail])
-async def list_transcription_files(current_user: User = Depends(get_current_user), s3_client: boto3.client = Depends(get_s3_client)):
-    prefix = f"StaticTranscription/{current_user.username}/"
-    try:
-        response = s3_client.list_objects_v2(Bucket=Config.AWS_S3_BUCKET_NAME, Prefix=prefix)
-        transcripts = []
-        for content in response.get('Contents', []):
-            if not content['Key'].endswith('/'):
-                transcripts.append({"key": content['Key'], "size": content['Size'], "last_modified": content['LastModified']})
-        return transcripts
-    except ClientError as e:
-        raise HTTPException(status_code=500, detail=f"Could not list transcripts from S3: {e}")
+async def list_transcription_files(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of transcripts to return"),
+    cursor: Optional[str] = Query(None, description=f"Opaque cursor from the previous page's {NEXT_CURSOR_HEADER} header"),
+    format: Optional[TranscriptFormat] = Query(None, description="Include a download URL for each transcript in this format"),
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db),
+    s3_client: AsyncProxy = Depends(get_async_s3_client)
+):
+    """
+    List the user's transcripts, newest first, from the transcript index (no S3 LIST).
+    When more transcripts exist, the cursor for the next page is returned in the X-Next-Cursor header.
+    With `format`, every row also carries a download URL for that format, signed in one batch.
+    """
+    transcript_repo = transcript_repository(db)
+    with span("db_page_query"):
+        rows = await transcript_repo.get_transcripts_page(current_user.id, limit + 1, decode_cursor(cursor) if cursor else None)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].last_modified, rows[-1].id)
+    transcripts = [TranscriptDetail.model_validate(row) for row in rows]
+    if format is not None and transcripts:
+        format_keys = {transcript.key: transcript_format_key(transcript.key, format.value) for transcript in transcripts}
+        try:
+            with span("sign_urls", count=len(format_keys)):
+                urls = await presigned_url_cache.get_urls(s3_client, current_user.id, list(format_keys.values()))
+        except ClientError as e:
+            raise HTTPException(status_code=500, detail=f"Could not generate download URLs: {e}")
+        for transcript in transcripts:
+            transcript.download_url = urls[format_keys[transcript.key]]
+    return transcripts
+
+@files_router.get("/transcripts/search", response_model=List[TranscriptSearchResult])
+async def search_transcripts(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to look for; passages containing them rank first"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of passages to return"),
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """
+    Full-text search over the user's transcripts, best match first.
+    Each result is one timed passage, with its transcript key, audio file_id and timestamps.
+    """
+    terms = re.findall(r"\w+", q.lower())
+    if not terms:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Search query has no words")
+    with span("db_search"):
+        rows = await transcript_repository(db).search_segments(current_user.id, terms, limit)
+    return [TranscriptSearchResult.model_validate(row) for row in rows]
 
 @files_router.get("/audio/{file_id}/download", response_model=DownloadURLResponse)
-async def get_audio_download_url(file_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db), s3_client: boto3.client = Depends(get_s3_client)):
-    file_repo = FileRepository(db)
-    file_record = file_repo.get_file_by_file_id(current_user.id, file_id)
+async def get_audio_download_url(file_id: str, current_user: User = Depends(get_current_user), db: DbSession = Depends(get_db), s3_client: AsyncProxy = Depends(get_async_s3_client)):
+    file_repo = file_repository(db)
+    with span("db_lookup"):
+        file_record = await file_repo.get_file_by_file_id(current_user.id, file_id)
     if not file_record:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
     try:
-        url = s3_client.generate_presigned_url('get_object', Params={'Bucket': Config.AWS_S3_BUCKET_NAME, 'Key': file_record.s3_key}, ExpiresIn=3600)
+        with span("sign_url"):
+            url = await presigned_url_cache.get_url(s3_client, current_user.id, file_record.s3_key)
         return {"download_url": url}
     except ClientError as e:
         raise HTTPException(status_code=500, detail=f"Could not generate download URL: {e}")
 
 @files_router.get("/transcripts/download", response_model=DownloadURLResponse)
-async def get_transcript_download_url(key: str, current_user: User = Depends(get_current_user), s3_client: boto3.client = Depends(get_s3_client)):
+async def get_transcript_download_url(key: str, format: TranscriptFormat = Query(TranscriptFormat.json, description="Transcript format to download"), current_user: User = Depends(get_current_user), db: DbSession = Depends(get_db), s3_client: AsyncProxy = Depends(get_async_s3_client)):
     if not key.startswith(f"StaticTranscription/{current_user.username}/"):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    # The transcript index replaces a head_object round trip for the existence check.
+    with span("db_lookup"):
+        transcript_record = await transcript_repository(db).get_transcript_by_key(current_user.id, key)
+    if not transcript_record:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transcript not found")
     try:
-        s3_client.head_object(Bucket=Config.AWS_S3_BUCKET_NAME, Key=key)
-        url = s3_client.generate_presigned_url('get_object', Params={'Bucket': Config.AWS_S3_BUCKET_NAME, 'Key': key}, ExpiresIn=3600)
+        with span("sign_url"):
+            url = await presigned_url_cache.get_url(s3_client, current_user.id, transcript_format_key(key, format.value))
         return {"download_url": url}
     except ClientError as e:
-        if e.response['Error']['Code'] == '404':
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transcript not found")
         raise HTTPException(status_code=500, detail=f"Could not generate download URL: {e}")
 
+@files_router.post("/download-urls", response_model=DownloadURLBatchResponse)
+async def get_download_urls(request: DownloadURLBatchRequest, current_user: User = Depends(get_current_user), db: DbSession = Depends(get_db), s3_client: AsyncProxy = Depends(get_async_s3_client)):
+    """
+    Download URLs for many audio files and transcripts in one call, e.g. for every row of a list.
+    Ownership is checked with one query per kind; anything the user does not have is reported in `not_found`.
+    Transcript URLs point to `transcript_format`, but stay keyed by the requested (JSON) key.
+    """
+    own_prefix = f"StaticTranscription/{current_user.username}/"
+    with span("db_lookup"):
+        audio_keys = await file_repository(db).get_file_keys_by_file_ids(current_user.id, request.file_ids)
+        transcript_keys = await transcript_repository(db).get_existing_keys(
+            current_user.id, [key for key in request.transcript_keys if key.startswith(own_prefix)]
+        )
+    format_keys = {key: transcript_format_key(key, request.transcript_format.value) for key in transcript_keys}
+    try:
+        with span("sign_urls", count=len(audio_keys) + len(format_keys)):
+            urls = await presigned_url_cache.get_urls(s3_client, current_user.id, list(audio_keys.values()) + list(format_keys.values()))
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Could not generate download URLs: {e}")
+
+    found = set(audio_keys) | set(transcript_keys)
+    return {
+        "audio": {file_id: urls[s3_key] for file_id, s3_key in audio_keys.items()},
+        "transcripts": {key: urls[format_keys[key]] for key in transcript_keys},
+        "not_found": [item for item in dict.fromkeys(request.file_ids + request.transcript_keys) if item not in found],
+    }
+
 @files_router.delete("/audio/{file_id}", response_model=DeleteResponse)
-async def delete_audio_file(file_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db), s3_client: boto3.client = Depends(get_s3_client)):
-    file_repo = FileRepository(db)
-    file_record = file_repo.get_file_by_file_id(current_user.id, file_id)
+async def delete_audio_file(file_id: str, current_user: User = Depends(get_current_user), db: DbSession = Depends(get_db)):
+    file_repo = file_repository(db)
+    with span("db_lookup"):
+        file_record = await file_repo.get_file_by_file_id(current_user.id, file_id)
     if not file_record:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Audio file not found")
 
     s3_key = file_record.s3_key
+    blob_id = file_record.blob_id
     
     try:
-        # Step 1: Delete the database record first.
-        file_repo.delete_file(file_record)
-        db.commit()
+        # Delete the database record and queue the S3 object for removal in one transaction.
+        # Shared content is only removed with its last reference.
+        with span("db_delete"):
+            await file_repo.delete_file(file_record)
+            s3_keys = await release_blobs(db, [blob_id]) if blob_id else [s3_key]
+            await enqueue_deletions(db, s3_keys, current_user.username)
+            await commit(db)
     except SQLAlchemyError as e:
-        db.rollback()
-        logger.error(f"Database error deleting audio record for user '{current_user.username}', file_id '{file_id}': {e}")
+        await rollback(db)
+        logger.error("Database error deleting audio record for user '%s', file_id '%s': %s", current_user.username, file_id, e)
         raise HTTPException(status_code=500, detail="Could not delete file record from database.")
 
-    try:
-        # Step 2: If DB deletion was successful, delete from S3.
-        s3_client.delete_object(Bucket=Config.AWS_S3_BUCKET_NAME, Key=s3_key)
-    except ClientError as e:
-        # CRITICAL: DB record is gone, but S3 file may remain. Log this for manual cleanup.
-        logger.critical(f"S3 deletion failed for user '{current_user.username}', key '{s3_key}', after DB record was deleted: {e}")
-        # Inform the user of a partial success/failure.
-        raise HTTPException(status_code=500, detail="File record deleted, but failed to delete file from storage. Please contact support.")
-
-    logger.info(f"Successfully deleted audio file and record for user '{current_user.username}', s3_key '{s3_key}'.")
+    presigned_url_cache.invalidate(current_user.id, s3_key)
+    deletion_worker.notify()
+    logger.info("Successfully deleted audio file and record for user '%s', s3_key '%s'.", current_user.username, s3_key)
     return {"message": "Audio file deleted successfully."}
 
 @files_router.delete("/transcripts", response_model=DeleteResponse)
-async def delete_transcript_file(key: str, current_user: User = Depends(get_current_user), s3_client: boto3.client = Depends(get_s3_client)):
+async def delete_transcript_file(key: str, current_user: User = Depends(get_current_user), db: DbSession = Depends(get_db)):
     if not key.startswith(f"StaticTranscription/{current_user.username}/"):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
-    
+
+    transcript_repo = transcript_repository(db)
+    transcript_record = await transcript_repo.get_transcript_by_key(current_user.id, key)
+    s3_keys = transcript_object_keys(key)
     try:
-        s3_client.delete_object(Bucket=Config.AWS_S3_BUCKET_NAME, Key=key)
-    except ClientError as e:
-        logger.error(f"S3 deletion failed for user '{current_user.username}', key '{key}': {e}")
-        raise HTTPException(status_code=500, detail="Failed to delete transcript file from storage.")
+        # Unindexed keys are still removed from S3.
+        if transcript_record:
+            await transcript_repo.delete_transcript(transcript_record)
+        await enqueue_deletions(db, s3_keys, current_user.username)
+        await commit(db)
+    except SQLAlchemyError as e:
+        await rollback(db)
+        logger.error("Database error deleting transcript record for user '%s', key '%s': %s", current_user.username, key, e)
+        raise HTTPException(status_code=500, detail="Could not delete transcript record from database.")
+
+    for s3_key in s3_keys:
+        presigned_url_cache.invalidate(current_user.id, s3_key)
+    deletion_worker.notify()
+    logger.info("Successfully deleted transcript for user '%s', s3_key '%s'.", current_user.username, key)
+    return {"message": "Transcript file deleted successfully."}
+
+async def _stored_transcript_keys(s3_client: AsyncProxy, keys: List[str]) -> List[str]:
+    """
+    The keys among `keys` that S3 still holds. Used for transcripts missing from the index;
+    a HEAD that fails for any reason other than 404 counts as present, so its delete is
+    still queued.
+    """
+    async def exists(key: str) -> bool:
+        try:
+            await s3_client.head_object(Bucket=Config.AWS_S3_BUCKET_NAME, Key=key)
+        except ClientError as e:
+            return e.response['Error']['Code'] not in ('404', 'NoSuchKey')
+        return True
+    found = await asyncio.gather(*(exists(key) for key in keys))
+    return [key for key, present in zip(keys, found) if present]
+
+@files_router.post("/delete", response_model=BulkDeleteResponse)
+async def bulk_delete(request: BulkDeleteRequest, current_user: User = Depends(get_current_user), db: DbSession = Depends(get_db), s3_client: AsyncProxy = Depends(get_async_s3_client)):
+    """
+    Delete many audio files and transcripts in one call.
+    All DB rows are removed and their S3 objects queued for batched removal in a single
+    transaction. With `include_transcripts`, the transcripts of the listed audio files go too.
+    Every requested item gets its own result.
+    """
+    file_ids = list(dict.fromkeys(request.file_ids))
+    transcript_keys = list(dict.fromkeys(request.transcript_keys))
+    own_prefix = f"StaticTranscription/{current_user.username}/"
+    allowed_keys = [key for key in transcript_keys if key.startswith(own_prefix)]
+
+    file_repo = file_repository(db)
+    transcript_repo = transcript_repository(db)
+    with span("db_lookup"):
+        file_rows = await file_repo.get_files_for_delete(current_user.id, file_ids)
+        transcript_rows = await transcript_repo.get_transcripts_for_delete(
+            current_user.id, allowed_keys, [row.id for row in file_rows] if request.include_transcripts else []
+        )
+
+    # Unindexed transcript keys are removed from S3 too, as in delete_transcript_file, but
+    # only when S3 has them; the rest are reported as not found.
+    audio_keys = {row.file_id: row.s3_key for row in file_rows}
+    indexed_keys = {row.s3_key for row in transcript_rows}
+    unindexed_keys = [key for key in allowed_keys if key not in indexed_keys]
+    if unindexed_keys:
+        with span("s3_lookup", keys=len(unindexed_keys)):
+            unindexed_keys = await _stored_transcript_keys(s3_client, unindexed_keys)
+    deleted_transcripts = list(dict.fromkeys([row.s3_key for row in transcript_rows] + unindexed_keys))
+    s3_keys = [row.s3_key for row in file_rows if not row.blob_id] + [s3_key for key in deleted_transcripts for s3_key in transcript_object_keys(key)]
+    try:
+        with span("db_delete", files=len(file_rows), transcripts=len(transcript_rows)):
+            await transcript_repo.delete_transcripts_by_ids([row.id for row in transcript_rows])
+            await file_repo.delete_files_by_ids([row.id for row in file_rows])
+            s3_keys = list(dict.fromkeys(s3_keys + await release_blobs(db, [row.blob_id for row in file_rows if row.blob_id])))
+            await enqueue_deletions(db, s3_keys, current_user.username)
+            await commit(db)
+    except SQLAlchemyError as e:
+        await rollback(db)
+        logger.error("Database error during bulk delete for user '%s': %s", current_user.username, e)
+        raise HTTPException(status_code=500, detail="Could not delete records from database.")
+
+    for s3_key in set(s3_keys) | set(audio_keys.values()):
+        presigned_url_cache.invalidate(current_user.id, s3_key)
+    deletion_worker.notify()
+
+    results = []
+    for file_id in file_ids:
+        results.append({"type": "audio", "id": file_id, "status": "deleted" if file_id in audio_keys else "not_found"})
+    deleted_transcript_keys = set(deleted_transcripts)
+    for key in dict.fromkeys(transcript_keys + [row.s3_key for row in transcript_rows]):
+        if not key.startswith(own_prefix):
+            key_status = "forbidden"
+        else:
+            key_status = "deleted" if key in deleted_transcript_keys else "not_found"
+        results.append({"type": "transcript", "id": key, "status": key_status})
 
-    logger.info(f"Successfully deleted transcript for user '{current_user.username}', s3_key '{key}'.")
-    return {"message": "Transcript file deleted successfully."}
\ No newline at end of file
+    deleted = sum(1 for result in results if result["status"] == "deleted")
+    logger.info("Bulk delete for user '%s': %s of %s items deleted.", current_user.username, deleted, len(results))
+    return {"deleted": deleted, "failed": len(results) - deleted, "results": results}
@@ -0,0 +1,85 @@
+# src/routes/internal.py
+"""
+Service-to-service endpoints, authenticated with a shared token instead of a user JWT.
+Disabled (404) unless INTERNAL_API_TOKEN is configured.
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from sqlalchemy.exc import SQLAlchemyError
+from botocore.exceptions import ClientError
+from typing import Optional
+import hmac
+
+from src.config import Config
+from src.db.database import DbSession, get_db
+from src.db.async_repositories import commit, rollback
+from src.log import get_logger
+from src.schemas import TranscriptDetail, TranscriptNotification
+from src.utils.aws import get_async_s3_client
+from src.utils.concurrency import AsyncProxy
+from src.utils.blobs import share_blob_transcript
+from src.utils.deletion import deletion_worker, enqueue_deletions
+from src.utils.transcripts import parse_transcript_key, record_transcript, index_transcript_text, transcript_object_keys
+
+logger = get_logger(__name__)
+
+internal_router = APIRouter(prefix="/internal", tags=["Internal"], include_in_schema=False)
+
+def verify_internal_token(x_internal_token: Optional[str] = Header(None)) -> None:
+    if not Config.INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_internal_token or not hmac.compare_digest(x_internal_token, Config.INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid internal token")
+
+@internal_router.post("/transcripts", response_model=TranscriptDetail, dependencies=[Depends(verify_internal_token)])
+async def transcript_ready(notification: TranscriptNotification, db: DbSession = Depends(get_db), s3_client: AsyncProxy = Depends(get_async_s3_client)):
+    """
+    Called by the transcription Lambda when a transcript lands in S3.
+    Size and completion time are read from S3 rather than trusted from the caller.
+    The transcript's text is (re-)indexed for search in the same transaction. Transcripts
+    of shared content are copied to every user whose file references it.
+    """
+    try:
+        head = await s3_client.head_object(Bucket=Config.AWS_S3_BUCKET_NAME, Key=notification.key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transcript not found in storage")
+        raise HTTPException(status_code=500, detail=f"Could not read transcript metadata: {e}")
+
+    parsed = parse_transcript_key(notification.key)
+    if parsed and parsed[0] == Config.SHARED_CONTENT_OWNER:
+        return await _shared_transcript_ready(db, s3_client, notification.key, head)
+
+    try:
+        transcript = await record_transcript(db, notification.key, head['ContentLength'], head['LastModified'], "transcriber")
+        if transcript is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Key is not a transcript of a known user")
+        await index_transcript_text(db, s3_client, transcript)
+        # Read before commit() expires the row; afterwards each attribute would be a blocking refresh query.
+        detail = {"key": transcript.s3_key, "size": transcript.file_size, "last_modified": transcript.completed_at}
+        await commit(db)
+    except SQLAlchemyError as e:
+        await rollback(db)
+        logger.error("Database error indexing transcript '%s': %s", notification.key, e)
+        raise HTTPException(status_code=500, detail="Could not record transcript.")
+
+    logger.info("Indexed transcript '%s'.", notification.key)
+    return detail
+
+async def _shared_transcript_ready(db: DbSession, s3_client: AsyncProxy, key: str, head: dict) -> dict:
+    try:
+        shared = await share_blob_transcript(db, s3_client, key)
+        if shared is None:
+            # The content was deleted, or its upload turned out to be a duplicate: drop the transcript too.
+            await enqueue_deletions(db, transcript_object_keys(key), "transcriber")
+        await commit(db)
+    except SQLAlchemyError as e:
+        await rollback(db)
+        logger.error("Database error sharing transcript '%s': %s", key, e)
+        raise HTTPException(status_code=500, detail="Could not record transcript.")
+
+    if shared is None:
+        deletion_worker.notify()
+        logger.info("Discarded transcript '%s' of content that is no longer stored.", key)
+    else:
+        logger.info("Shared transcript '%s' with %s files.", key, shared)
+    return {"key": key, "size": head['ContentLength'], "last_modified": head['LastModified']}
@@ -0,0 +1,25 @@
+# src/routes/metrics.py
+"""
+Prometheus scrape endpoint. Only served (otherwise 404) when METRICS_ENABLED and
+METRICS_TOKEN are set; scrapers authenticate with `Authorization: Bearer <token>`.
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import hmac
+
+from src.config import Config
+from src.metrics import registry
+
+metrics_router = APIRouter(tags=["Metrics"], include_in_schema=False)
+
+def verify_metrics_access(authorization: Optional[str] = Header(None)) -> None:
+    if not Config.METRICS_ENABLED or not Config.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not hmac.compare_digest(authorization or "", f"Bearer {Config.METRICS_TOKEN}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(verify_metrics_access)])
+def metrics() -> PlainTextResponse:
+    """Current values of every metric in the Prometheus text exposition format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,24 +1,120 @@
 # src/routes/upload.py
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-import hashlib
+import math
 import mimetypes
 import os
-import secrets
-import boto3
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
 
 from src.config import Config
-from src.db.database import get_db
-from src.db.repositories import FileRepository
-from src.log import logger
-from src.models.models import User
-from src.schemas import ErrorResponse, FileResponse
+from src.db.database import DbSession, get_db
+from src.db.async_repositories import file_repository, commit, rollback
+from src.log import get_logger
+from src.metrics import UPLOAD_BYTES, UPLOADS_IN_PROGRESS
+from src.profiling import span
+from src.models.models import User, File as FileModel
+from src.schemas import (
+    ErrorResponse, FileResponse, DeleteResponse, FileDetail, MultipartUploadStart, MultipartUploadStartResponse,
+    MultipartPresignRequest, MultipartPresignResponse, PresignedPart, MultipartUploadComplete, MultipartUploadAbort,
+    PreflightItem, PreflightResult, PreflightBatchRequest, PreflightBatchResponse
+)
 from src.utils.security import get_current_user
-from src.utils.aws import get_s3_client  # Import the dependency
+from src.utils.audio_probe import AudioInfo, AudioProbeError, probe_file, probe_s3_object
+from src.utils.aws import get_async_s3_client  # Import the dependency
+from src.utils.blobs import blob_storage_key, claim_blob, copy_blob_transcript
+from src.utils.concurrency import AsyncProxy, run_io, upload_part_executor
+from src.utils.s3_upload import StreamedUpload, UploadTooLargeError, multipart_part_size
 from botocore.exceptions import BotoCoreError, ClientError
 
+logger = get_logger(__name__)
+
 upload_router = APIRouter(prefix="/upload", tags=["Upload"])
 
+def _validate_audio_type(filename: str, username: str) -> str:
+    """Checks the filename against the supported audio types and returns its MIME type."""
+    allowed_exts = ('.mp3', '.wav', '.m4a', '.aac', '.flac', '.ogg')
+    mime_type, _ = mimetypes.guess_type(filename)
+    if not filename.lower().endswith(allowed_exts) or not mime_type or not mime_type.startswith('audio/'):
+        logger.warning("User '%s' tried to upload unsupported file type: %s", username, filename)
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Unsupported audio file type.")
+    return mime_type
+
+async def _probe_upload(file: UploadFile, username: str) -> Optional[AudioInfo]:
+    """
+    Reads the upload's container header before anything is hashed or sent to S3, so a
+    renamed video or a truncated file is rejected right away instead of failing in Transcribe.
+    """
+    if not Config.AUDIO_PROBE_ENABLED:
+        return None
+    try:
+        with span("audio_probe"):
+            return await run_io(probe_file, file.file, file.filename)
+    except AudioProbeError as e:
+        logger.warning("User '%s' upload '%s' rejected by the audio probe: %s", username, file.filename, e)
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=f"Not a valid audio file: {e}")
+
+def _audio_metadata(audio_info: Optional[AudioInfo]) -> Dict[str, Any]:
+    """The File columns filled from a probe result."""
+    if audio_info is None:
+        return {}
+    return {'duration_seconds': audio_info.duration_seconds, 'sample_rate': audio_info.sample_rate, 'channels': audio_info.channels}
+
+def _new_storage_key(username: str, filename: str, shared: bool = False) -> Tuple[str, str, str]:
+    """
+    Returns (file_id, stored_filename, s3_key) for a new upload. The key is named after a
+    fresh UUID that also becomes the File row's file_id, so it cannot collide and needs no
+    S3 lookup; the user's filename is only kept as metadata. A `shared` upload goes to the
+    shared folder, where it can become the content's blob.
+    """
+    file_id = str(uuid.uuid4())
+    stored_filename = f"{file_id}{os.path.splitext(filename)[1].lower()}"
+    if shared:
+        return file_id, stored_filename, blob_storage_key(stored_filename)
+    return file_id, stored_filename, f"{Config.AUDIO_KEY}/{username}/{stored_filename}"
+
+def _file_id_from_key(s3_key: str) -> Optional[str]:
+    """The file_id a storage key was named after, or None for keys from before UUID naming."""
+    stem = os.path.splitext(s3_key.rsplit('/', 1)[-1])[0]
+    try:
+        parsed = uuid.UUID(stem)
+    except ValueError:
+        return None
+    return stem if str(parsed) == stem else None
+
+def _content_disposition(filename: str, shared: bool = False) -> Optional[str]:
+    """
+    Makes downloads of the UUID-named object save under the user's filename. Shared blobs
+    get none: other users must not see the first uploader's filename.
+    """
+    if shared:
+        return None
+    return f"attachment; filename*=UTF-8''{quote(filename)}"
+
+async def _share_existing_transcript(db: DbSession, s3_client: AsyncProxy, transcript_key: Optional[str], username: str, stored_filename: str) -> None:
+    """
+    Gives a new reference to already-transcribed shared content its transcript right away.
+    Takes the key rather than the blob: after the upload's commit, reading the blob's
+    expired attributes would be a blocking refresh query on the event loop in sync mode.
+    """
+    if not transcript_key:
+        return
+    try:
+        await copy_blob_transcript(db, s3_client, transcript_key, [(username, stored_filename)])
+        await commit(db)
+    except Exception as e:
+        await rollback(db)
+        logger.error("Could not share transcript '%s' with user '%s': %s", transcript_key, username, e, exc_info=True)
+
+async def _discard_upload(uploader: Optional[StreamedUpload]) -> None:
+    """Best-effort cleanup of a streamed upload after a failure further down the request."""
+    if uploader is None:
+        return
+    try:
+        await run_io(uploader.discard)
+    except (BotoCoreError, ClientError) as e:
+        logger.error("Failed to clean up S3 upload for key '%s': %s", uploader.key, e)
+
 @upload_router.post(
     '/audio',
     status_code=status.HTTP_201_CREATED,
@@ -36,8 +132,8 @@ upload_router = APIRouter(prefix="/upload", tags=["Upload"])
 async def upload_audio(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    s3_client: boto3.client = Depends(get_s3_client)  # Use the shared client
+    db: DbSession = Depends(get_db),
+    s3_client: AsyncProxy = Depends(get_async_s3_client)  # Use the shared client
 ):
     max_file_size = Config.MAX_UPLOAD_FILE_SIZE_MB * 1024 * 1024
     username = current_user.username
@@ -46,71 +142,375 @@ async def upload_audio(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No filename provided")
 
     # Validate file type
-    allowed_exts = ('.mp3', '.wav', '.m4a', '.aac', '.flac', '.ogg')
-    mime_type, _ = mimetypes.guess_type(file.filename)
-    if not file.filename.lower().endswith(allowed_exts) or not mime_type or not mime_type.startswith('audio/'):
-        logger.warning(f"User '{username}' tried to upload unsupported file type: {file.filename}")
-        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Unsupported audio file type.")
+    mime_type = _validate_audio_type(file.filename, username)
+    audio_info = await _probe_upload(file, username)
 
+    uploader = None
+    UPLOADS_IN_PROGRESS.inc()
     try:
-        # --- PERFORMANCE IMPROVEMENT: STREAMING HASH & SIZE CALCULATION ---
-        # This avoids loading the entire file into memory.
-        md5 = hashlib.md5()
-        file_size = 0
-        await file.seek(0)
-        while chunk := await file.read(8192):  # Read in 8KB chunks
-            md5.update(chunk)
-            file_size += len(chunk)
-        
-        if file_size > max_file_size:
-            logger.warning(f"User '{username}' file too large: {file_size} bytes")
+        # Only uploads hashed here can share content: the MD5 identifies the blob, so it must not come from the client.
+        shared = Config.CONTENT_ADDRESSED_STORAGE
+        file_id, stored_filename, s3_key = _new_storage_key(username, file.filename, shared)
+
+        # --- PERFORMANCE IMPROVEMENT: SINGLE-PASS HASH & UPLOAD ---
+        # The file is read once: MD5, content ETag and size are computed while multipart parts are
+        # already on their way to S3. The object only becomes visible on complete().
+        uploader = StreamedUpload(
+            s3_client.target, Config.AWS_S3_BUCKET_NAME, s3_key,
+            executor=upload_part_executor,
+            part_size=Config.S3_MULTIPART_PART_SIZE_MB * 1024 * 1024,
+            concurrency=Config.S3_MULTIPART_CONCURRENCY,
+            max_size=max_file_size,
+            content_type=mime_type,
+            content_disposition=_content_disposition(file.filename, shared)
+        )
+        try:
+            with span("hash_and_stream"):
+                md5_hash, file_size = await run_io(uploader.stream, file.file)
+        except UploadTooLargeError as e:
+            logger.warning("User '%s' file too large: more than %s bytes", username, e.max_size)
             raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"File size exceeds {Config.MAX_UPLOAD_FILE_SIZE_MB}MB.")
-        
-        md5_hash = md5.hexdigest()
         # --- END OF PERFORMANCE IMPROVEMENT ---
+        UPLOAD_BYTES.inc("api", amount=file_size)
+        content_etag = uploader.content_etag
 
-        file_repo = FileRepository(db)
-        if existing := file_repo.get_file_by_hash(current_user.id, md5_hash):
-            logger.info(f"User '{username}' tried to upload duplicate file (hash: {md5_hash}).")
-            return FileResponse(message="File already uploaded", filename=existing.original_filename, md5_hash=md5_hash, s3_key=existing.s3_key)
-
-        stored_filename = file.filename
-        s3_key = f"{Config.AUDIO_KEY}/{username}/{stored_filename}"
+        file_repo = file_repository(db)
+        with span("duplicate_lookup"):
+            # The content ETag also finds the same bytes uploaded directly to S3, which have no MD5.
+            existing = next(iter(await file_repo.get_files_by_content(current_user.id, [md5_hash], [content_etag])), None)
+        if existing:
+            await run_io(uploader.discard)
+            logger.info("User '%s' tried to upload duplicate file (hash: %s).", username, md5_hash)
+            return FileResponse(
+                message="File already uploaded", filename=existing.original_filename,
+                md5_hash=md5_hash, content_etag=content_etag, s3_key=existing.s3_key
+            )
 
-        # Check if a file with this name already exists in S3 and rename if necessary
-        try:
-            s3_client.head_object(Bucket=Config.AWS_S3_BUCKET_NAME, Key=s3_key)
-            name, ext = os.path.splitext(file.filename)
-            stored_filename = f"{name}_{secrets.token_hex(4)}{ext}"
-            s3_key = f"{Config.AUDIO_KEY}/{username}/{stored_filename}"
-        except ClientError as e:
-            if e.response['Error']['Code'] != '404': # 404 is expected (file not found)
-                logger.error(f"Error checking S3 for file '{s3_key}': {e}")
-                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error checking file existence in storage.")
-
-        # Rewind the file pointer before uploading
-        await file.seek(0)
-        
-        # Upload the file to S3
-        s3_client.upload_fileobj(file.file, Config.AWS_S3_BUCKET_NAME, s3_key)
+        blob = None
+        if shared:
+            # Content someone already uploaded is referenced; this upload's parts are dropped.
+            with span("claim_blob"):
+                blob = await claim_blob(db, s3_key, md5_hash, file_size, mime_type, lambda: run_io(uploader.complete))
+                if blob.s3_key != s3_key:
+                    await run_io(uploader.discard)
+                    s3_key = blob.s3_key
+        else:
+            with span("complete_upload"):
+                await run_io(uploader.complete)
         
         # Save file metadata to the database
         file_data = {
-            'original_filename': file.filename, 'stored_filename': stored_filename,
-            'md5_hash': md5_hash, 's3_key': s3_key, 'file_size': file_size, 
-            'mime_type': mime_type or 'application/octet-stream'
+            'file_id': file_id, 'original_filename': file.filename, 'stored_filename': stored_filename,
+            'md5_hash': md5_hash, 'content_etag': content_etag, 's3_key': s3_key, 'file_size': file_size,
+            'mime_type': mime_type or 'application/octet-stream', 'blob_id': blob.id if blob else None,
+            **_audio_metadata(audio_info)
         }
-        file_repo.create_file(current_user.id, file_data, created_by=username)
-        db.commit()
+        shared_transcript_key = blob.transcript_key if blob else None  # Read before commit() expires it
+        with span("record_file"):
+            await file_repo.create_file(current_user.id, file_data, created_by=username)
+            await commit(db)
+        await _share_existing_transcript(db, s3_client, shared_transcript_key, username, stored_filename)
         
-        logger.info(f"Audio file uploaded to S3 for user '{username}': {s3_key}")
-        return FileResponse(message="Audio file uploaded successfully", filename=stored_filename, md5_hash=md5_hash, s3_key=s3_key)
+        logger.info("Audio file uploaded to S3 for user '%s': %s", username, s3_key)
+        return FileResponse(
+            message="Audio file uploaded successfully", filename=file.filename,
+            md5_hash=md5_hash, content_etag=content_etag, s3_key=s3_key
+        )
 
+    except HTTPException:
+        await rollback(db)
+        raise # Re-raise HTTPException directly to keep its status code
     except (BotoCoreError, ClientError) as e:
-        db.rollback()
-        logger.error(f"S3 upload error for user '{username}': {e}", exc_info=True)
+        await rollback(db)
+        await _discard_upload(uploader)
+        logger.error("S3 upload error for user '%s': %s", username, e, exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not upload file to storage service.")
     except Exception as e:
-        db.rollback()
-        logger.error(f"Unexpected error uploading audio for user '{username}': {e}", exc_info=True)
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred.")
\ No newline at end of file
+        await rollback(db)
+        await _discard_upload(uploader)
+        logger.error("Unexpected error uploading audio for user '%s': %s", username, e, exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred.")
+    finally:
+        UPLOADS_IN_PROGRESS.dec()
+
+# --- Duplicate preflight ---
+# Clients hash locally and ask first, so bytes the server already has are never sent.
+# Files match by whole-file MD5 (uploads through the API) or content ETag (every upload).
+
+def _preflight_match(item: PreflightItem, existing_files: List[FileModel]) -> Optional[FileModel]:
+    return next((
+        existing for existing in existing_files
+        if existing.file_size == item.file_size and (
+            (item.md5_hash is not None and existing.md5_hash == item.md5_hash)
+            or (item.content_etag is not None and existing.content_etag == item.content_etag)
+        )
+    ), None)
+
+def _preflight_result(item: PreflightItem, existing: Optional[FileModel]) -> PreflightResult:
+    return PreflightResult(
+        md5_hash=item.md5_hash, content_etag=item.content_etag, file_size=item.file_size, exists=existing is not None,
+        file=FileDetail.model_validate(existing) if existing is not None else None
+    )
+
+def _preflight_keys(items: List[PreflightItem]) -> Tuple[List[str], List[str]]:
+    """The distinct MD5 hashes and content ETags the items ask about."""
+    md5_hashes = {item.md5_hash for item in items if item.md5_hash is not None}
+    content_etags = {item.content_etag for item in items if item.content_etag is not None}
+    return list(md5_hashes), list(content_etags)
+
+@upload_router.post('/preflight', response_model=PreflightResult)
+async def preflight_upload(
+    item: PreflightItem,
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """
+    Check whether a file with this MD5 or content ETag and size is already uploaded.
+    Returns the existing file's details if so, letting the client skip the upload.
+    """
+    file_repo = file_repository(db)
+    existing_files = await file_repo.get_files_by_content(current_user.id, *_preflight_keys([item]))
+    return _preflight_result(item, _preflight_match(item, existing_files))
+
+@upload_router.post('/preflight/batch', response_model=PreflightBatchResponse)
+async def preflight_upload_batch(
+    batch_in: PreflightBatchRequest,
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """
+    Batch variant of /preflight for folder uploads: one query for up to 1000 hashes.
+    """
+    file_repo = file_repository(db)
+    existing_files = await file_repo.get_files_by_content(current_user.id, *_preflight_keys(batch_in.items))
+    return PreflightBatchResponse(results=[_preflight_result(item, _preflight_match(item, existing_files)) for item in batch_in.items])
+
+# --- Direct-to-S3 multipart uploads ---
+# The client sends audio bytes straight to S3 through presigned part URLs; the API
+# only coordinates the upload and records the File row once S3 has assembled it.
+
+def _ensure_user_key(s3_key: str, username: str) -> None:
+    """Rejects multipart requests for keys outside the current user's audio prefix."""
+    if not s3_key.startswith(f"{Config.AUDIO_KEY}/{username}/"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+
+async def _delete_uploaded_object(s3_client: AsyncProxy, s3_key: str) -> None:
+    """Best-effort removal of an assembled object that will not be recorded."""
+    try:
+        await s3_client.delete_object(Bucket=Config.AWS_S3_BUCKET_NAME, Key=s3_key)
+    except (BotoCoreError, ClientError) as e:
+        logger.error("Failed to clean up S3 object '%s': %s", s3_key, e)
+
+async def _probe_uploaded_object(s3_client: AsyncProxy, s3_key: str, file_size: int, filename: str, username: str) -> Optional[AudioInfo]:
+    """
+    Probes an assembled multipart object with ranged GETs of its header. The API never saw
+    its bytes, so this is the first chance to check them; a bad object is deleted. If S3
+    fails here the upload is still recorded, just without audio metadata.
+    """
+    if not Config.AUDIO_PROBE_ENABLED:
+        return None
+    try:
+        with span("audio_probe"):
+            return await run_io(probe_s3_object, s3_client.target, Config.AWS_S3_BUCKET_NAME, s3_key, file_size, filename)
+    except AudioProbeError as e:
+        await _delete_uploaded_object(s3_client, s3_key)
+        logger.warning("User '%s' upload '%s' rejected by the audio probe: %s", username, s3_key, e)
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=f"Not a valid audio file: {e}")
+    except (BotoCoreError, ClientError) as e:
+        logger.error("Could not probe uploaded object '%s': %s", s3_key, e)
+        return None
+
+
+@upload_router.post(
+    '/multipart/start',
+    status_code=status.HTTP_201_CREATED,
+    response_model=MultipartUploadStartResponse,
+    responses={
+        413: {"model": ErrorResponse, "description": "File too large"},
+        415: {"model": ErrorResponse, "description": "Unsupported file type"},
+        500: {"model": ErrorResponse, "description": "Internal server error"}
+    }
+)
+async def start_multipart_upload(
+    upload_in: MultipartUploadStart,
+    current_user: User = Depends(get_current_user),
+    s3_client: AsyncProxy = Depends(get_async_s3_client)
+):
+    """
+    Start a direct-to-S3 multipart upload and return its upload ID, key and part layout.
+    """
+    username = current_user.username
+    mime_type = _validate_audio_type(upload_in.filename, username)
+
+    if upload_in.file_size > Config.MAX_UPLOAD_FILE_SIZE_MB * 1024 * 1024:
+        logger.warning("User '%s' file too large: %s bytes", username, upload_in.file_size)
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"File size exceeds {Config.MAX_UPLOAD_FILE_SIZE_MB}MB.")
+
+    # Same layout as StreamedUpload below the part limit, so both paths get the same content ETag.
+    part_size = multipart_part_size(upload_in.file_size, Config.S3_MULTIPART_PART_SIZE_MB * 1024 * 1024)
+    part_count = max(1, math.ceil(upload_in.file_size / part_size))
+
+    _, _, s3_key = _new_storage_key(username, upload_in.filename)
+    try:
+        response = await s3_client.create_multipart_upload(
+            Bucket=Config.AWS_S3_BUCKET_NAME,
+            Key=s3_key,
+            ContentType=mime_type,
+            ContentDisposition=_content_disposition(upload_in.filename),
+            Metadata={'original-filename': quote(upload_in.filename)}
+        )
+    except (BotoCoreError, ClientError) as e:
+        logger.error("Could not start multipart upload for user '%s': %s", username, e, exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not start upload with storage service.")
+
+    logger.info("Multipart upload started for user '%s': %s (%s parts)", username, s3_key, part_count)
+    return MultipartUploadStartResponse(upload_id=response['UploadId'], s3_key=s3_key, part_size=part_size, part_count=part_count)
+
+@upload_router.post('/multipart/presign', response_model=MultipartPresignResponse)
+async def presign_multipart_parts(
+    presign_in: MultipartPresignRequest,
+    current_user: User = Depends(get_current_user),
+    s3_client: AsyncProxy = Depends(get_async_s3_client)
+):
+    """
+    Return presigned PUT URLs for the requested parts. Each URL is bound to the part's
+    Content-MD5, so S3 rejects any part whose bytes do not match the client's hash.
+    """
+    _ensure_user_key(presign_in.s3_key, current_user.username)
+
+    def _sign_all() -> List[PresignedPart]:
+        return [
+            PresignedPart(
+                part_number=part.part_number,
+                url=s3_client.target.generate_presigned_url(
+                    'upload_part',
+                    Params={
+                        'Bucket': Config.AWS_S3_BUCKET_NAME,
+                        'Key': presign_in.s3_key,
+                        'UploadId': presign_in.upload_id,
+                        'PartNumber': part.part_number,
+                        'ContentMD5': part.content_md5
+                    },
+                    ExpiresIn=Config.S3_PRESIGNED_PART_EXPIRY_SECONDS
+                )
+            )
+            for part in presign_in.parts
+        ]
+
+    try:
+        return MultipartPresignResponse(parts=await run_io(_sign_all))
+    except (BotoCoreError, ClientError) as e:
+        logger.error("Could not presign parts for user '%s': %s", current_user.username, e, exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not generate upload URLs.")
+
+@upload_router.post(
+    '/multipart/complete',
+    status_code=status.HTTP_201_CREATED,
+    response_model=FileResponse,
+    responses={
+        400: {"model": ErrorResponse, "description": "Parts do not match the uploaded object"},
+        404: {"model": ErrorResponse, "description": "Upload not found"},
+        413: {"model": ErrorResponse, "description": "File too large"},
+        415: {"model": ErrorResponse, "description": "Not a valid audio file"},
+        500: {"model": ErrorResponse, "description": "Internal server error"}
+    }
+)
+async def complete_multipart_upload(
+    complete_in: MultipartUploadComplete,
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db),
+    s3_client: AsyncProxy = Depends(get_async_s3_client)
+):
+    """
+    Assemble the uploaded parts in S3, verify the result and record the File row under
+    the object's ETag.
+    """
+    username = current_user.username
+    s3_key = complete_in.s3_key
+    _ensure_user_key(s3_key, username)
+
+    parts = sorted(complete_in.parts, key=lambda part: part.part_number)
+    try:
+        with span("complete_multipart_upload", parts=len(parts)):
+            await s3_client.complete_multipart_upload(
+                Bucket=Config.AWS_S3_BUCKET_NAME,
+                Key=s3_key,
+                UploadId=complete_in.upload_id,
+                MultipartUpload={'Parts': [{'PartNumber': part.part_number, 'ETag': part.etag} for part in parts]}
+            )
+        with span("head_object"):
+            head = await s3_client.head_object(Bucket=Config.AWS_S3_BUCKET_NAME, Key=s3_key)
+    except ClientError as e:
+        error_code = e.response['Error']['Code']
+        if error_code == 'NoSuchUpload':
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+        if error_code in ('InvalidPart', 'InvalidPartOrder', 'EntityTooSmall'):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid upload parts: {error_code}")
+        logger.error("Could not complete multipart upload for user '%s', key '%s': %s", username, s3_key, e, exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not complete upload with storage service.")
+    except BotoCoreError as e:
+        logger.error("Could not complete multipart upload for user '%s', key '%s': %s", username, s3_key, e, exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not complete upload with storage service.")
+
+    file_size = head['ContentLength']
+    if file_size > Config.MAX_UPLOAD_FILE_SIZE_MB * 1024 * 1024:
+        await _delete_uploaded_object(s3_client, s3_key)
+        logger.warning("User '%s' file too large: %s bytes", username, file_size)
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"File size exceeds {Config.MAX_UPLOAD_FILE_SIZE_MB}MB.")
+
+    # The API never sees these bytes, so it records no whole-file MD5. Every part was PUT
+    # with a Content-MD5 that S3 enforced and S3 checked the part ETags on complete, so the
+    # object's own ETag identifies the content. Under SSE-KMS ETags are not content-derived
+    # and match nothing.
+    content_etag = head['ETag'].strip('"').lower()
+    UPLOAD_BYTES.inc("direct", amount=file_size)
+    stored_filename = s3_key.rsplit('/', 1)[-1]
+    original_filename = unquote(head.get('Metadata', {}).get('original-filename', stored_filename))
+    audio_info = await _probe_uploaded_object(s3_client, s3_key, file_size, original_filename, username)
+    try:
+        file_repo = file_repository(db)
+        with span("duplicate_lookup"):
+            existing = next(iter(await file_repo.get_files_by_content(current_user.id, [], [content_etag])), None)
+        if existing:
+            await _delete_uploaded_object(s3_client, s3_key)
+            logger.info("User '%s' tried to upload duplicate file (ETag: %s).", username, content_etag)
+            return FileResponse(message="File already uploaded", filename=existing.original_filename, content_etag=content_etag, s3_key=existing.s3_key)
+
+        file_data = {
+            'file_id': _file_id_from_key(s3_key), 'original_filename': original_filename, 'stored_filename': stored_filename,
+            'content_etag': content_etag, 's3_key': s3_key, 'file_size': file_size,
+            'mime_type': head.get('ContentType') or 'application/octet-stream',
+            **_audio_metadata(audio_info)
+        }
+        with span("record_file"):
+            await file_repo.create_file(current_user.id, file_data, created_by=username)
+            await commit(db)
+    except Exception as e:
+        await rollback(db)
+        await _delete_uploaded_object(s3_client, s3_key)
+        logger.error("Unexpected error recording multipart upload for user '%s': %s", username, e, exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred.")
+
+    logger.info("Audio file uploaded directly to S3 for user '%s': %s", username, s3_key)
+    return FileResponse(message="Audio file uploaded successfully", filename=original_filename, content_etag=content_etag, s3_key=s3_key)
+
+@upload_router.post('/multipart/abort', response_model=DeleteResponse)
+async def abort_multipart_upload(
+    abort_in: MultipartUploadAbort,
+    current_user: User = Depends(get_current_user),
+    s3_client: AsyncProxy = Depends(get_async_s3_client)
+):
+    """
+    Abort a multipart upload and free the parts already stored in S3.
+    """
+    _ensure_user_key(abort_in.s3_key, current_user.username)
+    try:
+        await s3_client.abort_multipart_upload(Bucket=Config.AWS_S3_BUCKET_NAME, Key=abort_in.s3_key, UploadId=abort_in.upload_id)
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NoSuchUpload':
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+        logger.error("Could not abort multipart upload for user '%s', key '%s': %s", current_user.username, abort_in.s3_key, e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not abort upload.")
+
+    logger.info("Multipart upload aborted for user '%s': %s", current_user.username, abort_in.s3_key)
+    return {"message": "Upload aborted successfully."}
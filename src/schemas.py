@@ -1,8 +1,19 @@
 # src/schemas.py
-from pydantic import BaseModel, Field, validator
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator, validator
+from typing import Optional, List, Dict
 import re
 from datetime import datetime
+from enum import Enum
+
+def _validate_md5_hex(v: str) -> str:
+    if not re.match(r'^[0-9a-f]{32}$', v.lower()):
+        raise ValueError('md5_hash must be a 32-character hex digest')
+    return v.lower()
+
+def _validate_content_etag(v: str) -> str:
+    if not re.match(r'^[0-9a-f]{32}-[1-9][0-9]{0,4}$', v.lower()):
+        raise ValueError("content_etag must be an S3 multipart ETag: '{32 hex digits}-{part count}'")
+    return v.lower()
 
 class UserCreate(BaseModel):
     username: str = Field(
@@ -35,21 +46,70 @@ class FileDetail(BaseModel):
     original_filename: str
     file_size: int
     created_at: datetime
+    duration_seconds: Optional[float] = Field(None, description="Audio length from the upload's header probe")
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
     
     class Config:
         from_attributes = True
 
+class TranscriptFormat(str, Enum):
+    json = "json"  # Transcribe output with per-word timings
+    txt = "txt"
+    srt = "srt"
+    vtt = "vtt"
+
 class TranscriptDetail(BaseModel):
     key: str
     size: int
     last_modified: datetime
+    download_url: Optional[str] = Field(None, description="Set when the listing was requested with a format")
+
+    class Config:
+        from_attributes = True
+
+class TranscriptSearchResult(BaseModel):
+    key: str = Field(..., description="S3 key of the matching transcript")
+    file_id: Optional[str] = Field(None, description="Audio file the transcript belongs to, if it still exists")
+    start_time: float = Field(..., description="Start of the matching passage, in seconds")
+    end_time: float = Field(..., description="End of the matching passage, in seconds")
+    snippet: str
+    score: float = Field(..., description="Relevance; higher is better")
+
+    class Config:
+        from_attributes = True
 
 class DownloadURLResponse(BaseModel):
     download_url: str
 
+class DownloadURLBatchRequest(BaseModel):
+    file_ids: List[str] = Field(default_factory=list, max_length=1000, description="Audio file_ids to sign")
+    transcript_keys: List[str] = Field(default_factory=list, max_length=1000, description="Transcript S3 keys to sign")
+    transcript_format: TranscriptFormat = Field(TranscriptFormat.json, description="Format the transcript URLs point to")
+
+class DownloadURLBatchResponse(BaseModel):
+    audio: Dict[str, str] = Field(default_factory=dict, description="file_id -> download URL")
+    transcripts: Dict[str, str] = Field(default_factory=dict, description="transcript key -> download URL")
+    not_found: List[str] = Field(default_factory=list, description="Requested file_ids or keys the user does not have")
+
 class DeleteResponse(BaseModel):
     message: str
 
+class BulkDeleteRequest(BaseModel):
+    file_ids: List[str] = Field(default_factory=list, max_length=1000, description="Audio file_ids to delete")
+    transcript_keys: List[str] = Field(default_factory=list, max_length=1000, description="Transcript S3 keys to delete")
+    include_transcripts: bool = Field(False, description="Also delete the transcripts of the listed audio files")
+
+class BulkDeleteItemResult(BaseModel):
+    type: str = Field(..., description="'audio' or 'transcript'")
+    id: str = Field(..., description="file_id for audio, S3 key for transcripts")
+    status: str = Field(..., description="'deleted', 'not_found' or 'forbidden'")
+
+class BulkDeleteResponse(BaseModel):
+    deleted: int
+    failed: int
+    results: List[BulkDeleteItemResult]
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -60,8 +120,85 @@ class TokenData(BaseModel):
 class FileResponse(BaseModel):
     message: str
     filename: Optional[str]
-    md5_hash: str
+    md5_hash: Optional[str] = Field(None, description="Whole-file MD5; only computed for uploads through the API")
+    content_etag: Optional[str] = Field(None, description="S3 multipart ETag of the content in the standard part layout")
     s3_key: Optional[str]
 
 class ErrorResponse(BaseModel):
-    detail: str
\ No newline at end of file
+    detail: str
+
+class MultipartUploadStart(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    file_size: int = Field(..., gt=0, description="Total size of the file in bytes")
+
+class MultipartUploadStartResponse(BaseModel):
+    upload_id: str
+    s3_key: str
+    part_size: int
+    part_count: int
+
+class PartPresignRequest(BaseModel):
+    part_number: int = Field(..., ge=1, le=10000)
+    content_md5: str = Field(..., description="Base64-encoded MD5 of the part; S3 rejects parts that do not match")
+
+class MultipartPresignRequest(BaseModel):
+    upload_id: str
+    s3_key: str
+    parts: List[PartPresignRequest] = Field(..., min_length=1, max_length=1000)
+
+class PresignedPart(BaseModel):
+    part_number: int
+    url: str
+
+class MultipartPresignResponse(BaseModel):
+    parts: List[PresignedPart]
+
+class CompletedPart(BaseModel):
+    part_number: int = Field(..., ge=1, le=10000)
+    etag: str
+
+class MultipartUploadComplete(BaseModel):
+    upload_id: str
+    s3_key: str
+    parts: List[CompletedPart] = Field(..., min_length=1, max_length=10000)
+
+class MultipartUploadAbort(BaseModel):
+    upload_id: str
+    s3_key: str
+
+class PreflightItem(BaseModel):
+    md5_hash: Optional[str] = Field(None, description="Hex MD5 of the whole file, computed by the client")
+    content_etag: Optional[str] = Field(
+        None, description="Multipart ETag of the file in the part layout /upload/multipart/start returns, computed by the client"
+    )
+    file_size: int = Field(..., ge=0)
+
+    @validator('md5_hash')
+    def validate_md5_hash(cls, v: Optional[str]) -> Optional[str]:
+        return _validate_md5_hex(v) if v is not None else v
+
+    @validator('content_etag')
+    def validate_content_etag(cls, v: Optional[str]) -> Optional[str]:
+        return _validate_content_etag(v) if v is not None else v
+
+    @model_validator(mode='after')
+    def require_a_hash(self) -> 'PreflightItem':
+        if self.md5_hash is None and self.content_etag is None:
+            raise ValueError('Either md5_hash or content_etag is required')
+        return self
+
+class PreflightResult(BaseModel):
+    md5_hash: Optional[str] = None
+    content_etag: Optional[str] = None
+    file_size: int
+    exists: bool
+    file: Optional[FileDetail] = None
+
+class PreflightBatchRequest(BaseModel):
+    items: List[PreflightItem] = Field(..., min_length=1, max_length=1000)
+
+class PreflightBatchResponse(BaseModel):
+    results: List[PreflightResult]
+
+class TranscriptNotification(BaseModel):
+    key: str = Field(..., min_length=1, max_length=512, description="S3 key of the finished transcript")
@@ -0,0 +1,398 @@
+# src/utils/audio_probe.py
+"""
+Audio header probe for G7Static uploads.
+The file extension says what a client claims; the first bytes say what it is. The probe
+checks the magic bytes and parses the container header of WAV/RIFF, MP3 (with ID3v2
+tags), AAC/ADTS, FLAC, Ogg (Vorbis, Opus) and M4A/MP4, and returns the duration, sample
+rate and channel count. A file whose content does not match its extension, is not audio,
+or is cut short is rejected with `AudioProbeError` before it is hashed or stored.
+
+Reads go through fixed-size cached blocks, so a probe usually costs one read of the
+first block; only Ogg (last page, for the duration), MP4 files with the `moov` box at the
+end and MP3s behind a large ID3 tag need a second one.
+"""
+import os
+import struct
+from typing import Callable, Dict, Iterator, NamedTuple, Optional, Tuple
+
+PROBE_BLOCK_SIZE = 64 * 1024
+MAX_CACHED_BLOCKS = 8
+MAX_CHUNK_WALK = 64  # RIFF chunks / MP4 boxes inspected before giving up
+
+# Extension -> container formats its content may have.
+EXTENSION_FORMATS: Dict[str, Tuple[str, ...]] = {
+    '.mp3': ('mp3',),
+    '.wav': ('wav',),
+    '.flac': ('flac',),
+    '.ogg': ('ogg',),
+    '.m4a': ('mp4',),
+    '.aac': ('aac', 'mp4'),
+}
+
+class AudioProbeError(ValueError):
+    """The content is not a supported audio file, or its header is damaged or truncated."""
+
+class AudioInfo(NamedTuple):
+    format: str
+    duration_seconds: Optional[float]
+    sample_rate: Optional[int]
+    channels: Optional[int]
+
+class BlockReader:
+    """Random access over `fetch(offset, length)` through a small cache of aligned blocks."""
+    def __init__(self, fetch: Callable[[int, int], bytes], size: int, block_size: int = PROBE_BLOCK_SIZE):
+        self._fetch = fetch
+        self.size = size
+        self.block_size = block_size
+        self._blocks: Dict[int, bytes] = {}
+
+    def _block(self, index: int) -> bytes:
+        if index not in self._blocks:
+            if len(self._blocks) >= MAX_CACHED_BLOCKS:
+                self._blocks.pop(next(iter(self._blocks)))
+            offset = index * self.block_size
+            self._blocks[index] = self._fetch(offset, min(self.block_size, self.size - offset))
+        return self._blocks[index]
+
+    def read(self, offset: int, length: int) -> bytes:
+        """Up to `length` bytes at `offset`; shorter only at the end of the file."""
+        length = max(0, min(length, self.size - offset))
+        chunks = []
+        while length > 0:
+            index, start = divmod(offset, self.block_size)
+            chunk = self._block(index)[start:start + length]
+            if not chunk:
+                break
+            chunks.append(chunk)
+            offset += len(chunk)
+            length -= len(chunk)
+        return b''.join(chunks)
+
+    def read_exact(self, offset: int, length: int, what: str) -> bytes:
+        data = self.read(offset, length)
+        if len(data) < length:
+            raise AudioProbeError(f"File is truncated inside the {what}")
+        return data
+
+# --- WAV / RIFF ---
+
+def _probe_wav(reader: BlockReader) -> AudioInfo:
+    fmt = None
+    offset = 12
+    for _ in range(MAX_CHUNK_WALK):
+        header = reader.read(offset, 8)
+        if len(header) < 8:
+            break
+        chunk_id, chunk_size = header[:4], struct.unpack('<I', header[4:])[0]
+        if chunk_id == b'fmt ':
+            if chunk_size < 16:
+                raise AudioProbeError("WAV fmt chunk is too short")
+            fmt = struct.unpack('<HHIIHH', reader.read_exact(offset + 8, 16, "WAV fmt chunk"))
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise AudioProbeError("WAV data chunk comes before its fmt chunk")
+            _, channels, sample_rate, byte_rate, _, _ = fmt
+            if not channels or not sample_rate or not byte_rate:
+                raise AudioProbeError("WAV fmt chunk has no channels, sample rate or byte rate")
+            available = reader.size - offset - 8
+            if chunk_size in (0, 0xFFFFFFFF):  # Streamed or RF64-style writers leave the size unset
+                chunk_size = available
+            elif chunk_size > available:
+                raise AudioProbeError("WAV data is shorter than its header declares")
+            return AudioInfo('wav', chunk_size / byte_rate, sample_rate, channels)
+        offset += 8 + chunk_size + (chunk_size & 1)
+    raise AudioProbeError("WAV file has no audio data chunk")
+
+# --- MPEG audio (MP3) and AAC/ADTS ---
+
+_MPEG_BITRATES = {  # kbit/s by (version 1?, layer)
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MPEG_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+_ADTS_SAMPLE_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+
+class _MpegFrame(NamedTuple):
+    version: int  # 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+    layer: int
+    bitrate: int  # bit/s
+    sample_rate: int
+    channels: int
+    length: int  # bytes, header included
+    samples: int
+
+def _mpeg_frame(header: bytes) -> Optional[_MpegFrame]:
+    if len(header) < 4:
+        return None
+    h = struct.unpack('>I', header[:4])[0]
+    version, layer_bits = (h >> 19) & 3, (h >> 17) & 3
+    bitrate_index, rate_index = (h >> 12) & 0xF, (h >> 10) & 3
+    if (h >> 21) != 0x7FF or version == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    layer = 4 - layer_bits
+    is_v1 = version == 3
+    bitrate = _MPEG_BITRATES[(is_v1, layer)][bitrate_index] * 1000
+    sample_rate = _MPEG_SAMPLE_RATES[version][rate_index]
+    padding = (h >> 9) & 1
+    if layer == 1:
+        length, samples = (12 * bitrate // sample_rate + padding) * 4, 384
+    elif layer == 2 or is_v1:
+        length, samples = 144 * bitrate // sample_rate + padding, 1152
+    else:
+        length, samples = 72 * bitrate // sample_rate + padding, 576
+    channels = 1 if (h >> 6) & 3 == 3 else 2
+    return _MpegFrame(version, layer, bitrate, sample_rate, channels, length, samples)
+
+def _adts_frame(header: bytes) -> Optional[Tuple[int, int, int]]:
+    """(sample rate, channels, frame length) of an ADTS header, or None."""
+    if len(header) < 7 or header[0] != 0xFF or header[1] & 0xF6 != 0xF0:
+        return None
+    rate_index = (header[2] >> 2) & 0xF
+    length = ((header[3] & 3) << 11) | (header[4] << 3) | (header[5] >> 5)
+    if rate_index >= len(_ADTS_SAMPLE_RATES) or length < 7:
+        return None
+    return _ADTS_SAMPLE_RATES[rate_index], ((header[2] & 1) << 2) | (header[3] >> 6), length
+
+def _id3v2_end(reader: BlockReader) -> int:
+    """Offset just past a leading ID3v2 tag (0 without one). MP3s often carry large cover art here."""
+    header = reader.read(0, 10)
+    if len(header) < 10 or header[:3] != b'ID3' or any(b & 0x80 for b in header[6:10]):
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    return 10 + size + (10 if header[5] & 0x10 else 0)
+
+def _find_frames(reader: BlockReader, start: int, parse: Callable[[bytes], Optional[tuple]],
+                 length_of: Callable[[tuple], int], stream_of: Callable[[tuple], tuple]) -> Optional[Tuple[int, tuple]]:
+    """
+    Finds the first frame header within a block of `start` that is followed by a header of
+    the same stream (or the end of the file), so stray sync bytes are not taken for audio.
+    """
+    window = reader.read(start, reader.block_size)
+    position = window.find(b'\xff')
+    while 0 <= position < len(window) - 4:
+        frame = parse(window[position:position + 8])
+        if frame is not None:
+            following = start + position + length_of(frame)
+            if following == reader.size:
+                return start + position, frame
+            next_frame = parse(reader.read(following, 8))
+            if next_frame is not None and stream_of(next_frame) == stream_of(frame):
+                return start + position, frame
+        position = window.find(b'\xff', position + 1)
+    return None
+
+def _xing_frame_count(reader: BlockReader, offset: int, frame: _MpegFrame) -> Optional[int]:
+    """Frame count from a Xing/Info or VBRI header in the first frame, present in VBR files."""
+    side_info = (32 if frame.channels == 2 else 17) if frame.version == 3 else (17 if frame.channels == 2 else 9)
+    xing = reader.read(offset + 4 + side_info, 12)
+    if xing[:4] in (b'Xing', b'Info') and len(xing) == 12 and struct.unpack('>I', xing[4:8])[0] & 1:
+        return struct.unpack('>I', xing[8:12])[0]
+    vbri = reader.read(offset + 36, 18)
+    if vbri[:4] == b'VBRI' and len(vbri) == 18:
+        return struct.unpack('>I', vbri[14:18])[0]
+    return None
+
+def _probe_mpeg(reader: BlockReader, start: int) -> AudioInfo:
+    found = _find_frames(reader, start, _mpeg_frame, lambda frame: frame.length, lambda frame: (frame.version, frame.layer, frame.sample_rate))
+    if found is not None:
+        offset, frame = found
+        frame_count = _xing_frame_count(reader, offset, frame)
+        if frame_count:
+            duration = frame_count * frame.samples / frame.sample_rate
+        else:
+            duration = (reader.size - offset) * 8 / frame.bitrate
+        return AudioInfo('mp3', duration, frame.sample_rate, frame.channels)
+
+    found = _find_frames(reader, start, _adts_frame, lambda frame: frame[2], lambda frame: frame[:2])
+    if found is not None:
+        # ADTS has no duration field; estimate it from the frames in the first block.
+        offset, (sample_rate, channels, _) = found
+        frames, position, end = 0, offset, min(reader.size, offset + reader.block_size)
+        while position < end and (frame := _adts_frame(reader.read(position, 7))) is not None:
+            frames += 1
+            position += frame[2]
+        duration = (reader.size - offset) / ((position - offset) / frames) * 1024 / sample_rate
+        return AudioInfo('aac', duration, sample_rate, channels or None)
+    raise AudioProbeError("Content is not a supported audio format")
+
+# --- FLAC ---
+
+def _probe_flac(reader: BlockReader, start: int) -> AudioInfo:
+    block = reader.read_exact(start + 4, 4 + 34, "FLAC STREAMINFO block")
+    if block[0] & 0x7F != 0:
+        raise AudioProbeError("FLAC stream does not start with STREAMINFO")
+    packed = int.from_bytes(block[4 + 10:4 + 18], 'big')
+    sample_rate, channels, total_samples = packed >> 44, ((packed >> 41) & 7) + 1, packed & 0xFFFFFFFFF
+    if not sample_rate:
+        raise AudioProbeError("FLAC STREAMINFO has no sample rate")
+    return AudioInfo('flac', total_samples / sample_rate if total_samples else None, sample_rate, channels)
+
+# --- Ogg (Vorbis, Opus) ---
+
+def _last_granule(reader: BlockReader, serial: bytes) -> Optional[int]:
+    """Granule position of the stream's last page. Ogg pages are at most ~64 KB, so it sits in the tail."""
+    tail_start = max(0, reader.size - reader.block_size - 1024)
+    tail = reader.read(tail_start, reader.size - tail_start)
+    position = tail.rfind(b'OggS')
+    while position >= 0:
+        page = tail[position:position + 18]
+        if len(page) == 18 and page[14:18] == serial:
+            granule = struct.unpack('<q', page[6:14])[0]
+            if granule >= 0:
+                return granule
+        position = tail.rfind(b'OggS', 0, position)
+    return None
+
+def _probe_ogg(reader: BlockReader) -> AudioInfo:
+    page = reader.read_exact(0, 27, "Ogg page header")
+    serial = page[14:18]
+    packet_start = 27 + page[26]
+    packet = reader.read(packet_start, 19)
+    if packet[:7] == b'\x01vorbis' and len(packet) >= 16:
+        channels, sample_rate = packet[11], struct.unpack('<I', packet[12:16])[0]
+        pre_skip = 0
+    elif packet[:8] == b'OpusHead' and len(packet) >= 16:
+        # Opus always decodes at 48 kHz; the header's rate is only the source's.
+        channels, pre_skip = packet[9], struct.unpack('<H', packet[10:12])[0]
+        sample_rate = struct.unpack('<I', packet[12:16])[0] or 48000
+    else:
+        raise AudioProbeError("Ogg stream is not Vorbis or Opus audio")
+    if not channels or not sample_rate:
+        raise AudioProbeError("Ogg audio header has no channels or sample rate")
+    granule = _last_granule(reader, serial)
+    clock_rate = 48000 if packet[:8] == b'OpusHead' else sample_rate
+    duration = max(granule - pre_skip, 0) / clock_rate if granule is not None else None
+    return AudioInfo('ogg', duration, sample_rate, channels)
+
+# --- M4A / MP4 ---
+
+def _mp4_boxes(reader: BlockReader, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yields (type, payload offset, box end) for the boxes between `start` and `end`."""
+    offset = start
+    for _ in range(MAX_CHUNK_WALK):
+        if offset + 8 > end:
+            return
+        header = reader.read_exact(offset, 8, "MP4 box header")
+        size, box_type = struct.unpack('>I', header[:4])[0], header[4:]
+        payload = offset + 8
+        if size == 1:
+            size = struct.unpack('>Q', reader.read_exact(offset + 8, 8, "MP4 box header"))[0]
+            payload += 8
+        elif size == 0:
+            size = end - offset
+        if size < payload - offset:
+            raise AudioProbeError("MP4 box has an invalid size")
+        if offset + size > end:
+            raise AudioProbeError(f"File is truncated inside the MP4 '{box_type.decode('latin-1')}' box")
+        yield box_type, payload, offset + size
+        offset += size
+
+def _mp4_child(reader: BlockReader, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    for child_type, payload, child_end in _mp4_boxes(reader, start, end):
+        if child_type == box_type:
+            return payload, child_end
+    return None
+
+def _mp4_time(reader: BlockReader, payload: int) -> Tuple[int, int]:
+    """(timescale, duration) from an mvhd or mdhd box, version 0 or 1."""
+    version = reader.read_exact(payload, 1, "MP4 header box")[0]
+    if version == 1:
+        return struct.unpack('>IQ', reader.read_exact(payload + 20, 12, "MP4 header box"))
+    return struct.unpack('>II', reader.read_exact(payload + 12, 8, "MP4 header box"))
+
+def _probe_mp4(reader: BlockReader) -> AudioInfo:
+    moov = audio = None
+    has_video = False
+    for box_type, payload, end in _mp4_boxes(reader, 0, reader.size):
+        if box_type == b'moov':
+            moov = (payload, end)
+    if moov is None:
+        raise AudioProbeError("MP4 file has no moov box")
+
+    for box_type, trak, trak_end in _mp4_boxes(reader, *moov):
+        mdia = _mp4_child(reader, trak, trak_end, b'mdia') if box_type == b'trak' else None
+        hdlr = _mp4_child(reader, *mdia, b'hdlr') if mdia else None
+        handler = reader.read(hdlr[0] + 8, 4) if hdlr else b''
+        if handler == b'vide':
+            has_video = True
+        elif handler == b'soun' and audio is None:
+            audio = mdia
+    if has_video:
+        raise AudioProbeError("MP4 file contains video")
+    if audio is None:
+        raise AudioProbeError("MP4 file has no audio track")
+
+    sample_rate = channels = None
+    minf = _mp4_child(reader, *audio, b'minf')
+    stbl = _mp4_child(reader, *minf, b'stbl') if minf else None
+    stsd = _mp4_child(reader, *stbl, b'stsd') if stbl else None
+    if stsd:
+        # Full box header and entry count, then the first AudioSampleEntry.
+        entry = reader.read(stsd[0] + 8, 36)
+        if len(entry) == 36:
+            channels = struct.unpack('>H', entry[24:26])[0] or None
+            sample_rate = struct.unpack('>I', entry[32:36])[0] >> 16 or None
+
+    duration = None
+    mdhd = _mp4_child(reader, *audio, b'mdhd')
+    mvhd = _mp4_child(reader, *moov, b'mvhd')
+    for header in (mdhd, mvhd):
+        if header:
+            timescale, units = _mp4_time(reader, header[0])
+            if timescale and units not in (0, 0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+                duration = units / timescale
+                break
+    return AudioInfo('mp4', duration, sample_rate, channels)
+
+# --- Entry points ---
+
+def probe_audio(reader: BlockReader) -> AudioInfo:
+    """Identifies the container from its magic bytes and parses its header."""
+    head = reader.read(0, 12)
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return _probe_wav(reader)
+    if head[:4] == b'OggS':
+        return _probe_ogg(reader)
+    if head[4:8] == b'ftyp':
+        return _probe_mp4(reader)
+    start = _id3v2_end(reader)
+    if reader.read(start, 4) == b'fLaC':
+        return _probe_flac(reader, start)
+    return _probe_mpeg(reader, start)
+
+def check_audio(reader: BlockReader, filename: str) -> AudioInfo:
+    """Probes the content and checks it is what the filename's extension claims."""
+    if reader.size == 0:
+        raise AudioProbeError("File is empty")
+    info = probe_audio(reader)
+    extension = os.path.splitext(filename)[1].lower()
+    if info.format not in EXTENSION_FORMATS.get(extension, ()):
+        raise AudioProbeError(f"File content is {info.format}, not {extension or 'a supported type'}")
+    if info.duration_seconds is not None and info.duration_seconds <= 0:
+        raise AudioProbeError("Audio has no duration")
+    return info
+
+def probe_file(fp, filename: str) -> AudioInfo:
+    """Probes a seekable file object and rewinds it to the start for the upload."""
+    size = fp.seek(0, os.SEEK_END)
+    def fetch(offset: int, length: int) -> bytes:
+        fp.seek(offset)
+        return fp.read(length)
+    try:
+        return check_audio(BlockReader(fetch, size), filename)
+    finally:
+        fp.seek(0)
+
+def probe_s3_object(s3_client, bucket: str, key: str, size: int, filename: str) -> AudioInfo:
+    """Probes an object already in S3 (direct multipart uploads) with ranged GETs."""
+    def fetch(offset: int, length: int) -> bytes:
+        body = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes={offset}-{offset + length - 1}")['Body']
+        try:
+            return body.read()
+        finally:
+            body.close()
+    return check_audio(BlockReader(fetch, size), filename)
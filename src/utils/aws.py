@@ -4,16 +4,21 @@ Utility module for AWS S3 client initialization and dependency injection.
 """
 import boto3
 from src.config import Config
-from src.log import logger
+from src.log import get_logger
+from src.metrics import instrument_s3_client
+from src.utils.concurrency import AsyncProxy
 from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
 
+logger = get_logger(__name__)
+
 # --- Client Initialization ---
 # This block runs only once when the application starts, creating a single, shared client.
 try:
     logger.info("Initializing shared AWS S3 client...")
     s3_config = BotoConfig(
-        s3={'addressing_style': 'path'}
+        s3={'addressing_style': 'path'},
+        signature_version='s3v4'  # SigV4 presigned URLs also sign Content-MD5 for direct part uploads
     )
     # This s3_client instance will be reused across the application
     s3_client = boto3.client(
@@ -23,17 +28,29 @@ try:
         region_name=Config.AWS_REGION,
         config=s3_config
     )
+    if Config.METRICS_ENABLED:
+        instrument_s3_client(s3_client)
     logger.info("Shared AWS S3 client initialized successfully.")
 except (NoCredentialsError, PartialCredentialsError) as e:
-    logger.critical(f"AWS credentials not found or incomplete: {e}. Please check your .env file.")
+    logger.critical("AWS credentials not found or incomplete: %s. Please check your .env file.", e)
     raise
 except Exception as e:
-    logger.critical(f"An unexpected error occurred during AWS S3 client initialization: {e}")
+    logger.critical("An unexpected error occurred during AWS S3 client initialization: %s", e)
     raise
 
-# --- FastAPI Dependency ---
+# Awaitable view of the same shared client; each call runs in the bounded I/O pool.
+async_s3_client = AsyncProxy(s3_client)
+
+# --- FastAPI Dependencies ---
 def get_s3_client():
     """
     FastAPI dependency that provides the shared S3 client instance.
     """
-    return s3_client
\ No newline at end of file
+    return s3_client
+
+def get_async_s3_client() -> AsyncProxy:
+    """
+    FastAPI dependency that provides the shared S3 client behind an awaitable facade,
+    for use inside async routes.
+    """
+    return async_s3_client
\ No newline at end of file
@@ -0,0 +1,124 @@
+# src/utils/blobs.py
+"""
+Content-addressed audio storage for G7Static (CONTENT_ADDRESSED_STORAGE).
+Audio is stored once per unique content (MD5 and size) as a `ContentBlob` under
+`{AUDIO_KEY}/{SHARED_CONTENT_OWNER}/`, and every user's File row references it with a
+counted reference. The transcription Lambda treats a blob like any other upload, so its
+transcript lands under `{TRANSCRIPT_KEY}/{SHARED_CONTENT_OWNER}/`. `share_blob_transcript`
+then gives each referencing user a server-side copy of it (a few KB), so Transcribe runs
+once per content while transcript listing, search and deletion stay per user.
+"""
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+from sqlalchemy.exc import IntegrityError
+
+from src.config import Config
+from src.db.async_repositories import blob_repository, rollback
+from src.log import get_logger
+from src.models.models import ContentBlob
+from src.utils.concurrency import AsyncProxy, run_io
+from src.utils.transcripts import (
+    DERIVATIVE_FORMATS, parse_transcript_key, transcript_format_key, transcript_object_keys,
+    record_transcript, index_transcript_text
+)
+
+logger = get_logger(__name__)
+
+def blob_storage_key(stored_filename: str) -> str:
+    return f"{Config.AUDIO_KEY}/{Config.SHARED_CONTENT_OWNER}/{stored_filename}"
+
+def is_blob_key(s3_key: str) -> bool:
+    return s3_key.startswith(f"{Config.AUDIO_KEY}/{Config.SHARED_CONTENT_OWNER}/")
+
+def blob_transcript_key(blob: ContentBlob) -> str:
+    """Where the Lambda writes the blob's transcript: same folder and stem under TRANSCRIPT_KEY."""
+    stem = blob.s3_key.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    return f"{Config.TRANSCRIPT_KEY}/{Config.SHARED_CONTENT_OWNER}/{stem}.json"
+
+async def claim_blob(db: Any, s3_key: str, md5_hash: str, file_size: int, mime_type: str, store: Callable[[], Awaitable[None]]) -> ContentBlob:
+    """
+    Returns the blob holding this content, with a reference counted for the caller. Known
+    content reuses the existing blob; new content is made visible by `store()` at `s3_key`
+    and recorded as a blob. If another upload records the same content first, theirs is
+    used. A blob whose last reference is released between the lookup and the claim is not
+    revived: the content is stored and recorded anew. Whenever the result's s3_key is not
+    `s3_key`, the caller's object is redundant. The caller commits.
+    """
+    blob_repo = blob_repository(db)
+    blob = await blob_repo.get_blob_by_content(md5_hash, file_size)
+    stored = False
+    while True:
+        if blob is not None:
+            if await blob_repo.add_reference(blob.id):
+                return blob
+            # Released since the lookup. The UPDATE has waited for that delete to commit, so
+            # the row no longer blocks a new one; SQLite may even give the new row its id.
+            await blob_repo.forget(blob)
+        # New or released content: store this upload's object and record it as the blob.
+        if not stored:
+            await store()
+            stored = True
+        try:
+            return await blob_repo.create_blob({'md5_hash': md5_hash, 'file_size': file_size, 's3_key': s3_key, 'mime_type': mime_type})
+        except IntegrityError:
+            await rollback(db)
+            blob = await blob_repo.get_blob_by_content(md5_hash, file_size)
+            if blob is None:
+                raise
+
+async def release_blobs(db: Any, blob_ids: List[int]) -> List[str]:
+    """
+    Drops one reference per id and returns the S3 keys of blobs that are no longer used
+    (audio, transcript and derivatives), for the caller to queue for deletion.
+    """
+    unused = await blob_repository(db).release(blob_ids)
+    return [key for blob in unused for key in [blob.s3_key] + transcript_object_keys(blob_transcript_key(blob))]
+
+def _copy_transcript(s3_client: Any, source_key: str, target_key: str) -> Any:
+    """Copies a transcript and whichever derivatives it has; returns the JSON's head_object response."""
+    head = s3_client.head_object(Bucket=Config.AWS_S3_BUCKET_NAME, Key=source_key)
+    for fmt in ("json",) + DERIVATIVE_FORMATS:
+        try:
+            s3_client.copy_object(
+                Bucket=Config.AWS_S3_BUCKET_NAME,
+                Key=transcript_format_key(target_key, fmt),
+                CopySource={'Bucket': Config.AWS_S3_BUCKET_NAME, 'Key': transcript_format_key(source_key, fmt)}
+            )
+        except ClientError as e:
+            if fmt == "json" or e.response['Error']['Code'] not in ('404', 'NoSuchKey'):
+                raise
+    return head
+
+async def copy_blob_transcript(db: Any, s3_client: AsyncProxy, transcript_key: str, owners: List[Tuple[str, str]]) -> int:
+    """
+    Gives each (username, stored_filename) owner its own copy of a blob's transcript at
+    `{TRANSCRIPT_KEY}/{username}/{stored stem}.json`, indexed and searchable. Returns how
+    many owners were served; failures are logged. The caller commits.
+    """
+    copied = 0
+    for username, stored_filename in owners:
+        target_key = f"{Config.TRANSCRIPT_KEY}/{username}/{stored_filename.rsplit('.', 1)[0]}.json"
+        try:
+            head = await run_io(_copy_transcript, s3_client.target, transcript_key, target_key)
+        except ClientError as e:
+            logger.error("Could not copy shared transcript '%s' to '%s': %s", transcript_key, target_key, e)
+            continue
+        transcript = await record_transcript(db, target_key, head['ContentLength'], head['LastModified'], "transcriber")
+        if transcript is not None:
+            await index_transcript_text(db, s3_client, transcript)
+            copied += 1
+    return copied
+
+async def share_blob_transcript(db: Any, s3_client: AsyncProxy, transcript_key: str) -> Optional[int]:
+    """
+    Handles a finished transcript of a blob: remembers it on the blob and copies it to every
+    user whose file references the blob. Returns how many users got it, or None when no blob
+    matches (e.g. it was deleted, or a duplicate direct upload was discarded). The caller commits.
+    """
+    parsed = parse_transcript_key(transcript_key)
+    blob = await blob_repository(db).get_blob_by_stored_stem(parsed[1]) if parsed else None
+    if blob is None:
+        return None
+    await blob_repository(db).set_transcript_key(blob, transcript_key)
+    return await copy_blob_transcript(db, s3_client, transcript_key, await blob_repository(db).get_blob_owners(blob.id))
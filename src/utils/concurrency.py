@@ -0,0 +1,62 @@
+# src/utils/concurrency.py
+"""
+Bounded worker pool for blocking I/O (boto3 and synchronous SQLAlchemy calls).
+Async routes await these helpers instead of calling blocking clients directly,
+so a slow S3 transfer or DB query never stalls the event loop.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from src.config import Config
+
+T = TypeVar("T")
+
+# Shared, bounded executor used for every blocking I/O call made from async code.
+io_executor = ThreadPoolExecutor(
+    max_workers=Config.IO_THREAD_POOL_SIZE,
+    thread_name_prefix="g7-io"
+)
+
+# Separate pool for multipart part uploads, so an upload orchestrated from `io_executor`
+# never waits on workers from its own pool.
+upload_part_executor = ThreadPoolExecutor(
+    max_workers=Config.S3_MULTIPART_POOL_SIZE,
+    thread_name_prefix="g7-s3-part"
+)
+
+async def run_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Runs a blocking callable in the shared I/O pool and awaits its result.
+    The caller's context variables are propagated to the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(io_executor, functools.partial(ctx.run, func, *args, **kwargs))
+
+class AsyncProxy:
+    """
+    Awaitable facade over a blocking object.
+    Every callable attribute becomes a coroutine function executed via `run_io`;
+    non-callable attributes are returned unchanged.
+    """
+    def __init__(self, target: Any):
+        self._target = target
+
+    @property
+    def target(self) -> Any:
+        """The wrapped blocking object."""
+        return self._target
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def _call(*args: Any, **kwargs: Any) -> Any:
+            return await run_io(attr, *args, **kwargs)
+
+        return _call
@@ -0,0 +1,145 @@
+# src/utils/deletion.py
+"""
+S3 object removal for G7Static.
+Delete endpoints remove DB rows and, in the same transaction, record the S3 keys in the
+`pending_deletions` outbox (`enqueue_deletions`), so a delete costs one commit. The
+`DeletionWorker` drains the outbox in the background with DeleteObjects batches
+(`delete_s3_objects`, up to 1000 keys per call) and retries failures with exponential
+backoff, so objects are never left orphaned by a transient S3 error.
+"""
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.config import Config
+from src.db.async_repositories import deletion_repository, commit, rollback
+from src.db.database import open_db_session
+from src.log import get_logger
+from src.utils.concurrency import AsyncProxy
+
+logger = get_logger(__name__)
+
+S3_DELETE_BATCH_SIZE = 1000  # S3 maximum keys per DeleteObjects call
+
+def utcnow() -> datetime:
+    """Naive UTC timestamp, as stored in pending_deletions.next_attempt_at."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before the next try after `attempts` tries: base * 2^(attempts-1), capped."""
+    return min(Config.DELETION_RETRY_BASE_SECONDS * 2 ** min(max(attempts - 1, 0), 32), Config.DELETION_RETRY_MAX_SECONDS)
+
+async def enqueue_deletions(db: Any, s3_keys: List[str], actor: str) -> None:
+    """Adds S3 keys to the deletion outbox. The caller commits together with the row delete."""
+    if s3_keys:
+        await deletion_repository(db).enqueue(s3_keys, actor, utcnow())
+
+async def _delete_batch(s3_client: AsyncProxy, keys: List[str]) -> Dict[str, str]:
+    try:
+        response = await s3_client.delete_objects(
+            Bucket=Config.AWS_S3_BUCKET_NAME,
+            Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+        )
+    except (BotoCoreError, ClientError) as e:
+        return {key: str(e) for key in keys}
+    # Quiet mode only reports failures; deleting a missing key counts as success in S3.
+    return {error['Key']: f"{error.get('Code')}: {error.get('Message')}" for error in response.get('Errors', [])}
+
+async def delete_s3_objects(s3_client: AsyncProxy, keys: List[str], batch_size: int = S3_DELETE_BATCH_SIZE) -> Dict[str, str]:
+    """
+    Deletes the given keys in DeleteObjects batches, issued concurrently through the I/O pool.
+    Returns a map of key -> error message for every key that could not be deleted.
+    """
+    keys = list(dict.fromkeys(keys))
+    batch_size = max(1, min(batch_size, S3_DELETE_BATCH_SIZE))
+    batches = [keys[i:i + batch_size] for i in range(0, len(keys), batch_size)]
+    failures: Dict[str, str] = {}
+    for batch_failures in await asyncio.gather(*(_delete_batch(s3_client, batch) for batch in batches)):
+        failures.update(batch_failures)
+    return failures
+
+async def drain_deletions(db: Any, s3_client: AsyncProxy, limit: int = Config.DELETION_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Processes one batch of due outbox rows. Rows are leased (attempt counted, next try
+    scheduled) and committed before S3 is called, so a crash only delays them. Deleted
+    keys lose their rows; failed ones keep them with the error until the retry is due.
+    """
+    claimed = await deletion_repository(db).claim_due(utcnow(), limit, retry_delay)
+    await commit(db)
+    if not claimed:
+        return {"claimed": 0, "deleted": 0, "failed": 0}
+
+    failures = await delete_s3_objects(s3_client, [s3_key for _, s3_key in claimed], limit)
+    deletion_repo = deletion_repository(db)
+    await deletion_repo.delete_by_ids([row_id for row_id, s3_key in claimed if s3_key not in failures])
+    await deletion_repo.record_errors({row_id: failures[s3_key] for row_id, s3_key in claimed if s3_key in failures})
+    await commit(db)
+    for s3_key, error in failures.items():
+        logger.warning("S3 deletion of '%s' failed, will retry: %s", s3_key, error)
+    return {"claimed": len(claimed), "deleted": len(claimed) - len(failures), "failed": len(failures)}
+
+class DeletionWorker:
+    """
+    Background task that drains the deletion outbox. It wakes every poll interval, or
+    right away after `notify()`, and keeps draining while full batches come back.
+    """
+    def __init__(self, poll_interval: float, batch_size: int):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self, s3_client: AsyncProxy) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(s3_client), name="g7-deletion-worker")
+            logger.info("Deletion worker started.")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Deletion worker stopped.")
+
+    def notify(self) -> None:
+        """Asks the worker to drain now, e.g. right after a delete was committed."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _drain(self, s3_client: AsyncProxy) -> None:
+        async with open_db_session() as db:
+            while True:
+                try:
+                    stats = await drain_deletions(db, s3_client, self.batch_size)
+                except SQLAlchemyError as e:
+                    await rollback(db)
+                    logger.error("Deletion worker database error: %s", e)
+                    return
+                if stats["claimed"] < self.batch_size:
+                    return
+
+    async def _run(self, s3_client: AsyncProxy) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                await self._drain(s3_client)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Deletion worker error: %s", e, exc_info=True)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+deletion_worker = DeletionWorker(
+    poll_interval=Config.DELETION_POLL_INTERVAL_SECONDS,
+    batch_size=min(Config.DELETION_BATCH_SIZE, S3_DELETE_BATCH_SIZE)
+)
@@ -0,0 +1,78 @@
+# src/utils/password_hashing.py
+"""
+Bounded worker pool for bcrypt hashing and verification.
+Each bcrypt call costs 100-300 ms of CPU, so it must never run on the event loop.
+Calls are admitted up to `workers + max_queue` at a time; beyond that the hasher
+refuses new work with PasswordHasherBusyError so callers can answer 503 instead of
+building an unbounded backlog.
+"""
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from passlib.context import CryptContext
+
+# Password hashing context
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verifies a plain password against a hashed one."""
+    return pwd_context.verify(plain_password, hashed_password)
+
+def get_password_hash(password: str) -> str:
+    """Hashes a password."""
+    return pwd_context.hash(password)
+
+class PasswordHasherBusyError(Exception):
+    """Raised when the hashing pool and its queue are full."""
+
+class PasswordHasher:
+    """Runs bcrypt in a dedicated thread or process pool with admission control."""
+    def __init__(self, workers: int, max_queue: int, use_processes: bool = False):
+        self.workers = max(workers, 1)
+        self.max_queue = max(max_queue, 0)
+        self.use_processes = use_processes
+        self.rejected = 0
+        self._pending = 0  # Only touched from the event loop thread
+        self._executor: Optional[Executor] = None
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        # Created lazily so importing this module never forks worker processes.
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="g7-bcrypt")
+        return self._executor
+
+    async def _submit(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self._pending >= self.capacity:
+            self.rejected += 1
+            raise PasswordHasherBusyError("Password hashing pool is saturated")
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._pending -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verifies a password off the event loop."""
+        return await self._submit(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        """Hashes a password off the event loop."""
+        return await self._submit(get_password_hash, password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
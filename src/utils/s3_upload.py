@@ -0,0 +1,187 @@
+# src/utils/s3_upload.py
+"""
+Single-pass streaming upload to S3.
+Reads the source file exactly once, computing its MD5 hash, content ETag and size
+while the parts are sent to S3 concurrently. The caller decides afterwards whether to keep
+the object (`complete`) or throw it away (`discard`), e.g. on a duplicate hash.
+"""
+import hashlib
+import math
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Any, BinaryIO, Deque, Dict, List, Optional, Tuple
+
+from src.log import get_logger
+from src.profiling import span
+
+logger = get_logger(__name__)
+
+# S3 rejects multipart parts smaller than 5 MB (except the last one).
+MIN_PART_SIZE = 5 * 1024 * 1024
+# S3 allows at most 10,000 parts per multipart upload.
+MAX_PARTS = 10000
+
+def multipart_part_size(file_size: int, part_size: int) -> int:
+    """Part size for a file: `part_size`, grown if needed to respect S3's minimum and its 10,000 part limit."""
+    return max(part_size, MIN_PART_SIZE, math.ceil(file_size / MAX_PARTS))
+
+def multipart_etag(part_digests: List[bytes]) -> str:
+    """The ETag S3 gives a multipart object whose parts have these raw MD5 digests: '{hex}-{parts}'."""
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+class UploadTooLargeError(Exception):
+    """Raised when the streamed file exceeds the configured size limit."""
+    def __init__(self, size: int, max_size: int):
+        super().__init__(f"Upload exceeded {max_size} bytes (read {size} bytes so far)")
+        self.size = size
+        self.max_size = max_size
+
+class StreamedUpload:
+    """
+    Streams a file object to `bucket/key` in one pass.
+
+    Files that fit in a single part are buffered and sent with one `put_object`
+    on `complete()`; larger files use a multipart upload whose parts are sent on
+    `executor` with at most `concurrency` parts in flight. Either way `content_etag`
+    is the ETag a direct multipart upload of the same bytes would get, computed from
+    the parts read here rather than taken from S3.
+    """
+    def __init__(
+        self,
+        s3_client: Any,
+        bucket: str,
+        key: str,
+        executor: Executor,
+        part_size: int,
+        concurrency: int,
+        max_size: Optional[int] = None,
+        content_type: Optional[str] = None,
+        content_disposition: Optional[str] = None,
+    ):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.executor = executor
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.concurrency = max(concurrency, 1)
+        self.max_size = max_size
+        self.content_type = content_type
+        self.content_disposition = content_disposition
+
+        self.upload_id: Optional[str] = None
+        self.content_etag: Optional[str] = None
+        self.completed = False
+        self._single_body: Optional[bytes] = None
+        self._parts: List[Dict[str, Any]] = []
+
+    def stream(self, fileobj: BinaryIO) -> Tuple[str, int]:
+        """
+        Reads `fileobj` once, hashing it and sending its parts to S3.
+        Returns the MD5 hex digest and size. Raises UploadTooLargeError as soon as
+        the limit is crossed, after aborting any multipart upload already started.
+        """
+        md5 = hashlib.md5()
+        size = 0
+        fileobj.seek(0)
+
+        chunk = fileobj.read(self.part_size)
+        lookahead = fileobj.read(self.part_size) if chunk else b""
+        if not lookahead:
+            # Whole file fits in one part: no multipart round trips needed.
+            md5.update(chunk)
+            size = len(chunk)
+            self._check_size(size)
+            self._single_body = chunk
+            self.content_etag = multipart_etag([md5.digest()])
+            return md5.hexdigest(), size
+
+        with span("create_multipart_upload"):
+            self._start_multipart()
+        in_flight: Deque[Future] = deque()
+        part_digests: List[bytes] = []
+        part_number = 0
+        try:
+            while chunk:
+                md5.update(chunk)
+                part_digests.append(hashlib.md5(chunk).digest())
+                size += len(chunk)
+                self._check_size(size)
+
+                part_number += 1
+                in_flight.append(self.executor.submit(self._upload_part, part_number, chunk))
+                if len(in_flight) >= self.concurrency:
+                    self._parts.append(in_flight.popleft().result())
+
+                chunk, lookahead = lookahead, (fileobj.read(self.part_size) if lookahead else b"")
+
+            with span("wait_for_parts", parts=part_number):
+                while in_flight:
+                    self._parts.append(in_flight.popleft().result())
+        except BaseException:
+            for future in in_flight:
+                future.cancel()
+            for future in in_flight:
+                if not future.cancelled():
+                    future.exception()  # Wait for running parts before aborting
+            try:
+                self.discard()
+            except Exception as e:
+                logger.error("Failed to abort multipart upload '%s' for '%s': %s", self.upload_id, self.key, e)
+            raise
+
+        self.content_etag = multipart_etag(part_digests)
+        return md5.hexdigest(), size
+
+    def complete(self) -> None:
+        """Makes the streamed object visible in S3."""
+        if self.completed:
+            return
+        if self.upload_id is None:
+            self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=self._single_body or b"", **self._object_args())
+            self._single_body = None
+        else:
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={'Parts': sorted(self._parts, key=lambda part: part['PartNumber'])}
+            )
+            self.upload_id = None
+        self.completed = True
+
+    def discard(self) -> None:
+        """
+        Throws the upload away: aborts an unfinished multipart upload, or deletes
+        the object if `complete()` already ran. Safe to call more than once.
+        """
+        if self.completed:
+            self.s3_client.delete_object(Bucket=self.bucket, Key=self.key)
+            self.completed = False
+        elif self.upload_id is not None:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            self.upload_id = None
+        self._single_body = None
+
+    def _check_size(self, size: int) -> None:
+        if self.max_size is not None and size > self.max_size:
+            raise UploadTooLargeError(size, self.max_size)
+
+    def _object_args(self) -> Dict[str, str]:
+        extra = {'ContentType': self.content_type} if self.content_type else {}
+        if self.content_disposition:
+            extra['ContentDisposition'] = self.content_disposition
+        return extra
+
+    def _start_multipart(self) -> None:
+        response = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key, **self._object_args())
+        self.upload_id = response['UploadId']
+
+    def _upload_part(self, part_number: int, body: bytes) -> Dict[str, Any]:
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=body
+        )
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
@@ -2,31 +2,29 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional
-from sqlalchemy.orm import Session
 
 from src.config import Config
-from src.db.database import get_db
-from src.db.repositories import UserRepository
+from src.db.database import DbSession, get_db
+from src.db.async_repositories import user_repository
 from src.schemas import TokenData
+from src.log import bind_user
 from src.models.models import User
+from src.profiling import span
+from src.utils.password_hashing import PasswordHasher, PasswordHasherBusyError, get_password_hash, verify_password  # noqa: F401
+from src.utils.user_cache import user_cache
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Shared bcrypt pool used by the auth routes
+password_hasher = PasswordHasher(
+    workers=Config.PASSWORD_HASH_WORKERS,
+    max_queue=Config.PASSWORD_HASH_MAX_QUEUE,
+    use_processes=Config.PASSWORD_HASH_USE_PROCESSES
+)
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifies a plain password against a hashed one."""
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    """Hashes a password."""
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Creates a new JWT access token."""
     to_encode = data.copy()
@@ -39,10 +37,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, Config.JWT_SECRET_KEY, algorithm=Config.JWT_ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: DbSession = Depends(get_db)) -> User:
     """
     Dependency to get the current user from a JWT token.
-    Decodes the token, validates it, and fetches the user from the database.
+    Decodes the token, validates it, and fetches the user from the user cache,
+    falling back to the database on a miss.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -57,11 +56,19 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
+    bind_user(token_data.username)  # The signature checked out, so later log lines can name the user
     
-    user_repo = UserRepository(db)
-    user = user_repo.get_user_by_username(token_data.username)
+    with span("user_cache_lookup"):
+        cached_user = await user_cache.get(token_data.username)
+    if cached_user:
+        return cached_user
+
+    user_repo = user_repository(db)
+    with span("user_db_lookup"):
+        user = await user_repo.get_user_by_username(token_data.username)
     
     if user is None:
         raise credentials_exception
-        
+
+    await user_cache.set(user)
     return user
\ No newline at end of file
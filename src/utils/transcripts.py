@@ -0,0 +1,149 @@
+# src/utils/transcripts.py
+"""
+Transcript index maintenance for G7Static.
+Transcripts are written to S3 by the transcription Lambda under
+`{TRANSCRIPT_KEY}/{username}/{audio stem}.json`. Each one is recorded in the
+`transcripts` table, so listing them is an indexed query instead of an S3 LIST.
+
+`record_transcript` indexes a single object (called when the Lambda reports a finished
+job), and `sync_transcripts` rebuilds the index from a fully paginated S3 listing.
+
+Next to each JSON the Lambda writes compact derivatives (`{stem}.txt`, `.srt`, `.vtt`,
+gzip-encoded). They share the JSON's index row: `transcript_format_key` maps a
+transcript key to the object holding a given format.
+
+For full-text search, `index_transcript_text` stores the cues of the `.vtt` derivative
+as `transcript_segments` rows, replacing only that transcript's previous segments.
+"""
+import gzip
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from src.config import Config
+from src.db.async_repositories import user_repository, file_repository, transcript_repository, commit
+from src.db.repositories import Segment
+from src.log import get_logger
+from src.models.models import Transcript
+from src.utils.concurrency import AsyncProxy, run_io
+
+logger = get_logger(__name__)
+
+TRANSCRIPT_SUFFIX = ".json"
+DERIVATIVE_FORMATS = ("txt", "srt", "vtt")
+LIST_PAGE_SIZE = 1000  # S3 maximum per ListObjectsV2 call
+
+def parse_transcript_key(s3_key: str) -> Optional[Tuple[str, str]]:
+    """Splits `{TRANSCRIPT_KEY}/{username}/{stem}.json` into (username, stem), or None if it does not match."""
+    prefix = f"{Config.TRANSCRIPT_KEY}/"
+    if not s3_key.startswith(prefix) or not s3_key.endswith(TRANSCRIPT_SUFFIX):
+        return None
+    parts = s3_key[len(prefix):].split('/')
+    if len(parts) != 2 or not all(parts):
+        return None
+    username, filename = parts
+    return username, os.path.splitext(filename)[0]
+
+def transcript_format_key(s3_key: str, fmt: str) -> str:
+    """S3 key of the transcript in the given format ("json" is the Transcribe output itself)."""
+    if fmt == "json" or not s3_key.endswith(TRANSCRIPT_SUFFIX):
+        return s3_key
+    return f"{s3_key[:-len(TRANSCRIPT_SUFFIX)]}.{fmt}"
+
+def transcript_object_keys(s3_key: str) -> List[str]:
+    """Every S3 object belonging to a transcript: the JSON and its derivatives."""
+    return [s3_key] + [transcript_format_key(s3_key, fmt) for fmt in DERIVATIVE_FORMATS if s3_key.endswith(TRANSCRIPT_SUFFIX)]
+
+def _vtt_seconds(timestamp: str) -> float:
+    """'01:02:03.456' or '02:03.456' -> seconds."""
+    seconds = 0.0
+    for part in timestamp.strip().split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def parse_vtt(content: str) -> List[Segment]:
+    """Reads the (start, end, text) cues of a WebVTT document."""
+    segments = []
+    for block in content.replace('\r\n', '\n').split('\n\n'):
+        lines = [line for line in block.split('\n') if line.strip()]
+        timing = next((i for i, line in enumerate(lines) if '-->' in line), None)
+        if timing is None:
+            continue
+        start, end = lines[timing].split('-->')
+        text = ' '.join(lines[timing + 1:]).strip()
+        if text:
+            segments.append((_vtt_seconds(start), _vtt_seconds(end.split()[0]), text))
+    return segments
+
+def _read_segments(s3_client: Any, s3_key: str) -> List[Segment]:
+    response = s3_client.get_object(Bucket=Config.AWS_S3_BUCKET_NAME, Key=transcript_format_key(s3_key, "vtt"))
+    body = response['Body'].read()
+    if response.get('ContentEncoding') == 'gzip':
+        body = gzip.decompress(body)
+    return parse_vtt(body.decode('utf-8'))
+
+async def index_transcript_text(db: Any, s3_client: AsyncProxy, transcript: Transcript) -> Optional[int]:
+    """
+    Replaces the transcript's search segments with the cues of its `.vtt` derivative and
+    returns how many were stored. Returns None, leaving the index as it was, when the
+    derivative cannot be read. The caller commits.
+    """
+    try:
+        segments = await run_io(_read_segments, s3_client.target, transcript.s3_key)
+    except (BotoCoreError, ClientError, OSError, UnicodeDecodeError, ValueError) as e:
+        logger.warning("Could not index text of transcript '%s': %s", transcript.s3_key, e)
+        return None
+    return await transcript_repository(db).replace_segments(transcript, segments)
+
+async def record_transcript(db: Any, s3_key: str, size: int, completed_at: datetime, actor: str) -> Optional[Transcript]:
+    """
+    Upserts the index row for one transcript object and links it to its audio file.
+    Returns None for keys that are not transcripts of a known user. The caller commits.
+    """
+    parsed = parse_transcript_key(s3_key)
+    if parsed is None:
+        return None
+    username, stem = parsed
+    if username == Config.SHARED_CONTENT_OWNER:
+        return None  # Shared content; see src/utils/blobs.py
+    user = await user_repository(db).get_user_by_username(username)
+    if user is None:
+        logger.warning("Skipping transcript '%s': no active user '%s'.", s3_key, username)
+        return None
+    audio = await file_repository(db).get_file_by_stored_stem(user.id, stem)
+    transcript_data = {'s3_key': s3_key, 'file_size': size, 'completed_at': completed_at}
+    return await transcript_repository(db).upsert_transcript(user.id, audio.id if audio else None, transcript_data, actor)
+
+async def sync_transcripts(db: Any, s3_client: AsyncProxy, prune: bool = False, index_text: bool = False, actor: str = "transcript-sync") -> Dict[str, int]:
+    """
+    Walks every page of the transcript prefix in S3 (following ContinuationToken) and
+    upserts an index row per object, committing once per page. With `prune`, rows whose
+    object no longer exists in S3 are deleted afterwards. With `index_text`, transcripts
+    that are not yet searchable get their text indexed.
+    """
+    stats = {"listed": 0, "recorded": 0, "skipped": 0, "pruned": 0, "text_indexed": 0}
+    known_keys = await transcript_repository(db).get_all_keys() if prune else {}
+    searchable_ids = set(await transcript_repository(db).get_segmented_transcript_ids()) if index_text else set()
+    params = {'Bucket': Config.AWS_S3_BUCKET_NAME, 'Prefix': f"{Config.TRANSCRIPT_KEY}/", 'MaxKeys': LIST_PAGE_SIZE}
+    while True:
+        response = await s3_client.list_objects_v2(**params)
+        for content in response.get('Contents', []):
+            stats["listed"] += 1
+            known_keys.pop(content['Key'], None)
+            transcript = await record_transcript(db, content['Key'], content['Size'], content['LastModified'], actor)
+            stats["recorded" if transcript is not None else "skipped"] += 1
+            if index_text and transcript is not None and transcript.id not in searchable_ids:
+                if await index_transcript_text(db, s3_client, transcript) is not None:
+                    stats["text_indexed"] += 1
+        await commit(db)
+        if not response.get('IsTruncated'):
+            break
+        params['ContinuationToken'] = response['NextContinuationToken']
+
+    if prune and known_keys:
+        stats["pruned"] = await transcript_repository(db).delete_transcripts_by_ids(list(known_keys.values()))
+        await commit(db)
+    logger.info("Transcript index sync finished: %s", stats)
+    return stats
@@ -0,0 +1,116 @@
+# src/utils/url_cache.py
+"""
+Presigned download URL cache for G7Static.
+Signed URLs are reused per (user, S3 key) until they are within a refresh margin of
+expiry, so repeated clicks and list renders do not re-sign every time. Misses in a
+batch are signed together in a single hop to the I/O pool.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from src.config import Config
+from src.utils.concurrency import AsyncProxy, run_io
+
+CacheKey = Tuple[int, str]
+
+class PresignedUrlCache:
+    """Per-process LRU of signed GET URLs, each kept until `refresh_margin` before it expires."""
+    def __init__(self, expiry: int, refresh_margin: int, max_size: int, enabled: bool = True):
+        self.expiry = expiry
+        # Never hand out a URL with less than this much validity left.
+        self.refresh_margin = min(refresh_margin, expiry // 2)
+        self.max_size = max_size
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[CacheKey, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: CacheKey) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            reusable_until, url = entry
+            if reusable_until <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return url
+
+    def _set(self, key: CacheKey, url: str, signed_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (signed_at + self.expiry - self.refresh_margin, url)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _sign(self, s3_client: Any, s3_key: str) -> str:
+        return s3_client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': Config.AWS_S3_BUCKET_NAME, 'Key': s3_key},
+            ExpiresIn=self.expiry
+        )
+
+    def _sign_many(self, s3_client: Any, user_id: int, s3_keys: Iterable[str]) -> Dict[str, str]:
+        urls = {}
+        for s3_key in s3_keys:
+            signed_at = time.monotonic()
+            urls[s3_key] = self._sign(s3_client, s3_key)
+            if self.enabled:
+                self._set((user_id, s3_key), urls[s3_key], signed_at)
+        return urls
+
+    async def get_urls(self, s3_client: AsyncProxy, user_id: int, s3_keys: Iterable[str]) -> Dict[str, str]:
+        """
+        Returns a download URL for each key, reusing cached ones. Keys that need signing
+        are signed together in one I/O pool call. Raises ClientError like boto3 would.
+        """
+        urls: Dict[str, str] = {}
+        missing = []
+        for s3_key in dict.fromkeys(s3_keys):
+            url = self._get((user_id, s3_key)) if self.enabled else None
+            if url is None:
+                missing.append(s3_key)
+            else:
+                urls[s3_key] = url
+        self.hits += len(urls)
+        self.misses += len(missing)
+        if missing:
+            urls.update(await run_io(self._sign_many, s3_client.target, user_id, missing))
+        return urls
+
+    async def get_url(self, s3_client: AsyncProxy, user_id: int, s3_key: str) -> str:
+        """Returns a download URL for one key, reusing a cached one when it is still fresh."""
+        return (await self.get_urls(s3_client, user_id, [s3_key]))[s3_key]
+
+    def invalidate(self, user_id: int, s3_key: str) -> None:
+        """Forgets a key's URL, e.g. after the object is deleted."""
+        with self._lock:
+            self._entries.pop((user_id, s3_key), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
+
+presigned_url_cache = PresignedUrlCache(
+    expiry=Config.PRESIGNED_URL_EXPIRY_SECONDS,
+    refresh_margin=Config.PRESIGNED_URL_REFRESH_MARGIN_SECONDS,
+    max_size=Config.PRESIGNED_URL_CACHE_MAX_SIZE,
+    enabled=Config.PRESIGNED_URL_CACHE_ENABLED
+)
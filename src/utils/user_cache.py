@@ -0,0 +1,212 @@
+# src/utils/user_cache.py
+"""
+Authenticated-user cache for G7Static.
+Keeps a short-lived snapshot of active users keyed by JWT `sub` (the username), so
+`get_current_user` can skip the users query on most requests.
+
+Entries expire after a TTL and are invalidated as soon as a transaction that changes
+or deletes a user commits. An optional Redis backend shares entries across workers.
+
+The commit hooks only see changes made through SQLAlchemy sessions in this process. Code
+that changes a user's status any other way (raw SQL, a separate admin tool, another
+service) must call `user_cache.invalidate(username)` afterwards, or the old status keeps
+being served for up to USER_CACHE_TTL_SECONDS.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple, TypeVar
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from src.config import Config
+from src.log import get_logger
+from src.models.models import User
+from src.utils.concurrency import run_io
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Columns kept in the cache. The password hash is deliberately never cached.
+SNAPSHOT_FIELDS = ('id', 'username', 'status')
+
+def user_snapshot(user: User) -> Dict[str, Any]:
+    """Returns the cacheable columns of a user as a plain dict."""
+    return {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+
+def user_from_snapshot(snapshot: Dict[str, Any]) -> User:
+    """Builds a transient (session-less) User from a cached snapshot."""
+    return User(**snapshot)
+
+class InMemoryUserCacheBackend:
+    """Per-process LRU cache with a TTL on every entry."""
+    blocking = False  # Pure in-memory: safe to call directly from the event loop
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, snapshot = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return snapshot
+
+    def set(self, key: str, snapshot: Dict[str, Any], ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+class RedisUserCacheBackend:
+    """Shared cache in Redis so every worker sees the same entries and invalidations."""
+    blocking = True  # Network round trips: run in the I/O pool from async code
+    key_prefix = "g7static:user:"
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("USER_CACHE_BACKEND=redis requires the 'redis' package (pip install redis).") from e
+        self.evictions = 0  # Eviction is handled by Redis itself
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self._client.get(self.key_prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, snapshot: Dict[str, Any], ttl: int) -> None:
+        self._client.set(self.key_prefix + key, json.dumps(snapshot), ex=ttl)
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self.key_prefix + key)
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(match=self.key_prefix + "*"):
+            self._client.delete(key)
+
+    def size(self) -> Optional[int]:
+        return None  # Unknown: entries are shared with other workers and expire inside Redis
+
+class UserCache:
+    """Front end over a cache backend that tracks hit/miss counters."""
+    def __init__(self, backend: Any, ttl: int, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    async def _call(self, method: Callable[..., T], *args: Any) -> T:
+        if self.backend.blocking:
+            return await run_io(method, *args)
+        return method(*args)
+
+    async def get(self, username: str) -> Optional[User]:
+        """Returns a transient User for a cached username, or None on a miss."""
+        if not self.enabled:
+            return None
+        try:
+            snapshot = await self._call(self.backend.get, username)
+        except Exception as e:
+            logger.error("User cache lookup failed, falling back to the database: %s", e)
+            snapshot = None
+        if snapshot is None or snapshot.get('status') != 'active':
+            self.misses += 1
+            return None
+        self.hits += 1
+        return user_from_snapshot(snapshot)
+
+    async def set(self, user: User) -> None:
+        """Caches an active user loaded from the database."""
+        if not self.enabled:
+            return
+        try:
+            await self._call(self.backend.set, user.username, user_snapshot(user), self.ttl)
+        except Exception as e:
+            logger.error("User cache store failed for '%s': %s", user.username, e)
+
+    def invalidate(self, username: str) -> None:
+        """
+        Drops a user's cached entry after a status change. ORM commits call it through
+        the hooks below; changes made outside a Session must call it themselves.
+        Synchronous so it can run from SQLAlchemy commit hooks in worker threads.
+        """
+        try:
+            self.backend.delete(username)
+        except Exception as e:
+            logger.error("User cache invalidation failed for '%s': %s", username, e)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.backend.evictions,
+            "size": self.backend.size(),  # None when the backend cannot tell
+        }
+
+def _build_backend() -> Any:
+    if Config.USER_CACHE_BACKEND == "redis":
+        return RedisUserCacheBackend(Config.USER_CACHE_REDIS_URL)
+    return InMemoryUserCacheBackend(Config.USER_CACHE_MAX_SIZE)
+
+user_cache = UserCache(
+    backend=_build_backend(),
+    ttl=Config.USER_CACHE_TTL_SECONDS,
+    enabled=Config.USER_CACHE_ENABLED
+)
+
+# --- Invalidation hooks ---
+# Usernames of users updated or deleted in a session are collected at flush time and
+# invalidated once the transaction commits, so a concurrent request cannot re-cache
+# the old row between the flush and the commit.
+_PENDING_KEY = "g7_user_cache_invalidations"
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session: Session, flush_context: Any) -> None:
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            changed: Set[str] = session.info.setdefault(_PENDING_KEY, set())
+            changed.add(obj.username)
+            # A renamed user must also drop the entry under the old name.
+            changed.update(name for name in inspect(obj).attrs.username.history.deleted or () if name)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session) -> None:
+    for username in session.info.pop(_PENDING_KEY, ()):
+        user_cache.invalidate(username)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_invalidations(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
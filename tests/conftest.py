@@ -0,0 +1,24 @@
+# tests/conftest.py
+"""
+Test settings. src.config reads the environment at import time, so placeholders for the
+required variables are set before any test imports src; real values from the shell win.
+The Lambda's modules are imported the way Lambda loads them, from the lambda/ directory.
+"""
+import os
+import sys
+import tempfile
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambda")
+sys.path.insert(0, LAMBDA_DIR)
+
+for name, value in {
+    "AWS_REGION": "us-east-1", "AWS_S3_BUCKET_NAME": "test-bucket",
+    "AUDIO_KEY": "StaticAudio", "TRANSCRIPT_KEY": "StaticTranscription",
+    "MYSQL_HOST": "localhost", "MYSQL_PORT": "3306", "MYSQL_USER": "test", "MYSQL_PASSWORD": "test",
+    "MYSQL_DATABASE": "test", "MYSQL_POOL_SIZE": "5", "MYSQL_POOL_RECYCLE": "3600",
+    "APP_NAME": "G7Static tests", "APP_VERSION": "test", "APP_PORT": "8000", "APP_HOST": "127.0.0.1",
+    "FRONTEND_ORIGINS": "http://localhost", "MAX_UPLOAD_FILE_SIZE_MB": "100",
+    "JWT_SECRET_KEY": "test-secret", "JWT_ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "LOG_FILE": os.path.join(tempfile.gettempdir(), "g7static-tests.log"),
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,186 @@
+# tests/test_async_repositories.py
+"""
+The repositories behind user_repository, file_repository and blob_repository, on a SQLite
+file: the sync ones through AsyncProxy, as the default database mode runs them, and the
+AsyncSession-backed ones through aiosqlite, the driver DB_ASYNC_MODE uses for local runs
+(pip install -e ".[async]"). Both must return the same results for the same queries.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.db.async_repositories import (
+    AsyncBlobRepository, AsyncFileRepository, AsyncUserRepository, blob_repository, commit, file_repository, user_repository
+)
+from src.db.database import Base
+from src.utils.concurrency import AsyncProxy, run_io
+
+@pytest.fixture(params=["sync", "async"])
+def db_mode(request: Any) -> str:
+    if request.param == "async":
+        pytest.importorskip("aiosqlite")
+        pytest.importorskip("sqlalchemy.ext.asyncio")
+    return request.param
+
+def run(db_mode: str, tmp_path: Any, scenario: Callable[[Any], Awaitable[None]]) -> None:
+    """Runs `scenario(session)` against a fresh database file in the given mode."""
+    url = f"sqlite:///{tmp_path / 'repositories.db'}"
+
+    async def main() -> None:
+        if db_mode == "sync":
+            # The session is used from I/O pool threads, as under get_db.
+            engine = create_engine(url, connect_args={"check_same_thread": False})
+            Base.metadata.create_all(engine)
+            session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)()
+            try:
+                await scenario(session)
+            finally:
+                await run_io(session.close)
+                engine.dispose()
+            return
+
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://", 1))
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        # Same session settings as database.py's AsyncSessionLocal
+        session_factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        try:
+            async with session_factory() as session:
+                await scenario(session)
+        finally:
+            await engine.dispose()
+    asyncio.run(main())
+
+def file_data(name: str, md5_hash: Optional[str], **extra: Any) -> Dict[str, Any]:
+    return {
+        'original_filename': name, 'stored_filename': name, 'md5_hash': md5_hash,
+        's3_key': f"StaticAudio/alice/{name}", 'file_size': 1024, 'mime_type': 'audio/mpeg', **extra
+    }
+
+def test_create_and_get_user(db_mode, tmp_path):
+    async def scenario(session):
+        users = user_repository(session)
+        created = await users.create_user("alice", "hashed-password")
+        await commit(session)
+        assert created.id is not None
+
+        found = await users.get_user_by_username("alice")
+        assert found.id == created.id
+        assert found.hashed_password == "hashed-password"
+        assert await users.get_user_by_username("bob") is None
+    run(db_mode, tmp_path, scenario)
+
+def test_inactive_users_are_not_found(db_mode, tmp_path):
+    async def scenario(session):
+        users = user_repository(session)
+        user = await users.create_user("alice", "hashed-password")
+        await users.update_status(user, "inactive", updated_by="admin")
+        await commit(session)
+        assert await users.get_user_by_username("alice") is None
+    run(db_mode, tmp_path, scenario)
+
+def test_file_lookups_are_scoped_to_the_user(db_mode, tmp_path):
+    async def scenario(session):
+        users = user_repository(session)
+        files = file_repository(session)
+        alice = await users.create_user("alice", "x")
+        bob = await users.create_user("bob", "x")
+        created = await files.create_file(alice.id, file_data("a.mp3", "a" * 32, file_id="file-a", duration_seconds=12.5), created_by="alice")
+        await files.create_file(alice.id, file_data("b.mp3", "b" * 32), created_by="alice")
+        await commit(session)
+
+        assert created.file_id == "file-a"
+        assert (await files.get_file_by_hash(alice.id, "a" * 32)).id == created.id
+        assert await files.get_file_by_hash(bob.id, "a" * 32) is None
+        assert (await files.get_file_by_file_id(alice.id, "file-a")).duration_seconds == 12.5
+        assert {f.md5_hash for f in await files.get_files_by_hashes(alice.id, ["a" * 32, "b" * 32, "c" * 32])} == {"a" * 32, "b" * 32}
+        assert await files.get_files_by_hashes(alice.id, []) == []
+        assert await files.get_file_keys_by_file_ids(alice.id, ["file-a", "missing"]) == {"file-a": "StaticAudio/alice/a.mp3"}
+    run(db_mode, tmp_path, scenario)
+
+def test_files_match_by_md5_or_content_etag(db_mode, tmp_path):
+    async def scenario(session):
+        alice = await user_repository(session).create_user("alice", "x")
+        files = file_repository(session)
+        api_upload = await files.create_file(alice.id, file_data("a.mp3", "a" * 32, content_etag=f"{'b' * 32}-1"), created_by="alice")
+        direct_upload = await files.create_file(alice.id, file_data("c.mp3", None, content_etag=f"{'c' * 32}-2"), created_by="alice")
+        await commit(session)
+
+        assert direct_upload.md5_hash is None
+        assert [f.id for f in await files.get_files_by_content(alice.id, ["a" * 32], [])] == [api_upload.id]
+        assert [f.id for f in await files.get_files_by_content(alice.id, [], [f"{'b' * 32}-1"])] == [api_upload.id]
+        assert {f.id for f in await files.get_files_by_content(alice.id, ["f" * 32], [f"{'b' * 32}-1", f"{'c' * 32}-2"])} == {api_upload.id, direct_upload.id}
+        assert await files.get_files_by_content(alice.id, [], []) == []
+    run(db_mode, tmp_path, scenario)
+
+def test_files_page_walks_newest_first_with_a_cursor(db_mode, tmp_path):
+    async def scenario(session):
+        user = await user_repository(session).create_user("alice", "x")
+        files = file_repository(session)
+        for i in range(5):
+            await files.create_file(user.id, file_data(f"{i}.mp3", f"{i:032x}"), created_by="alice")
+        await commit(session)
+
+        seen = []
+        cursor = None
+        while True:
+            page = await files.get_files_page(user.id, limit=2, cursor=cursor)
+            seen.extend(row.original_filename for row in page)
+            if len(page) < 2:
+                break
+            cursor = (page[-1].created_at, page[-1].id)
+        assert sorted(seen) == [f"{i}.mp3" for i in range(5)]
+        assert len(seen) == len(set(seen))
+    run(db_mode, tmp_path, scenario)
+
+def test_delete_files(db_mode, tmp_path):
+    async def scenario(session):
+        user = await user_repository(session).create_user("alice", "x")
+        files = file_repository(session)
+        first = await files.create_file(user.id, file_data("a.mp3", "a" * 32, file_id="file-a"), created_by="alice")
+        await files.create_file(user.id, file_data("b.mp3", "b" * 32, file_id="file-b"), created_by="alice")
+        await files.create_file(user.id, file_data("c.mp3", "c" * 32, file_id="file-c"), created_by="alice")
+        await commit(session)
+
+        await files.delete_file(first)
+        rows = await files.get_files_for_delete(user.id, ["file-b", "file-c", "missing"])
+        assert {row.file_id for row in rows} == {"file-b", "file-c"}
+        assert await files.delete_files_by_ids([row.id for row in rows]) == 2
+        await commit(session)
+        assert await files.get_files_by_user_id(user.id) == []
+    run(db_mode, tmp_path, scenario)
+
+def test_released_blobs_take_no_new_references(db_mode, tmp_path):
+    async def scenario(session):
+        blobs = blob_repository(session)
+        blob = await blobs.create_blob({'md5_hash': "a" * 32, 'file_size': 1024, 's3_key': "StaticAudio/shared-content/a.mp3", 'mime_type': 'audio/mpeg'})
+        await commit(session)
+        blob_id = blob.id
+
+        assert await blobs.add_reference(blob_id)
+        assert [b.id for b in await blobs.release([blob_id, blob_id])] == [blob_id]
+        await commit(session)
+        assert not await blobs.add_reference(blob_id)
+        assert await blobs.get_blob_by_content("a" * 32, 1024) is None
+    run(db_mode, tmp_path, scenario)
+
+def test_async_sessions_get_native_repositories(tmp_path):
+    pytest.importorskip("aiosqlite")
+    pytest.importorskip("sqlalchemy.ext.asyncio")
+
+    async def scenario(session):
+        assert isinstance(user_repository(session), AsyncUserRepository)
+        assert isinstance(file_repository(session), AsyncFileRepository)
+        assert isinstance(blob_repository(session), AsyncBlobRepository)
+    run("async", tmp_path, scenario)
+
+def test_sync_sessions_get_proxied_repositories(tmp_path):
+    async def scenario(session):
+        assert isinstance(user_repository(session), AsyncProxy)
+        assert isinstance(file_repository(session), AsyncProxy)
+        assert isinstance(blob_repository(session), AsyncProxy)
+    run("sync", tmp_path, scenario)
@@ -0,0 +1,160 @@
+# tests/test_audio_probe.py
+"""
+The audio header probe (src/utils/audio_probe.py) against small synthetic files: one
+table of well-formed headers per container, and one of content it must reject.
+"""
+import io
+import struct
+import wave
+from typing import List, Tuple
+
+import pytest
+
+from src.utils.audio_probe import AudioInfo, AudioProbeError, BlockReader, check_audio, probe_file
+
+# --- Synthetic files: just enough header for the probe, silence or filler after it ---
+
+def wav(seconds: float = 2.0, rate: int = 16000, channels: int = 1) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(b'\x00\x00' * int(rate * seconds) * channels)
+    return buffer.getvalue()
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, stereo: 417-byte frames of 1152 samples.
+MP3_HEADER = struct.pack('>I', (0x7FF << 21) | (3 << 19) | (1 << 17) | (1 << 16) | (9 << 12))
+MP3_FRAME = MP3_HEADER + b'\x00' * 413
+
+def id3_tag(size: int) -> bytes:
+    return b'ID3\x04\x00\x00' + bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F]) + b'\x00' * size
+
+def mp3(frames: int = 400, xing: bool = False) -> bytes:
+    first = MP3_FRAME
+    if xing:  # Xing header after the 32 bytes of stereo side info, flagged with a frame count
+        first = MP3_HEADER + b'\x00' * 32 + b'Xing' + struct.pack('>II', 1, frames) + b'\x00' * (413 - 44)
+    return first + MP3_FRAME * (frames - 1)
+
+def adts(frames: int = 300, length: int = 200) -> bytes:
+    # AAC LC, 44.1 kHz (index 4), 2 channels
+    header = bytes([0xFF, 0xF1, (1 << 6) | (4 << 2), (2 << 6) | ((length >> 11) & 3), (length >> 3) & 0xFF, ((length & 7) << 5) | 0x1F, 0xFC])
+    return (header + b'\x00' * (length - 7)) * frames
+
+def flac(rate: int = 44100, channels: int = 2, total_samples: int = 441000) -> bytes:
+    packed = (rate << 44) | ((channels - 1) << 41) | (15 << 36) | total_samples
+    streaminfo = struct.pack('>HH', 4096, 4096) + b'\x00' * 6 + packed.to_bytes(8, 'big') + b'\x00' * 16
+    return b'fLaC' + bytes([0x80]) + (34).to_bytes(3, 'big') + streaminfo + b'\x00' * 4096
+
+def ogg_page(granule: int, payload: bytes, header_type: int = 0, serial: int = 7) -> bytes:
+    segments = [255] * (len(payload) // 255) + [len(payload) % 255]
+    return b'OggS' + bytes([0, header_type]) + struct.pack('<qIII', granule, serial, 0, 0) + bytes([len(segments)]) + bytes(segments) + payload
+
+def ogg(identification: bytes, last_granule: int) -> bytes:
+    # Filler pages push the last page past the first probe block.
+    return ogg_page(0, identification, 2) + ogg_page(-1, b'x' * 60000) + ogg_page(-1, b'x' * 60000) + ogg_page(last_granule, b'y' * 500, 4)
+
+VORBIS_HEADER = b'\x01vorbis' + struct.pack('<IBI', 0, 1, 22050) + b'\x00' * 13
+OPUS_HEADER = b'OpusHead' + bytes([1, 2]) + struct.pack('<HI', 312, 44100) + b'\x00\x00\x00'
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I', 8 + len(payload)) + box_type + payload
+
+def mp4(handlers: Tuple[bytes, ...] = (b'soun',), moov_last: bool = False, rate: int = 44100, channels: int = 2, seconds: float = 5.0) -> bytes:
+    ftyp = box(b'ftyp', b'M4A \x00\x00\x00\x00M4A isom')
+    mvhd = box(b'mvhd', b'\x00' * 12 + struct.pack('>II', 1000, int(seconds * 1000)) + b'\x00' * 80)
+
+    def trak(handler: bytes) -> bytes:
+        mdhd = box(b'mdhd', b'\x00' * 12 + struct.pack('>II', rate, int(seconds * rate)) + b'\x00' * 4)
+        hdlr = box(b'hdlr', b'\x00' * 8 + handler + b'\x00' * 13)
+        entry = struct.pack('>I', 36) + b'mp4a' + b'\x00' * 6 + b'\x00\x01' + b'\x00' * 8 + struct.pack('>HHHHI', channels, 16, 0, 0, rate << 16)
+        stsd = box(b'stsd', b'\x00' * 4 + struct.pack('>I', 1) + entry)
+        return box(b'trak', box(b'mdia', mdhd + hdlr + box(b'minf', box(b'stbl', stsd))))
+
+    moov = box(b'moov', mvhd + b''.join(trak(handler) for handler in handlers))
+    mdat = box(b'mdat', b'\x00' * 100000)
+    return ftyp + (mdat + moov if moov_last else moov + mdat)
+
+def probe(data: bytes, filename: str) -> AudioInfo:
+    return check_audio(BlockReader(lambda offset, length: data[offset:offset + length], len(data)), filename)
+
+# --- Well-formed files ---
+
+SUPPORTED = [
+    ("speech.wav", wav(2.0, 16000, 1), AudioInfo('wav', 2.0, 16000, 1)),
+    ("stereo.wav", wav(0.5, 48000, 2), AudioInfo('wav', 0.5, 48000, 2)),
+    ("cbr.mp3", mp3(400), AudioInfo('mp3', 400 * 417 * 8 / 128000, 44100, 2)),
+    ("vbr.mp3", mp3(400, xing=True), AudioInfo('mp3', 400 * 1152 / 44100, 44100, 2)),
+    ("tagged.mp3", id3_tag(100000) + mp3(400, xing=True), AudioInfo('mp3', 400 * 1152 / 44100, 44100, 2)),
+    ("tagged.flac", id3_tag(2000) + flac(), AudioInfo('flac', 10.0, 44100, 2)),
+    ("raw.aac", adts(300), AudioInfo('aac', 300 * 1024 / 44100, 44100, 2)),
+    ("lossless.flac", flac(), AudioInfo('flac', 10.0, 44100, 2)),
+    ("vorbis.ogg", ogg(VORBIS_HEADER, 22050 * 3), AudioInfo('ogg', 3.0, 22050, 1)),
+    ("opus.ogg", ogg(OPUS_HEADER, 48000 * 3 + 312), AudioInfo('ogg', 3.0, 44100, 2)),
+    ("voice.m4a", mp4(), AudioInfo('mp4', 5.0, 44100, 2)),
+    ("moov-last.m4a", mp4(moov_last=True), AudioInfo('mp4', 5.0, 44100, 2)),
+    ("in-mp4.aac", mp4(rate=22050, channels=1, seconds=2.0), AudioInfo('mp4', 2.0, 22050, 1)),
+]
+
+@pytest.mark.parametrize("filename, data, expected", SUPPORTED, ids=[row[0] for row in SUPPORTED])
+def test_supported_formats(filename, data, expected):
+    info = probe(data, filename)
+    assert info.format == expected.format
+    assert info.duration_seconds == pytest.approx(expected.duration_seconds)
+    assert (info.sample_rate, info.channels) == (expected.sample_rate, expected.channels)
+
+def test_flac_without_a_sample_count_has_no_duration():
+    assert probe(flac(total_samples=0), "stream.flac").duration_seconds is None
+
+# --- Content that must be rejected ---
+
+def truncated_wav() -> bytes:
+    data = wav(2.0)
+    return data[:len(data) // 2]  # The data chunk still declares the full length
+
+def wav_data_before_fmt() -> bytes:
+    return b'RIFF' + struct.pack('<I', 20) + b'WAVE' + b'data' + struct.pack('<I', 4) + b'\x00' * 4
+
+REJECTED = [
+    ("empty.mp3", b"", "empty"),
+    ("speech.mp3", wav(), "content is wav, not .mp3"),
+    ("music.wav", mp3(), "content is mp3, not .wav"),
+    ("voice.ogg", mp4(), "content is mp4, not .ogg"),
+    ("song.m4a", flac(), "content is flac, not .m4a"),
+    ("speech.txt", wav(), "content is wav, not .txt"),
+    ("speech", wav(), "not a supported type"),
+    ("short.wav", truncated_wav(), "shorter than its header declares"),
+    ("order.wav", wav_data_before_fmt(), "before its fmt chunk"),
+    ("nodata.wav", wav()[:36], "no audio data chunk"),
+    ("clip.m4a", mp4(handlers=(b'soun', b'vide')), "contains video"),
+    ("silent.m4a", mp4(handlers=()), "no audio track"),
+    ("cut.m4a", mp4()[:-5000], "truncated inside the MP4 'mdat' box"),
+    ("notes.mp3", b"These are not the bytes you are looking for.\n" * 200, "not a supported audio format"),
+    ("stray-sync.mp3", b"\x00" * 100 + MP3_FRAME + b"\x00" * 5000, "not a supported audio format"),
+    ("cut.flac", flac()[:20], "truncated inside the FLAC STREAMINFO block"),
+    ("theora.ogg", ogg(b'\x80theora' + b'\x00' * 40, 100), "not Vorbis or Opus"),
+]
+
+@pytest.mark.parametrize("filename, data, message", REJECTED, ids=[row[0] for row in REJECTED])
+def test_rejected_content(filename, data, message):
+    with pytest.raises(AudioProbeError, match=message):
+        probe(data, filename)
+
+# --- Reading ---
+
+def test_a_probe_usually_reads_one_block():
+    data = mp3(2000)
+    reads: List[Tuple[int, int]] = []
+
+    def fetch(offset: int, length: int) -> bytes:
+        reads.append((offset, length))
+        return data[offset:offset + length]
+
+    check_audio(BlockReader(fetch, len(data)), "long.mp3")
+    assert reads == [(0, 64 * 1024)]
+
+def test_probe_file_rewinds_for_the_upload():
+    fp = io.BytesIO(wav())
+    fp.seek(123)
+    assert probe_file(fp, "speech.wav").format == 'wav'
+    assert fp.tell() == 0
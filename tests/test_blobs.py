@@ -0,0 +1,208 @@
+# tests/test_blobs.py
+"""
+Reference counting of shared content (CONTENT_ADDRESSED_STORAGE): claim_blob and
+release_blobs on a SQLite file, through the sync repositories the default database mode
+uses and, when the async extra is installed, through aiosqlite. Races are staged with two
+sessions, the second one committing between the first one's blob lookup and its claim.
+"""
+import asyncio
+import contextlib
+from typing import Any, AsyncIterator, Awaitable, Callable, List
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.db.async_repositories import AsyncBlobRepository, commit
+from src.db.database import Base
+from src.db.repositories import BlobRepository
+from src.models.models import ContentBlob, PendingDeletion
+from src.utils.blobs import blob_storage_key, blob_transcript_key, claim_blob, release_blobs
+from src.utils.concurrency import run_io
+from src.utils.deletion import enqueue_deletions
+from src.utils.transcripts import transcript_object_keys
+
+MD5 = "a" * 32
+SIZE = 1024
+
+@pytest.fixture(params=["sync", "async"])
+def db_mode(request: Any) -> str:
+    if request.param == "async":
+        pytest.importorskip("aiosqlite")
+        pytest.importorskip("sqlalchemy.ext.asyncio")
+    return request.param
+
+def run(db_mode: str, tmp_path: Any, scenario: Callable[[Callable[[], Any]], Awaitable[None]]) -> None:
+    """Runs `scenario(new_session)` against a fresh database file, so sessions can interleave."""
+    url = f"sqlite:///{tmp_path / 'blobs.db'}"
+
+    async def main() -> None:
+        if db_mode == "sync":
+            engine = create_engine(url, connect_args={"check_same_thread": False})
+            Base.metadata.create_all(engine)
+            factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+            @contextlib.asynccontextmanager
+            async def new_session() -> AsyncIterator[Session]:
+                db = factory()
+                try:
+                    yield db
+                finally:
+                    await run_io(db.close)
+            try:
+                await scenario(new_session)
+            finally:
+                engine.dispose()
+            return
+
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://", 1))
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        try:
+            await scenario(async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False))
+        finally:
+            await engine.dispose()
+    asyncio.run(main())
+
+async def execute(db: Any, statement: Any) -> Any:
+    if isinstance(db, Session):
+        return await run_io(db.execute, statement)
+    return await db.execute(statement)
+
+def claim(db: Any, name: str, stored: List[str]) -> Awaitable[ContentBlob]:
+    """claim_blob for upload `name`, recording which uploads had to store their object."""
+    async def store() -> None:
+        stored.append(name)
+    return claim_blob(db, blob_storage_key(f"{name}.mp3"), MD5, SIZE, "audio/mpeg", store)
+
+async def blob_rows(new_session: Callable[[], Any]) -> List[Any]:
+    async with new_session() as db:
+        return (await execute(db, select(ContentBlob.s3_key, ContentBlob.ref_count))).all()
+
+def stage_before_lookup_returns(monkeypatch: Any, interleaved: Callable[[], Awaitable[None]]) -> None:
+    """Runs `interleaved` (another session's work) right after the next blob lookup, before its result is used."""
+    pending = [interleaved]
+    async_lookup = AsyncBlobRepository.get_blob_by_content
+    sync_lookup = BlobRepository.get_blob_by_content
+    loop = asyncio.get_running_loop()
+
+    async def staged_async_lookup(self: AsyncBlobRepository, md5_hash: str, file_size: int) -> Any:
+        blob = await async_lookup(self, md5_hash, file_size)
+        if pending:
+            await pending.pop()()
+        return blob
+
+    def staged_sync_lookup(self: BlobRepository, md5_hash: str, file_size: int) -> Any:
+        # Runs in an I/O pool thread while the event loop waits on it, free to run the other session.
+        blob = sync_lookup(self, md5_hash, file_size)
+        if pending:
+            asyncio.run_coroutine_threadsafe(pending.pop()(), loop).result()
+        return blob
+    monkeypatch.setattr(AsyncBlobRepository, "get_blob_by_content", staged_async_lookup)
+    monkeypatch.setattr(BlobRepository, "get_blob_by_content", staged_sync_lookup)
+
+def test_same_content_is_stored_once(db_mode, tmp_path):
+    async def scenario(new_session):
+        stored: List[str] = []
+        async with new_session() as db:
+            first = await claim(db, "first", stored)
+            await commit(db)
+        async with new_session() as db:
+            second = await claim(db, "second", stored)
+            await commit(db)
+
+        assert stored == ["first"]
+        assert first.id == second.id
+        assert second.s3_key == blob_storage_key("first.mp3")
+        assert await blob_rows(new_session) == [(blob_storage_key("first.mp3"), 2)]
+    run(db_mode, tmp_path, scenario)
+
+def test_releasing_the_last_reference_deletes_the_blob_and_queues_its_objects(db_mode, tmp_path):
+    async def scenario(new_session):
+        async with new_session() as db:
+            blob = await claim(db, "first", [])
+            await claim(db, "second", [])
+            await commit(db)
+
+        async with new_session() as db:
+            assert await release_blobs(db, [blob.id]) == []
+            await commit(db)
+        assert await blob_rows(new_session) == [(blob.s3_key, 1)]
+
+        async with new_session() as db:
+            s3_keys = await release_blobs(db, [blob.id])
+            await enqueue_deletions(db, s3_keys, "alice")
+            await commit(db)
+        assert s3_keys == [blob.s3_key] + transcript_object_keys(blob_transcript_key(blob))
+        assert await blob_rows(new_session) == []
+        async with new_session() as db:
+            queued = (await execute(db, select(PendingDeletion.s3_key))).scalars().all()
+        assert sorted(queued) == sorted(s3_keys)
+    run(db_mode, tmp_path, scenario)
+
+@pytest.mark.filterwarnings("error")
+def test_content_released_in_a_session_can_be_claimed_again_in_it(db_mode, tmp_path):
+    async def scenario(new_session):
+        stored: List[str] = []
+        async with new_session() as db:
+            released = await claim(db, "first", stored)
+            await commit(db)
+            await enqueue_deletions(db, await release_blobs(db, [released.id]), "alice")
+            await commit(db)
+
+            blob = await claim(db, "second", stored)
+            await commit(db)
+
+        assert stored == ["first", "second"]
+        assert blob.s3_key == blob_storage_key("second.mp3")
+        assert await blob_rows(new_session) == [(blob_storage_key("second.mp3"), 1)]
+    run(db_mode, tmp_path, scenario)
+
+def test_concurrent_first_uploads_share_one_blob(db_mode, tmp_path, monkeypatch):
+    async def scenario(new_session):
+        stored: List[str] = []
+
+        async def other_upload() -> None:
+            async with new_session() as other:
+                await claim(other, "other", stored)
+                await commit(other)
+        stage_before_lookup_returns(monkeypatch, other_upload)
+
+        async with new_session() as db:
+            blob = await claim(db, "mine", stored)
+            await commit(db)
+
+        # Both found nothing and stored their object; the loser's create failed and it
+        # referenced the winner's blob instead, so its own object is redundant.
+        assert stored == ["other", "mine"]
+        assert blob.s3_key == blob_storage_key("other.mp3")
+        assert await blob_rows(new_session) == [(blob_storage_key("other.mp3"), 2)]
+    run(db_mode, tmp_path, scenario)
+
+@pytest.mark.filterwarnings("error")  # The released blob must not linger in the session's identity map
+def test_claim_racing_the_last_release_stores_the_content_again(db_mode, tmp_path, monkeypatch):
+    async def scenario(new_session):
+        async with new_session() as db:
+            released = await claim(db, "first", [])
+            await commit(db)
+
+        async def last_delete() -> None:
+            async with new_session() as other:
+                await enqueue_deletions(other, await release_blobs(other, [released.id]), "alice")
+                await commit(other)
+        stage_before_lookup_returns(monkeypatch, last_delete)
+
+        stored: List[str] = []
+        async with new_session() as db:
+            blob = await claim(db, "second", stored)
+            await commit(db)
+
+        # The lookup saw the old blob, but the delete won: no reference was added to a
+        # blob whose object is queued for deletion.
+        assert stored == ["second"]
+        assert blob.s3_key != released.s3_key
+        assert await blob_rows(new_session) == [(blob_storage_key("second.mp3"), 1)]
+        async with new_session() as db:
+            assert (await execute(db, select(func.count()).select_from(PendingDeletion).where(PendingDeletion.s3_key == released.s3_key))).scalar() == 1
+    run(db_mode, tmp_path, scenario)
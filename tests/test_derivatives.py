@@ -0,0 +1,121 @@
+# tests/test_derivatives.py
+"""
+Transcript derivatives (lambda/derivatives.py): the streamed parse of the Transcribe JSON
+must give what parsing it whole would, whatever the chunk boundaries and key order.
+"""
+import gzip
+import io
+import json
+from typing import Any, Dict, List
+
+import boto3
+import pytest
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+
+import derivatives
+from derivatives import JsonStream, build_cues, render_derivatives, to_srt, to_vtt, write_derivatives
+
+BUCKET = "g7-bucket"
+TRANSCRIPT_KEY = "StaticTranscription/alice/3f2a.json"
+
+def word(content: str, start: float, end: float) -> Dict[str, Any]:
+    return {'start_time': f"{start:.3f}", 'end_time': f"{end:.3f}", 'alternatives': [{'confidence': '0.99', 'content': content}], 'type': 'pronunciation'}
+
+def punctuation(content: str) -> Dict[str, Any]:
+    return {'alternatives': [{'confidence': '0.0', 'content': content}], 'type': 'punctuation'}
+
+def items(sentences: int) -> List[Dict[str, Any]]:
+    result, clock = [], 0.0
+    for sentence in range(sentences):
+        for content in ("Grüße", "from", "sentence", str(sentence), "naïve", "café", "🎙"):
+            result.append(word(content, clock, clock + 0.4))
+            clock += 0.5
+        result.append(punctuation('.' if sentence % 3 else ','))
+    return result
+
+def transcribe_json(item_list: List[Dict[str, Any]], results_order=('transcripts', 'items'), **extra_results: Any) -> Dict[str, Any]:
+    text = ' '.join(item['alternatives'][0]['content'] for item in item_list)
+    members = {'transcripts': [{'transcript': text}], 'items': item_list}
+    results = {key: members[key] for key in results_order}
+    results.update(extra_results)
+    return {'jobName': 'transcription-job-0123', 'accountId': '123456789012', 'results': results, 'status': 'COMPLETED'}
+
+def expected(document: Dict[str, Any]) -> Dict[str, str]:
+    """The derivatives from the document parsed whole."""
+    results = document['results']
+    cues = build_cues(results['items'])
+    text = ' '.join(part['transcript'] for part in results['transcripts'])
+    return {'txt': text + '\n', 'srt': to_srt(cues), 'vtt': to_vtt(cues)}
+
+@pytest.mark.parametrize("chunk_bytes", [1, 7, 4096])
+@pytest.mark.parametrize("results_order", [('transcripts', 'items'), ('items', 'transcripts')])
+def test_streamed_parse_matches_parsing_whole(monkeypatch, chunk_bytes, results_order):
+    # Small chunks split multi-byte characters, numbers and strings across reads.
+    monkeypatch.setattr(derivatives, "READ_CHUNK_BYTES", chunk_bytes)
+    document = transcribe_json(items(12), results_order, audio_segments=[{'id': 0, 'items': [0, 1], 'transcript': 'x'}])
+    data = json.dumps(document, indent=2, ensure_ascii=False).encode('utf-8')
+    assert render_derivatives(io.BytesIO(data)) == expected(document)
+
+def test_long_transcripts_are_read_in_chunks():
+    document = transcribe_json(items(20000))
+    data = json.dumps(document).encode('utf-8')
+    reads: List[int] = []
+
+    class Body(io.BytesIO):
+        def read(self, size: int = -1) -> bytes:
+            reads.append(size)
+            return super().read(size)
+
+    assert render_derivatives(Body(data)) == expected(document)
+    assert len(data) > 4 * derivatives.READ_CHUNK_BYTES
+    assert all(0 < size < len(data) for size in reads)
+
+def test_missing_results_are_rejected():
+    with pytest.raises(ValueError, match="no results"):
+        render_derivatives(io.BytesIO(b'{"jobName": "j", "status": "FAILED"}'))
+
+@pytest.mark.parametrize("data", [b'', b'{"results": {"items": [{"type": "pronunciation"', b'{"results": [1, 2]}', b'{"results" {}}'])
+def test_malformed_json_is_rejected(data):
+    with pytest.raises(ValueError):
+        render_derivatives(io.BytesIO(data))
+
+def test_json_stream_walks_nested_values():
+    stream = JsonStream(io.BytesIO(b' {"a": [1, 2.5e3, true, null, "s"], "b": {}, "c": [], "d": {"e": [[]]}} '))
+    seen = {}
+    for key in stream.object_keys():
+        if key == 'a':
+            seen[key] = list(stream.array_values())
+        else:
+            stream.skip()
+            seen[key] = None
+    assert seen == {'a': [1, 2500.0, True, None, "s"], 'b': None, 'c': None, 'd': None}
+
+def test_write_derivatives_stores_gzip_next_to_the_transcript():
+    document = transcribe_json(items(3))
+    data = json.dumps(document).encode('utf-8')
+    client = boto3.client("s3", region_name="us-east-1", aws_access_key_id="test", aws_secret_access_key="test")
+    bodies: Dict[str, bytes] = {}
+
+    class Body:
+        """Matches any body, keeping it for `fmt`."""
+        def __init__(self, fmt: str):
+            self.fmt = fmt
+
+        def __eq__(self, other: Any) -> bool:
+            bodies[self.fmt] = other
+            return True
+
+    with Stubber(client) as stubber:
+        stubber.add_response(
+            'get_object', {'Body': StreamingBody(io.BytesIO(data), len(data)), 'ContentLength': len(data)},
+            {'Bucket': BUCKET, 'Key': TRANSCRIPT_KEY}
+        )
+        for fmt in ('txt', 'srt', 'vtt'):
+            stubber.add_response('put_object', {}, {
+                'Bucket': BUCKET, 'Key': f"StaticTranscription/alice/3f2a.{fmt}", 'Body': Body(fmt),
+                'ContentType': derivatives.CONTENT_TYPES[fmt], 'ContentEncoding': 'gzip',
+            })
+        write_derivatives(client, BUCKET, TRANSCRIPT_KEY)
+        stubber.assert_no_pending_responses()
+    assert {fmt: gzip.decompress(body).decode('utf-8') for fmt, body in bodies.items()} == expected(document)
@@ -0,0 +1,171 @@
+# tests/test_dispatcher.py
+"""
+The Lambda's throttled dispatcher (lambda/dispatcher.py), driven with MemoryQueue and a
+stand-in Transcribe client that reports a chosen number of running jobs.
+"""
+import threading
+from typing import Any, Dict, List
+
+import pytest
+from botocore.exceptions import ClientError
+
+import dispatcher as dispatch_module
+import function
+from dispatcher import Dispatcher, MemoryQueue, SQLiteQueue
+
+PREFIX = "transcription-job-"
+
+class FakeTranscribe:
+    """Answers list_transcription_jobs with `running` jobs, split over pages of `page_size`."""
+    def __init__(self, running: int = 0, page_size: int = 100, error: Exception = None):
+        self.running = running
+        self.page_size = page_size
+        self.error = error
+
+    def list_transcription_jobs(self, Status: str, JobNameContains: str, MaxResults: int, NextToken: str = None) -> Dict[str, Any]:
+        if self.error is not None:
+            raise self.error
+        jobs = self.running if Status == "IN_PROGRESS" else 0
+        start = int(NextToken or 0)
+        page = {'TranscriptionJobSummaries': [{'TranscriptionJobName': f"{JobNameContains}{i}"} for i in range(start, min(jobs, start + self.page_size))]}
+        if start + self.page_size < jobs:
+            page['NextToken'] = str(start + self.page_size)
+        return page
+
+def throttling_error() -> ClientError:
+    return ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, 'StartTranscriptionJob')
+
+def queued(count: int) -> MemoryQueue:
+    queue = MemoryQueue()
+    queue.enqueue([{'bucket': 'bucket', 'key': f"StaticAudio/alice/{i}.mp3"} for i in range(count)])
+    return queue
+
+def test_admits_only_up_to_the_concurrency_limit():
+    queue = queued(10)
+    started: List[Dict[str, Any]] = []
+
+    def start(payload: Dict[str, Any]) -> Dict[str, Any]:
+        started.append(payload)
+        return function.response(202, 'started')
+
+    stats = Dispatcher(queue, FakeTranscribe(running=3, page_size=2), start, 5, PREFIX).dispatch()
+
+    # Three jobs are running (counted across pages), so two of the five slots are free.
+    assert stats['in_flight'] == 3
+    assert stats['admitted'] == stats['dispatched'] == 2
+    assert [payload['key'] for payload in started] == ["StaticAudio/alice/0.mp3", "StaticAudio/alice/1.mp3"]
+    assert stats['depth'] == queue.depth() == 8
+
+def test_nothing_is_admitted_at_the_limit():
+    queue = queued(3)
+    stats = Dispatcher(queue, FakeTranscribe(running=5), lambda payload: pytest.fail("started a job"), 5, PREFIX).dispatch()
+    assert stats['admitted'] == 0
+    assert queue.depth() == 3
+
+def test_throttled_listing_admits_nothing():
+    queue = queued(3)
+    transcribe = FakeTranscribe(error=ClientError({'Error': {'Code': 'ThrottlingException'}}, 'ListTranscriptionJobs'))
+    stats = Dispatcher(queue, transcribe, lambda payload: pytest.fail("started a job"), 5, PREFIX).dispatch()
+    assert stats['admitted'] == 0
+    assert queue.depth() == 3
+
+@pytest.mark.parametrize("outcome, counted_as", [
+    (throttling_error(), 'throttled'),
+    (function.response(429, 'throttled'), 'throttled'),
+    (function.response(500, 'failed'), 'failed'),
+])
+def test_throttled_and_failed_starts_are_retried_with_backoff(monkeypatch, outcome, counted_as):
+    delays = []
+
+    def backoff(attempts: int, base_delay: float, max_delay: float) -> float:
+        delays.append((attempts, base_delay, max_delay))
+        return 0.0 if len(delays) == 1 else 3600.0
+    monkeypatch.setattr(dispatch_module, "backoff_delay", backoff)
+
+    def start(payload: Dict[str, Any]) -> Dict[str, Any]:
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    queue = queued(1)
+    dispatcher = Dispatcher(queue, FakeTranscribe(), start, 5, PREFIX, base_delay=2.0, max_delay=300.0, parallelism=1)
+    first = dispatcher.dispatch()
+    second = dispatcher.dispatch()
+
+    assert first[counted_as] == second[counted_as] == 1
+    # The item stays queued, one attempt older each time, and is hidden for the backoff delay.
+    assert delays == [(0, 2.0, 300.0), (1, 2.0, 300.0)]
+    assert queue.depth() == 1
+    assert dispatcher.dispatch()['admitted'] == 0
+
+def test_backoff_delay_is_full_jitter_under_the_cap():
+    for attempts in range(12):
+        delays = [dispatch_module.backoff_delay(attempts, 2.0, 300.0) for _ in range(50)]
+        assert all(0 <= delay <= min(300.0, 2.0 * 2 ** attempts) for delay in delays)
+    assert dispatch_module.backoff_delay(1000, 2.0, 300.0) <= 300.0
+
+def test_lambda_handler_only_queues_uploads():
+    queue = MemoryQueue()
+    event = {'Records': [
+        {'messageId': 'm1', 'body': '{"Records": [{"s3": {"bucket": {"name": "bucket"}, "object": {"key": "StaticAudio/alice/a.mp3", "eTag": "e1"}}}]}'},
+        {'messageId': 'm2', 'body': '{"Records": [{"s3": {"bucket": {"name": "bucket"}, "object": {"key": "StaticAudio/alice/b.mp3", "eTag": "e2"}}}]}'},
+    ]}
+
+    # Dispatch passes only run from dispatch_handler, so Transcribe is never asked here.
+    result = function.lambda_handler(event, None, s3_client=object(), transcribe_client=FakeTranscribe(error=RuntimeError("not called")), queue=queue)
+
+    assert result['statusCode'] == 202
+    assert result['batchItemFailures'] == []
+    assert 'dispatch' not in result
+    assert queue.depth() == 2
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_overlapping_passes_stay_under_the_cap(tmp_path, backend):
+    if backend == "memory":
+        first_queue = second_queue = MemoryQueue()
+    else:
+        # Two connections to one file, like two processes sharing the local queue.
+        first_queue, second_queue = SQLiteQueue(str(tmp_path / "queue.db")), SQLiteQueue(str(tmp_path / "queue.db"))
+    first_queue.enqueue([{'bucket': 'bucket', 'key': f"StaticAudio/alice/{i}.mp3"} for i in range(20)])
+
+    started: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+    first_pass_starting = threading.Event()
+    second_pass_done = threading.Event()
+
+    class Transcribe(FakeTranscribe):
+        """Lists only the jobs whose start has returned, like a listing that lags behind."""
+        def __init__(self):
+            self.page_size = 100
+            self.error = None
+
+        @property
+        def running(self) -> int:
+            with lock:
+                return len(started)
+
+    def start(payload: Dict[str, Any]) -> Dict[str, Any]:
+        first_pass_starting.set()
+        second_pass_done.wait(5)
+        with lock:
+            started.append(payload)
+        return function.response(202, 'started')
+
+    first = Dispatcher(first_queue, Transcribe(), start, 5, PREFIX)
+    second = Dispatcher(second_queue, Transcribe(), start, 5, PREFIX)
+    first_stats: List[Dict[str, Any]] = []
+    thread = threading.Thread(target=lambda: first_stats.append(first.dispatch()))
+    thread.start()
+    assert first_pass_starting.wait(5)
+    try:
+        # The first pass has claimed its items but none of its jobs is listed yet.
+        second_stats = second.dispatch()
+    finally:
+        second_pass_done.set()
+        thread.join()
+
+    assert second_stats['admitted'] == 0 and second_stats['lease_held']
+    assert first_stats[0]['admitted'] == 5
+    assert len(started) == 5
+    # Once the first pass is done, the lease is free again.
+    assert second.dispatch()['in_flight'] == 5
@@ -0,0 +1,206 @@
+# tests/test_lambda_handlers.py
+"""
+The transcription Lambda's handlers (lambda/function.py) run locally, with their boto3
+clients wrapped in botocore.stub.Stubber: every AWS call must be the expected one.
+"""
+import importlib
+import json
+import urllib.parse
+from typing import Any, Dict, List, Tuple
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+import function
+
+BUCKET = "g7-bucket"
+AUDIO_KEY = "StaticAudio/alice/3f2a.mp3"
+TRANSCRIPT_KEY = "StaticTranscription/alice/3f2a.json"
+ETAG = '"0123456789abcdef0123456789abcdef"'
+JOB_NAME = "transcription-job-0123456789abcdef0123456789abcdef"
+
+@pytest.fixture
+def s3():
+    client = boto3.client("s3", region_name="us-east-1", aws_access_key_id="test", aws_secret_access_key="test")
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+@pytest.fixture
+def transcribe():
+    client = boto3.client("transcribe", region_name="us-east-1", aws_access_key_id="test", aws_secret_access_key="test")
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+@pytest.fixture
+def derivatives(monkeypatch):
+    """Transcript keys whose derivatives would be written (derivatives.py has its own S3 calls)."""
+    written: List[str] = []
+    monkeypatch.setattr(function, "generate_derivatives", lambda s3_client, bucket_name, key: written.append(key))
+    return written
+
+def job(status: str, media_key: str = AUDIO_KEY, transcript_key: str = TRANSCRIPT_KEY) -> Dict[str, Any]:
+    description = {
+        'TranscriptionJobName': JOB_NAME,
+        'TranscriptionJobStatus': status,
+        'Media': {'MediaFileUri': f"s3://{BUCKET}/{media_key}"},
+    }
+    if status == 'COMPLETED':
+        description['Transcript'] = {'TranscriptFileUri': f"https://s3.us-east-1.amazonaws.com/{BUCKET}/{transcript_key}"}
+    return {'TranscriptionJob': description}
+
+def expect_no_transcript(s3_stubber: Stubber, key: str = TRANSCRIPT_KEY) -> None:
+    s3_stubber.add_client_error('head_object', service_error_code='404', http_status_code=404, expected_params={'Bucket': BUCKET, 'Key': key})
+
+def expect_no_job(transcribe_stubber: Stubber) -> None:
+    transcribe_stubber.add_client_error(
+        'get_transcription_job', service_error_code='BadRequestException',
+        service_message="The requested job couldn't be found.", expected_params={'TranscriptionJobName': JOB_NAME}
+    )
+
+def start_params() -> Dict[str, Any]:
+    return {
+        'TranscriptionJobName': JOB_NAME, 'LanguageCode': 'en-US', 'MediaFormat': 'mp3',
+        'Media': {'MediaFileUri': f"s3://{BUCKET}/{AUDIO_KEY}"}, 'OutputBucketName': BUCKET, 'OutputKey': TRANSCRIPT_KEY,
+    }
+
+def expect_start(transcribe_stubber: Stubber) -> None:
+    transcribe_stubber.add_response('start_transcription_job', {'TranscriptionJob': {'TranscriptionJobName': JOB_NAME}}, start_params())
+
+def test_job_is_named_after_the_event_etag(s3, transcribe):
+    (s3_client, s3_stubber), (transcribe_client, transcribe_stubber) = s3, transcribe
+    expect_no_transcript(s3_stubber)
+    expect_no_job(transcribe_stubber)
+    expect_start(transcribe_stubber)
+
+    result = function.start_transcription(BUCKET, AUDIO_KEY, ETAG, s3_client, transcribe_client)
+    assert result['statusCode'] == 202
+    assert JOB_NAME in json.loads(result['body'])
+
+def test_job_name_falls_back_to_the_object_etag(s3, transcribe):
+    (s3_client, s3_stubber), (transcribe_client, transcribe_stubber) = s3, transcribe
+    expect_no_transcript(s3_stubber)
+    s3_stubber.add_response('head_object', {'ETag': ETAG, 'ContentLength': 1024}, {'Bucket': BUCKET, 'Key': AUDIO_KEY})
+    expect_no_job(transcribe_stubber)
+    expect_start(transcribe_stubber)
+
+    assert function.start_transcription(BUCKET, AUDIO_KEY, None, s3_client, transcribe_client)['statusCode'] == 202
+
+def test_same_content_reuses_a_completed_job(s3, transcribe, derivatives):
+    # Another user's upload of the same bytes: same ETag, so the same job.
+    (s3_client, s3_stubber), (transcribe_client, transcribe_stubber) = s3, transcribe
+    other_key = "StaticTranscription/bob/77aa.json"
+    expect_no_transcript(s3_stubber, other_key)
+    transcribe_stubber.add_response('get_transcription_job', job('COMPLETED'), {'TranscriptionJobName': JOB_NAME})
+    s3_stubber.add_response('head_object', {'ContentLength': 2}, {'Bucket': BUCKET, 'Key': TRANSCRIPT_KEY})
+    s3_stubber.add_response('copy_object', {}, {'Bucket': BUCKET, 'Key': other_key, 'CopySource': {'Bucket': BUCKET, 'Key': TRANSCRIPT_KEY}})
+
+    result = function.start_transcription(BUCKET, "StaticAudio/bob/77aa.mp3", ETAG, s3_client, transcribe_client)
+    assert result['statusCode'] == 200
+    assert derivatives == [other_key]
+
+def test_conflicting_start_waits_on_the_running_job(s3, transcribe):
+    (s3_client, s3_stubber), (transcribe_client, transcribe_stubber) = s3, transcribe
+    expect_no_transcript(s3_stubber)
+    expect_no_job(transcribe_stubber)
+    transcribe_stubber.add_client_error('start_transcription_job', service_error_code='ConflictException', expected_params=start_params())
+    # Another invocation started the job for the same content, from another user's upload.
+    running = job('IN_PROGRESS', media_key="StaticAudio/bob/77aa.mp3")
+    transcribe_stubber.add_response('get_transcription_job', running, {'TranscriptionJobName': JOB_NAME})
+    waiter = f"{function.WAITER_PREFIX}{JOB_NAME}/{urllib.parse.quote(TRANSCRIPT_KEY, safe='')}"
+    s3_stubber.add_response('put_object', {}, {'Bucket': BUCKET, 'Key': waiter, 'Body': b''})
+    transcribe_stubber.add_response('get_transcription_job', running, {'TranscriptionJobName': JOB_NAME})
+
+    result = function.start_transcription(BUCKET, AUDIO_KEY, ETAG, s3_client, transcribe_client)
+    assert result['statusCode'] == 202
+    assert "Waiting" in json.loads(result['body'])
+
+def test_throttled_start_is_reported_as_429(s3, transcribe):
+    (s3_client, s3_stubber), (transcribe_client, transcribe_stubber) = s3, transcribe
+    expect_no_transcript(s3_stubber)
+    expect_no_job(transcribe_stubber)
+    transcribe_stubber.add_client_error('start_transcription_job', service_error_code='ThrottlingException', expected_params=start_params())
+
+    assert function.start_transcription(BUCKET, AUDIO_KEY, ETAG, s3_client, transcribe_client)['statusCode'] == 429
+
+def test_completion_delivers_the_transcript_to_waiting_uploads(s3, transcribe, derivatives):
+    (s3_client, s3_stubber), (transcribe_client, transcribe_stubber) = s3, transcribe
+    waiting_keys = ["StaticTranscription/bob/77aa.json", "StaticTranscription/carol/91cc.json"]
+    waiters = [f"{function.WAITER_PREFIX}{JOB_NAME}/{urllib.parse.quote(key, safe='')}" for key in waiting_keys]
+    transcribe_stubber.add_response('get_transcription_job', job('COMPLETED'), {'TranscriptionJobName': JOB_NAME})
+    s3_stubber.add_response(
+        'list_objects_v2', {'Contents': [{'Key': key} for key in waiters], 'IsTruncated': False},
+        {'Bucket': BUCKET, 'Prefix': f"{function.WAITER_PREFIX}{JOB_NAME}/"}
+    )
+    for waiter, key in zip(waiters, waiting_keys):
+        s3_stubber.add_response('copy_object', {}, {'Bucket': BUCKET, 'Key': key, 'CopySource': {'Bucket': BUCKET, 'Key': TRANSCRIPT_KEY}})
+        s3_stubber.add_response('delete_object', {}, {'Bucket': BUCKET, 'Key': waiter})
+
+    event = {'detail': {'TranscriptionJobName': JOB_NAME, 'TranscriptionJobStatus': 'COMPLETED'}}
+    result = function.completion_handler(event, None, s3_client=s3_client, transcribe_client=transcribe_client)
+    assert result['statusCode'] == 200
+    assert derivatives == [TRANSCRIPT_KEY] + waiting_keys
+
+def test_completion_ignores_jobs_from_other_pipelines(s3, transcribe):
+    (s3_client, _), (transcribe_client, _) = s3, transcribe
+    event = {'detail': {'TranscriptionJobName': "someone-elses-job", 'TranscriptionJobStatus': 'COMPLETED'}}
+    assert function.completion_handler(event, None, s3_client=s3_client, transcribe_client=transcribe_client)['statusCode'] == 200
+
+def sqs_record(message_id: str, key: str) -> Dict[str, Any]:
+    body = {'Records': [{'s3': {'bucket': {'name': BUCKET}, 'object': {'key': key, 'eTag': ETAG}}}]}
+    return {'messageId': message_id, 'eventSource': 'aws:sqs', 'body': json.dumps(body)}
+
+def test_only_failed_records_are_reported_for_retry(monkeypatch):
+    outcomes = {"StaticAudio/alice/ok.mp3": 202, "StaticAudio/alice/throttled.mp3": 429, "StaticAudio/alice/broken.mp3": 500, "StaticAudio/alice/bad.txt": 400}
+    calls: List[Tuple[str, str]] = []
+
+    def start(bucket_name: str, object_key: str, etag: str, s3_client: Any, transcribe_client: Any) -> Dict[str, Any]:
+        calls.append((bucket_name, object_key))
+        return function.response(outcomes[object_key], 'outcome')
+    monkeypatch.setattr(function, "start_transcription", start)
+
+    event = {'Records': [sqs_record(f"m-{i}", key) for i, key in enumerate(outcomes)] + [{'messageId': 'm-malformed', 'eventSource': 'aws:sqs', 'body': 'not json'}]}
+    result = function.lambda_handler(event, None, s3_client=object(), transcribe_client=object(), queue=None)
+
+    # Throttled and failed starts are retried; unsupported files and malformed records never succeed, so they are not.
+    assert result['statusCode'] == 500
+    assert sorted(result['batchItemFailures'], key=lambda failure: failure['itemIdentifier']) == [{'itemIdentifier': 'm-1'}, {'itemIdentifier': 'm-2'}]
+    assert sorted(calls) == sorted((BUCKET, key) for key in outcomes)
+
+def direct_record(key: str) -> Dict[str, Any]:
+    return {'eventSource': 'aws:s3', 's3': {'bucket': {'name': BUCKET}, 'object': {'key': urllib.parse.quote_plus(key), 'eTag': ETAG}}}
+
+def test_failed_direct_s3_records_fail_the_invocation(monkeypatch):
+    # Async S3 invokes are only retried when the handler raises; batchItemFailures would be ignored.
+    monkeypatch.setattr(function, "start_transcription", lambda *args: function.response(500, 'failed'))
+
+    with pytest.raises(RuntimeError, match=urllib.parse.quote_plus(AUDIO_KEY)):
+        function.lambda_handler({'Records': [direct_record(AUDIO_KEY)]}, None, s3_client=object(), transcribe_client=object(), queue=None)
+
+def test_successful_direct_s3_records_return_normally(monkeypatch):
+    monkeypatch.setattr(function, "start_transcription", lambda *args: function.response(202, 'started'))
+
+    result = function.lambda_handler({'Records': [direct_record(AUDIO_KEY)]}, None, s3_client=object(), transcribe_client=object(), queue=None)
+    assert result['statusCode'] == 202 and result['batchItemFailures'] == []
+
+@pytest.fixture
+def reload_function(monkeypatch):
+    """Re-imports function.py under patched environment variables, and restores it afterwards."""
+    yield lambda: importlib.reload(function)
+    monkeypatch.undo()
+    importlib.reload(function)
+
+@pytest.mark.parametrize("setting", ["0", "-3"])
+def test_start_concurrency_below_one_still_starts_records(monkeypatch, reload_function, setting):
+    monkeypatch.setenv("TRANSCRIBE_START_CONCURRENCY", setting)
+    reload_function()
+    monkeypatch.setattr(function, "start_transcription", lambda *args: function.response(202, 'started'))
+
+    assert function.START_CONCURRENCY == 1
+    result = function.lambda_handler({'Records': [direct_record(AUDIO_KEY)]}, None, s3_client=object(), transcribe_client=object(), queue=None)
+    assert result['statusCode'] == 202
+
+def test_event_without_records_is_rejected():
+    assert function.lambda_handler({}, None, s3_client=object(), transcribe_client=object(), queue=None)['statusCode'] == 400
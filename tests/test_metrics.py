@@ -0,0 +1,129 @@
+# tests/test_metrics.py
+"""
+The in-process metrics (src/metrics.py) and their scrape endpoint. Exposition is checked on a
+fresh MetricsRegistry; the middleware and /metrics run in a small FastAPI app, so no
+collector, database or S3 is involved.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.config import Config
+from src.metrics import HTTP_REQUEST_DURATION, MetricsMiddleware, MetricsRegistry, registry
+from src.routes.metrics import metrics_router
+
+def test_registry_renders_the_prometheus_text_format():
+    metrics = MetricsRegistry()
+    requests = metrics.counter('requests_total', 'Requests served.', ('path',))
+    in_flight = metrics.gauge('in_flight', 'Requests in flight.')
+    latency = metrics.histogram('latency_seconds', 'Request latency.', ('op',), buckets=(0.1, 1.0))
+
+    requests.inc('/a"b\\c\nd', amount=2)
+    in_flight.set(1.5)
+    latency.observe(0.05, 'get')
+    latency.observe(0.5, 'get')
+    latency.observe(3, 'get')
+
+    assert metrics.render().splitlines() == [
+        '# HELP requests_total Requests served.',
+        '# TYPE requests_total counter',
+        'requests_total{path="/a\\"b\\\\c\\nd"} 2',
+        '# HELP in_flight Requests in flight.',
+        '# TYPE in_flight gauge',
+        'in_flight 1.5',
+        '# HELP latency_seconds Request latency.',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{op="get",le="0.1"} 1',
+        'latency_seconds_bucket{op="get",le="1"} 2',
+        'latency_seconds_bucket{op="get",le="+Inf"} 3',
+        'latency_seconds_sum{op="get"} 3.55',
+        'latency_seconds_count{op="get"} 3',
+    ]
+    assert metrics.render().endswith('\n')
+    assert metrics.sample('latency_seconds_bucket', {'op': 'get', 'le': '+Inf'}) == 3
+    assert metrics.sample('latency_seconds_count', {'op': 'put'}) is None
+
+def test_registry_rejects_duplicate_names_and_wrong_labels():
+    metrics = MetricsRegistry()
+    requests = metrics.counter('requests_total', 'Requests served.', ('path',))
+
+    with pytest.raises(ValueError):
+        metrics.gauge('requests_total', 'Same name, different kind.')
+    with pytest.raises(ValueError):
+        requests.inc()
+
+def test_failing_or_unknown_gauge_callbacks_drop_only_their_sample():
+    metrics = MetricsRegistry()
+    metrics.gauge('broken', 'Raises at scrape time.').set_function(lambda: 1 / 0)
+    metrics.gauge('unknown', 'Cannot tell, like the Redis user cache size.').set_function(lambda: None)
+    metrics.gauge('working', 'Reads fine.').set_function(lambda: 7)
+
+    assert metrics.render().splitlines() == [
+        '# HELP broken Raises at scrape time.',
+        '# TYPE broken gauge',
+        '# HELP unknown Cannot tell, like the Redis user cache size.',
+        '# TYPE unknown gauge',
+        '# HELP working Reads fine.',
+        '# TYPE working gauge',
+        'working 7',
+    ]
+
+def requests_seen(method: str, route: str, status: str) -> int:
+    return int(registry.sample('http_request_duration_seconds_count', {'method': method, 'route': route, 'status': status}) or 0)
+
+def test_middleware_labels_requests_with_the_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/files/audio/{file_id}")
+    def get_audio(file_id: str):
+        return {"id": file_id}
+
+    seen = requests_seen('GET', '/files/audio/{file_id}', '200')
+    unmatched = requests_seen('GET', 'unmatched', '404')
+
+    with TestClient(app) as client:
+        assert client.get("/files/audio/3f2a").status_code == 200
+        assert client.get("/files/audio/9c1e").status_code == 200
+        assert client.get("/no/such/route").status_code == 404
+
+    assert requests_seen('GET', '/files/audio/{file_id}', '200') == seen + 2
+    assert requests_seen('GET', 'unmatched', '404') == unmatched + 1
+    assert registry.sample('http_request_duration_seconds_count', {'method': 'GET', 'route': '/files/audio/3f2a', 'status': '200'}) is None
+    assert HTTP_REQUEST_DURATION.labelnames == ('method', 'route', 'status')
+
+@pytest.fixture
+def scrape(monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_ENABLED", True)
+    app = FastAPI()
+    app.include_router(metrics_router)
+    with TestClient(app) as client:
+        yield client
+
+def test_metrics_is_hidden_without_a_token(scrape, monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_TOKEN", None)
+
+    assert scrape.get("/metrics").status_code == 404
+    assert scrape.get("/metrics", headers={"Authorization": "Bearer anything"}).status_code == 404
+
+def test_metrics_is_hidden_when_disabled(scrape, monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_TOKEN", "scrape-secret")
+    monkeypatch.setattr(Config, "METRICS_ENABLED", False)
+
+    assert scrape.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 404
+
+def test_metrics_rejects_a_wrong_bearer_token(scrape, monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_TOKEN", "scrape-secret")
+
+    assert scrape.get("/metrics").status_code == 401
+    assert scrape.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert scrape.get("/metrics", headers={"Authorization": "scrape-secret"}).status_code == 401
+
+def test_metrics_serves_the_registry_to_the_right_token(scrape, monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_TOKEN", "scrape-secret")
+
+    response = scrape.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
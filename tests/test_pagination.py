@@ -0,0 +1,225 @@
+# tests/test_pagination.py
+"""
+Keyset pagination of the file and transcript listings: file_page_query and
+transcript_page_query through the repositories, and the /files routes that hand the
+position to clients as an opaque X-Next-Cursor. Many rows share a timestamp (created_at is
+stored to the second on SQLite), so the id tie-break decides their order; walking every
+page must return each row exactly once, in both database modes.
+"""
+import asyncio
+import base64
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.db.async_repositories import commit, file_repository, transcript_repository, user_repository
+from src.db.database import Base, get_db
+from src.models.models import File, User
+from src.routes.files import NEXT_CURSOR_HEADER, encode_cursor, files_router
+from src.utils.aws import get_async_s3_client
+from src.utils.concurrency import run_io
+from src.utils.security import get_current_user
+
+# Two distinct seconds; most rows share the later one.
+EARLIER = datetime(2026, 3, 1, 9, 30, 0)
+LATER = EARLIER + timedelta(seconds=1)
+# A walk that needs more pages than this is stuck on a cursor that never advances.
+MAX_PAGES = 20
+
+@pytest.fixture(params=["sync", "async"])
+def db_mode(request: Any) -> str:
+    if request.param == "async":
+        pytest.importorskip("aiosqlite")
+        pytest.importorskip("sqlalchemy.ext.asyncio")
+    return request.param
+
+def run(db_mode: str, tmp_path: Any, scenario: Callable[[Any], Awaitable[None]]) -> None:
+    """Runs `scenario(session)` against a fresh database file in the given mode."""
+    url = f"sqlite:///{tmp_path / 'pagination.db'}"
+
+    async def main() -> None:
+        if db_mode == "sync":
+            engine = create_engine(url, connect_args={"check_same_thread": False})
+            Base.metadata.create_all(engine)
+            session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)()
+            try:
+                await scenario(session)
+            finally:
+                await run_io(session.close)
+                engine.dispose()
+            return
+
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://", 1))
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        try:
+            async with async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)() as session:
+                await scenario(session)
+        finally:
+            await engine.dispose()
+    asyncio.run(main())
+
+async def execute(db: Any, statement: Any) -> Any:
+    if isinstance(db, Session):
+        return await run_io(db.execute, statement)
+    return await db.execute(statement)
+
+async def seed_files(db: Any, user: User, count: int) -> List[Tuple[datetime, int, str]]:
+    """`count` files, the first two at EARLIER and the rest at LATER; returns (created_at, id, file_id) newest first."""
+    files = file_repository(db)
+    rows = []
+    for i in range(count):
+        created = await files.create_file(user.id, {
+            'file_id': f"file-{i}", 'original_filename': f"{i}.mp3", 'stored_filename': f"{i}.mp3",
+            'md5_hash': f"{i:032x}", 's3_key': f"StaticAudio/alice/{i}.mp3", 'file_size': 1024, 'mime_type': 'audio/mpeg',
+        }, created_by="alice")
+        created_at = EARLIER if i < 2 else LATER
+        await execute(db, update(File).where(File.id == created.id).values(created_at=created_at))
+        rows.append((created_at, created.id, created.file_id))
+    await commit(db)
+    return sorted(rows, reverse=True)
+
+async def seed_files_for_other_user(db: Any, user: User) -> None:
+    await file_repository(db).create_file(user.id, {
+        'original_filename': "bob.mp3", 'stored_filename': "bob.mp3", 'md5_hash': "b" * 32,
+        's3_key': "StaticAudio/bob/bob.mp3", 'file_size': 1024, 'mime_type': 'audio/mpeg',
+    }, created_by="bob")
+    await commit(db)
+
+async def seed_transcripts(db: Any, user: User, count: int) -> List[Tuple[datetime, int, str]]:
+    """Same layout as seed_files, by completed_at; returns (completed_at, id, key) newest first."""
+    transcripts = transcript_repository(db)
+    rows = []
+    for i in range(count):
+        completed_at = EARLIER if i < 2 else LATER
+        key = f"StaticTranscription/alice/{i}.json"
+        created = await transcripts.upsert_transcript(user.id, None, {'s3_key': key, 'file_size': 512, 'completed_at': completed_at}, updated_by="alice")
+        rows.append((completed_at, created.id, key))
+    await commit(db)
+    return sorted(rows, reverse=True)
+
+async def walk(fetch_page: Callable[[Optional[Tuple[datetime, int]]], Awaitable[List[Any]]], position: Callable[[Any], Tuple[datetime, int]], limit: int) -> List[List[Any]]:
+    pages = []
+    cursor = None
+    while len(pages) < MAX_PAGES:
+        page = await fetch_page(cursor)
+        pages.append(page)
+        if len(page) < limit:
+            return pages
+        cursor = position(page[-1])
+    pytest.fail(f"Still paging after {MAX_PAGES} pages")
+
+def test_files_with_equal_created_at_are_ordered_by_id(db_mode, tmp_path):
+    async def scenario(db):
+        user = await user_repository(db).create_user("alice", "x")
+        expected = await seed_files(db, user, 7)
+        files = file_repository(db)
+
+        first = await files.get_files_page(user.id, 3)
+        assert [row.id for row in first] == [row_id for _, row_id, _ in expected[:3]]
+        assert len({row.created_at for row in first}) == 1
+
+        # Resuming mid-second must skip the rows already seen and keep the rest of that second.
+        rest = await files.get_files_page(user.id, 10, (first[-1].created_at, first[-1].id))
+        assert [row.id for row in rest] == [row_id for _, row_id, _ in expected[3:]]
+    run(db_mode, tmp_path, scenario)
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5])
+def test_file_pages_have_no_duplicates_or_gaps(db_mode, tmp_path, limit):
+    async def scenario(db):
+        user = await user_repository(db).create_user("alice", "x")
+        other = await user_repository(db).create_user("bob", "x")
+        expected = await seed_files(db, user, 6)
+        await seed_files_for_other_user(db, other)
+        files = file_repository(db)
+
+        pages = await walk(lambda cursor: files.get_files_page(user.id, limit, cursor), lambda row: (row.created_at, row.id), limit)
+        assert [row.id for page in pages for row in page] == [row_id for _, row_id, _ in expected]
+    run(db_mode, tmp_path, scenario)
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5])
+def test_transcript_pages_have_no_duplicates_or_gaps(db_mode, tmp_path, limit):
+    async def scenario(db):
+        user = await user_repository(db).create_user("alice", "x")
+        expected = await seed_transcripts(db, user, 6)
+        transcripts = transcript_repository(db)
+
+        pages = await walk(lambda cursor: transcripts.get_transcripts_page(user.id, limit, cursor), lambda row: (row.last_modified, row.id), limit)
+        assert [row.id for page in pages for row in page] == [row_id for _, row_id, _ in expected]
+        assert [row.last_modified for page in pages for row in page] == [completed_at for completed_at, _, _ in expected]
+    run(db_mode, tmp_path, scenario)
+
+def listing_client(db: Any, user: User) -> httpx.AsyncClient:
+    """The /files routes on the test session, signed in as `user`; runs on the scenario's event loop."""
+    app = FastAPI()
+    app.include_router(files_router)
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_current_user] = lambda: user
+    app.dependency_overrides[get_async_s3_client] = lambda: None  # Only used with ?format=
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver")
+
+async def walk_route(client: httpx.AsyncClient, path: str, limit: int) -> Tuple[List[Any], List[str]]:
+    """Follows X-Next-Cursor until it is absent; returns every item and the cursors used."""
+    items: List[Any] = []
+    cursors: List[str] = []
+    params = {'limit': limit}
+    while len(cursors) < MAX_PAGES:
+        response = await client.get(path, params=params)
+        assert response.status_code == 200, response.text
+        items.extend(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return items, cursors
+        cursors.append(cursor)
+        params = {'limit': limit, 'cursor': cursor}
+    pytest.fail(f"Still paging after {MAX_PAGES} pages")
+
+def test_file_listing_follows_the_next_cursor_header(db_mode, tmp_path):
+    async def scenario(db):
+        user = await user_repository(db).create_user("alice", "x")
+        expected = await seed_files(db, user, 5)
+
+        async with listing_client(db, user) as client:
+            items, cursors = await walk_route(client, "/files/audio", 2)
+            exact, _ = await walk_route(client, "/files/audio", 5)
+
+        assert [item['file_id'] for item in items] == [file_id for _, _, file_id in expected]
+        # The header carries the last row's position, so a full last page needs no extra round trip.
+        assert cursors == [encode_cursor(created_at, row_id) for created_at, row_id, _ in (expected[1], expected[3])]
+        assert len(exact) == 5
+    run(db_mode, tmp_path, scenario)
+
+def test_transcript_listing_follows_the_next_cursor_header(db_mode, tmp_path):
+    async def scenario(db):
+        user = await user_repository(db).create_user("alice", "x")
+        expected = await seed_transcripts(db, user, 5)
+
+        async with listing_client(db, user) as client:
+            items, cursors = await walk_route(client, "/files/transcripts", 2)
+
+        assert [item['key'] for item in items] == [key for _, _, key in expected]
+        assert len(cursors) == 2
+    run(db_mode, tmp_path, scenario)
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",                                   # not base64
+    "bm8tc2VwYXJhdG9y",                               # "no-separator"
+    "bm90LWEtZGF0ZXwx",                               # "not-a-date|1"
+    base64.urlsafe_b64encode(f"{LATER.isoformat()}|x".encode()).decode(),  # id is not a number
+    "__8=",                                           # not UTF-8
+])
+@pytest.mark.parametrize("path", ["/files/audio", "/files/transcripts"])
+def test_malformed_cursor_is_a_bad_request(tmp_path, path, cursor):
+    async def scenario(db):
+        user = await user_repository(db).create_user("alice", "x")
+        async with listing_client(db, user) as client:
+            response = await client.get(path, params={'cursor': cursor})
+        assert response.status_code == 400
+        assert response.json() == {'detail': "Invalid cursor"}
+    run("sync", tmp_path, scenario)
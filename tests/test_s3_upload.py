@@ -0,0 +1,210 @@
+# tests/test_s3_upload.py
+"""
+StreamedUpload (src/utils/s3_upload.py) and the /upload/audio route built on it, against an
+in-memory stand-in for the S3 client that keeps finished objects and open multipart uploads,
+so every test can check what an upload leaves behind in the bucket.
+"""
+import hashlib
+import io
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.config import Config
+from src.db.database import Base, get_db
+from src.models.models import User
+from src.routes.upload import upload_router
+from src.utils.aws import get_async_s3_client
+from src.utils.concurrency import AsyncProxy
+from src.utils.s3_upload import MIN_PART_SIZE, StreamedUpload, UploadTooLargeError, multipart_etag
+from src.utils.security import get_current_user
+
+BUCKET = "test-bucket"
+KEY = "StaticAudio/alice/3f2a.mp3"
+MB = 1024 * 1024
+
+class FakeS3:
+    """The S3 calls StreamedUpload makes, computing ETags the way S3 does."""
+    def __init__(self):
+        self.objects: Dict[str, Tuple[bytes, str, Dict[str, Any]]] = {}  # key -> (body, ETag, extra arguments)
+        self.uploads: Dict[str, Dict[str, Any]] = {}  # upload id -> {'key', 'parts': {number: body}}
+        self.calls: List[str] = []
+        self._lock = threading.Lock()
+
+    def _record(self, operation: str) -> None:
+        with self._lock:
+            self.calls.append(operation)
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **extra: Any) -> Dict[str, Any]:
+        self._record('put_object')
+        etag = hashlib.md5(Body).hexdigest()
+        self.objects[Key] = (Body, etag, extra)
+        return {'ETag': f'"{etag}"'}
+
+    def create_multipart_upload(self, Bucket: str, Key: str, **extra: Any) -> Dict[str, Any]:
+        self._record('create_multipart_upload')
+        upload_id = uuid.uuid4().hex
+        self.uploads[upload_id] = {'key': Key, 'parts': {}, 'extra': extra}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: bytes) -> Dict[str, Any]:
+        self._record('upload_part')
+        with self._lock:
+            self.uploads[UploadId]['parts'][PartNumber] = Body
+        return {'ETag': f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str, MultipartUpload: Dict[str, Any]) -> Dict[str, Any]:
+        self._record('complete_multipart_upload')
+        upload = self.uploads.pop(UploadId)
+        numbers = [part['PartNumber'] for part in MultipartUpload['Parts']]
+        assert numbers == sorted(upload['parts']), "every uploaded part must be listed, in order"
+        bodies = [upload['parts'][number] for number in numbers]
+        etag = multipart_etag([hashlib.md5(body).digest() for body in bodies])
+        self.objects[Key] = (b''.join(bodies), etag, upload['extra'])
+        return {'ETag': f'"{etag}"'}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str) -> Dict[str, Any]:
+        self._record('abort_multipart_upload')
+        del self.uploads[UploadId]
+        return {}
+
+    def delete_object(self, Bucket: str, Key: str) -> Dict[str, Any]:
+        self._record('delete_object')
+        self.objects.pop(Key, None)
+        return {}
+
+@pytest.fixture
+def s3() -> FakeS3:
+    return FakeS3()
+
+@pytest.fixture
+def executor() -> Iterator[ThreadPoolExecutor]:
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        yield pool
+
+def payload(size: int) -> bytes:
+    return bytes(range(256)) * (size // 256) + bytes(size % 256)
+
+def stream(s3: FakeS3, executor: ThreadPoolExecutor, body: bytes, **options: Any) -> Tuple[StreamedUpload, str, int]:
+    uploader = StreamedUpload(s3, BUCKET, KEY, executor, part_size=MIN_PART_SIZE, concurrency=2, **options)
+    md5_hash, size = uploader.stream(io.BytesIO(body))
+    return uploader, md5_hash, size
+
+def test_single_part_upload_hashes_and_puts_on_complete(s3, executor):
+    body = payload(MB + 17)
+    uploader, md5_hash, size = stream(s3, executor, body, content_type="audio/mpeg")
+
+    assert (md5_hash, size) == (hashlib.md5(body).hexdigest(), len(body))
+    assert uploader.content_etag == multipart_etag([hashlib.md5(body).digest()])
+    assert s3.calls == []  # Nothing is sent until the caller keeps the upload
+
+    uploader.complete()
+    assert s3.objects[KEY][0] == body
+    assert s3.objects[KEY][2] == {'ContentType': "audio/mpeg"}
+
+def test_multipart_upload_hashes_the_whole_file(s3, executor):
+    body = payload(2 * MIN_PART_SIZE + 1234)
+    uploader, md5_hash, size = stream(s3, executor, body)
+
+    assert (md5_hash, size) == (hashlib.md5(body).hexdigest(), len(body))
+    assert s3.calls.count('upload_part') == 3
+    assert KEY not in s3.objects
+
+    uploader.complete()
+    stored, etag, _ = s3.objects[KEY]
+    assert stored == body
+    # The same bytes uploaded directly in the standard part layout would get this ETag.
+    assert uploader.content_etag == etag
+    assert s3.uploads == {}
+
+def test_exceeding_the_limit_aborts_the_multipart_upload(s3, executor):
+    body = payload(3 * MIN_PART_SIZE)
+
+    with pytest.raises(UploadTooLargeError) as raised:
+        stream(s3, executor, body, max_size=MIN_PART_SIZE + 1)
+
+    assert raised.value.max_size == MIN_PART_SIZE + 1
+    assert raised.value.size == 2 * MIN_PART_SIZE  # Stopped at the part that crossed the limit
+    assert s3.calls[0] == 'create_multipart_upload' and s3.calls[-1] == 'abort_multipart_upload'
+    assert s3.uploads == {} and s3.objects == {}
+
+def test_exceeding_the_limit_in_one_part_sends_nothing(s3, executor):
+    with pytest.raises(UploadTooLargeError):
+        stream(s3, executor, payload(MB), max_size=MB - 1)
+    assert s3.calls == []
+
+def test_discard_aborts_an_unfinished_upload_and_deletes_a_finished_one(s3, executor):
+    body = payload(MIN_PART_SIZE + 1)
+    unfinished, _, _ = stream(s3, executor, body)
+    unfinished.discard()
+    unfinished.discard()
+    assert s3.calls.count('abort_multipart_upload') == 1
+
+    finished, _, _ = stream(s3, executor, body)
+    finished.complete()
+    finished.discard()
+    finished.discard()
+    assert s3.calls.count('delete_object') == 1
+    assert s3.uploads == {} and s3.objects == {}
+
+@pytest.fixture
+def upload_client(s3, tmp_path, monkeypatch) -> Iterator[TestClient]:
+    """/upload on a SQLite file and the fake S3, signed in as alice; 5 MB parts, 12 MB limit."""
+    monkeypatch.setattr(Config, "AUDIO_PROBE_ENABLED", False)
+    monkeypatch.setattr(Config, "CONTENT_ADDRESSED_STORAGE", False)
+    monkeypatch.setattr(Config, "AWS_S3_BUCKET_NAME", BUCKET)
+    monkeypatch.setattr(Config, "S3_MULTIPART_PART_SIZE_MB", 5)
+    monkeypatch.setattr(Config, "MAX_UPLOAD_FILE_SIZE_MB", 12)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'upload.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)()
+    user = User(username="alice", hashed_password="x", created_by="test", updated_by="test")
+    session.add(user)
+    session.commit()
+
+    app = FastAPI()
+    app.include_router(upload_router)
+    app.dependency_overrides[get_db] = lambda: session
+    app.dependency_overrides[get_current_user] = lambda: user
+    app.dependency_overrides[get_async_s3_client] = lambda: AsyncProxy(s3)
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        session.close()
+        engine.dispose()
+
+def post_audio(client: TestClient, body: bytes, filename: str = "talk.mp3") -> Any:
+    return client.post("/upload/audio", files={"file": (filename, body, "audio/mpeg")})
+
+def test_upload_over_the_limit_is_413_and_leaves_nothing(upload_client, s3):
+    response = post_audio(upload_client, payload(13 * MB))
+
+    assert response.status_code == 413
+    assert 'create_multipart_upload' in s3.calls and s3.calls[-1] == 'abort_multipart_upload'
+    assert s3.uploads == {} and s3.objects == {}
+
+def test_duplicate_upload_is_discarded(upload_client, s3):
+    body = payload(MIN_PART_SIZE + 4096)
+
+    first = post_audio(upload_client, body)
+    assert first.status_code == 201, first.text
+    kept = first.json()
+    assert kept['md5_hash'] == hashlib.md5(body).hexdigest()
+    assert kept['content_etag'] == s3.objects[kept['s3_key']][1]
+
+    second = post_audio(upload_client, body, filename="talk-again.mp3")
+    assert second.json()['message'] == "File already uploaded"
+    assert second.json()['s3_key'] == kept['s3_key']
+    assert s3.calls[-1] == 'abort_multipart_upload'
+    # Only the first upload's object exists; the duplicate left no object or open upload.
+    assert list(s3.objects) == [kept['s3_key']]
+    assert s3.uploads == {}